@@ -5,29 +5,60 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from app.sqlite import default_pragmas, init_sqlite
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 
-def create_app(config_name=None):
+def create_app(config_name=None, test_config=None):
     """
     Application factory pattern
     """
     app = Flask(__name__)
 
+    # Encode responses with orjson when installed (same output as the default provider)
+    from app.serializers import LoomJSONProvider
+    app.json = LoomJSONProvider(app)
+
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.getenv('DATABASE_PATH', '/app/data/loom.db')}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['QUERY_BUDGET_STRICT'] = os.getenv('QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+    # A local SQLite file needs no liveness checks or recycling, only a pool
+    # sized for the worker's threads
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
+        'pool_size': int(os.getenv('SQLITE_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('SQLITE_POOL_OVERFLOW', 10)),
     }
+    app.config['SQLITE_PRAGMAS'] = default_pragmas()
+    app.config['SQLITE_MAINTENANCE_INTERVAL'] = int(os.getenv('SQLITE_MAINTENANCE_INTERVAL', 3600))  # Seconds
+    app.config['REMINDER_SINK'] = os.getenv('REMINDER_SINK', 'log')  # log, webhook, queue; empty disables
+    app.config['REMINDER_LOOKAHEAD'] = int(os.getenv('REMINDER_LOOKAHEAD', 3600))  # Seconds
+    app.config['REMINDER_REFRESH_INTERVAL'] = int(os.getenv('REMINDER_REFRESH_INTERVAL', 30))  # Seconds
+    app.config['NOTE_PATCH_FLUSH_DELAY'] = int(os.getenv('NOTE_PATCH_FLUSH_DELAY', 5))  # Seconds of no edits; 0 writes every save
+    app.config['NOTE_PATCH_MAX_DELAY'] = int(os.getenv('NOTE_PATCH_MAX_DELAY', 30))  # Seconds
+    app.config['SQLITE_VACUUM_PAGES'] = int(os.getenv('SQLITE_VACUUM_PAGES', 5000))  # Per maintenance pass; 0 for all
+    app.config['SYNC_TOMBSTONE_RETENTION_DAYS'] = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+    app.config['SSE_POLL_INTERVAL'] = float(os.getenv('SSE_POLL_INTERVAL', 1))  # Seconds
+    app.config['SSE_LONG_POLL_WAIT'] = int(os.getenv('SSE_LONG_POLL_WAIT', 20))  # Seconds
+    app.config['SSE_MAX_WAITING'] = int(os.getenv('SSE_MAX_WAITING', 2))  # Waiting stream requests per worker
+    app.config['REMINDER_WEBHOOK_URL'] = os.getenv('REMINDER_WEBHOOK_URL')
+    app.config['NOTE_REVISIONS_KEEP_ALL_DAYS'] = int(os.getenv('NOTE_REVISIONS_KEEP_ALL_DAYS', 7))
+    app.config['NOTE_REVISIONS_KEEP_DAILY_DAYS'] = int(os.getenv('NOTE_REVISIONS_KEEP_DAILY_DAYS', 90))
+    app.config['ARCHIVE_NOTES_AFTER_DAYS'] = int(os.getenv('ARCHIVE_NOTES_AFTER_DAYS', 30))
+    app.config['ARCHIVE_TODOS_AFTER_DAYS'] = int(os.getenv('ARCHIVE_TODOS_AFTER_DAYS', 30))
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.getenv('DASHBOARD_CACHE_TTL', 30))  # Seconds; upcoming events roll over at least this often
+    app.config['TRAVEL_BASE_CURRENCY'] = os.getenv('TRAVEL_BASE_CURRENCY', 'USD').upper()  # Trip budgets and expense totals
+
+    if test_config:
+        app.config.update(test_config)
 
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
+    init_sqlite(app, db)
 
     # Register blueprints
     from app.modules.notes import notes_bp
@@ -37,6 +68,7 @@ def create_app(config_name=None):
     from app.modules.recipes import recipes_bp
     from app.modules.travel import travel_bp
     from app.modules.dashboard import dashboard_bp
+    from app.modules.sync import sync_bp
 
     app.register_blueprint(dashboard_bp, url_prefix='/')
     app.register_blueprint(notes_bp, url_prefix='/notes')
@@ -45,6 +77,10 @@ def create_app(config_name=None):
     app.register_blueprint(todos_bp, url_prefix='/todos')
     app.register_blueprint(recipes_bp, url_prefix='/recipes')
     app.register_blueprint(travel_bp, url_prefix='/travel')
+    app.register_blueprint(sync_bp, url_prefix='/api')
+
+    from app.cli import register_commands
+    register_commands(app)
 
     # Health check endpoint
     @app.route('/health')
@@ -0,0 +1,207 @@
+"""
+Archive Tier - move archived notes and old completed todos to cold tables
+
+Archived notes and completed todos stay in the hot tables for a while,
+then a maintenance task moves them (with their reminders) into the
+`*_archive` tables, so the indexes every list and dashboard query walks
+only hold live rows. List endpoints read both tiers with
+`include_archived=true`; fetching a note by id falls back to the archive,
+and saving or deleting an archived row moves it back first.
+
+SQLite numbers a new row one past the table's highest id, which could
+hand out the id of a row moved to the archive; inserts into a hot table
+are numbered past both tiers whenever the archive holds the highest id.
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app, request
+from sqlalchemy import column, delete, event, func, insert, literal, select, table, text, union_all
+from sqlalchemy.orm import Session, object_session
+from app.models import Note, NoteTag, Todo, TodoReminder, ArchivedNote, ArchivedTodo, ArchivedTodoReminder
+from app.sqlite import maintenance_task
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Rows moved per transaction
+ARCHIVE_BATCH = 500
+
+_NEXT_IDS_KEY = 'loom_archive_next_ids'
+
+_note_patches = table('note_patches', column('note_id'))
+
+
+def include_archived():
+    """Whether the request asks for rows in the archive tier too (`include_archived=true`)"""
+    return request.args.get('include_archived', 'false').lower() == 'true'
+
+
+# Id allocation
+
+def _allocate_ids(model, cold_model):
+    hot_table, cold_table = model.__table__.name, cold_model.__table__.name
+
+    @event.listens_for(model, 'before_insert')
+    def allocate(mapper, connection, target):
+        if target.id is not None:
+            return
+
+        next_ids = object_session(target).info.setdefault(_NEXT_IDS_KEY, {})
+        if hot_table not in next_ids:
+            hot_max, cold_max = connection.execute(text(
+                f"SELECT (SELECT max(id) FROM {hot_table}), (SELECT max(id) FROM {cold_table})"
+            )).one()
+            archived_highest = cold_max is not None and cold_max >= (hot_max or 0)
+            next_ids[hot_table] = cold_max + 1 if archived_highest else None
+
+        if next_ids[hot_table] is not None:
+            target.id = next_ids[hot_table]
+            next_ids[hot_table] += 1
+
+
+_allocate_ids(Note, ArchivedNote)
+_allocate_ids(Todo, ArchivedTodo)
+
+
+@event.listens_for(Session, 'after_flush')
+def _forget_next_ids(session, flush_context):
+    session.info.pop(_NEXT_IDS_KEY, None)
+
+
+# Reading both tiers
+
+def union_tiers(schema, cold_model, extra=(), hot_where=(), cold_where=()):
+    """
+    Subquery of schema.columns(*extra) over the hot table and the same
+    columns of `cold_model`, with an `archived` flag telling them apart.
+    Select its columns in order and dump the rows with a TieredSchema.
+    """
+    hot_columns = schema.columns(*extra)
+    cold_columns = [getattr(cold_model, hot_column.key) for hot_column in hot_columns]
+    return union_all(
+        select(*hot_columns, literal(False).label('archived')).where(*hot_where),
+        select(*cold_columns, literal(True).label('archived')).where(*cold_where)
+    ).subquery()
+
+
+class TieredSchema:
+    """Dumps rows of union_tiers() with the schema of the tier each came from, keeping their order"""
+
+    def __init__(self, hot, cold):
+        self.hot = hot
+        self.cold = cold
+
+    def dump_rows(self, rows):
+        dumped = {
+            False: iter(self.hot.dump_rows([row for row in rows if not row.archived])),
+            True: iter(self.cold.dump_rows([row for row in rows if row.archived])),
+        }
+        return [next(dumped[bool(row.archived)]) for row in rows]
+
+
+# Moving rows between tiers
+
+def _copy_rows(source, target, where, exclude=(), **values):
+    """INSERT INTO target SELECT the columns both tables share FROM source; returns the row count"""
+    names = [name for name in source.columns.keys() if name in target.columns and name not in exclude]
+    statement = insert(target).from_select(
+        names + list(values),
+        select(*[source.c[name] for name in names], *[literal(value) for value in values.values()]).where(where)
+    )
+    return db.session.execute(statement).rowcount
+
+
+def archive_notes(now=None):
+    """Move notes archived more than ARCHIVE_NOTES_AFTER_DAYS ago to the cold table; returns the count"""
+    from app.modules.notes.patches import flush_patches
+
+    # Pending autosaves would be dropped with the note row
+    flush_patches()
+
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config['ARCHIVE_NOTES_AFTER_DAYS'])
+    hot, cold = Note.__table__, ArchivedNote.__table__
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(hot.c.id).where(
+                hot.c.is_archived.is_(True),
+                hot.c.updated_at < cutoff,
+                hot.c.id.notin_(select(_note_patches.c.note_id))
+            ).order_by(hot.c.id).limit(ARCHIVE_BATCH)
+        ).scalars().all()
+        if not ids:
+            return moved
+
+        _copy_rows(hot, cold, hot.c.id.in_(ids), archived_at=now)
+        # Tag rows are rebuilt from the tags column on restore; archived notes are not in the tag counts
+        db.session.execute(delete(NoteTag.__table__).where(NoteTag.__table__.c.note_id.in_(ids)))
+        db.session.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+
+def archive_todos(now=None):
+    """Move todos completed more than ARCHIVE_TODOS_AFTER_DAYS ago, with their reminders, to the cold tables"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config['ARCHIVE_TODOS_AFTER_DAYS'])
+    hot, cold = Todo.__table__, ArchivedTodo.__table__
+    reminders, cold_reminders = TodoReminder.__table__, ArchivedTodoReminder.__table__
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(hot.c.id).where(
+                hot.c.status == 'completed',
+                # Weekly todos are templates that come back every week
+                hot.c.is_weekly.isnot(True),
+                func.coalesce(hot.c.completed_at, hot.c.updated_at) < cutoff
+            ).order_by(hot.c.id).limit(ARCHIVE_BATCH)
+        ).scalars().all()
+        if not ids:
+            return moved
+
+        _copy_rows(hot, cold, hot.c.id.in_(ids), archived_at=now)
+        _copy_rows(reminders, cold_reminders, reminders.c.todo_id.in_(ids), archived_at=now)
+        db.session.execute(delete(reminders).where(reminders.c.todo_id.in_(ids)))
+        db.session.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+
+def restore_note(note_id):
+    """Move an archived note back to the notes table; returns it, or None if it is not in the archive"""
+    from app.modules.notes.tags import parse_tags
+
+    cold = ArchivedNote.__table__
+    tags = db.session.execute(select(cold.c.tags).where(cold.c.id == note_id)).first()
+    if tags is None:
+        return None
+
+    _copy_rows(cold, Note.__table__, cold.c.id == note_id)
+    names = parse_tags(tags[0], strict=False)
+    if names:
+        db.session.execute(insert(NoteTag), [{'note_id': note_id, 'tag_name': name} for name in names])
+    db.session.execute(delete(cold).where(cold.c.id == note_id))
+    return db.session.get(Note, note_id)
+
+
+def restore_todo(todo_id):
+    """Move an archived todo and its reminders back; returns the todo, or None if it is not in the archive"""
+    cold, cold_reminders = ArchivedTodo.__table__, ArchivedTodoReminder.__table__
+    if not _copy_rows(cold, Todo.__table__, cold.c.id == todo_id):
+        return None
+
+    # Reminder ids are not referenced anywhere, so they are numbered afresh
+    _copy_rows(cold_reminders, TodoReminder.__table__, cold_reminders.c.todo_id == todo_id, exclude=('id',))
+    db.session.execute(delete(cold_reminders).where(cold_reminders.c.todo_id == todo_id))
+    db.session.execute(delete(cold).where(cold.c.id == todo_id))
+    return db.session.get(Todo, todo_id)
+
+
+@maintenance_task
+def archive_cold_rows(now=None):
+    """Move archived notes and old completed todos to the archive tier"""
+    notes, todos = archive_notes(now), archive_todos(now)
+    if notes or todos:
+        logger.info(f"Moved {notes} notes and {todos} todos to the archive tier")
+    return notes, todos
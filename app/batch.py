@@ -0,0 +1,184 @@
+"""
+Batch Writes - create/update/delete many records in one request and one commit
+
+A batch body looks like
+    {"create": [{...}, ...], "update": [{"id": 1, ...}, ...], "delete": [3, 4]}
+
+Each record is validated independently: invalid records are reported in
+`errors` (by operation and index) and the rest are written in a single
+transaction. With "atomic": true any error rejects the whole batch.
+Everything is written in one flush and one commit (a single WAL sync),
+and ids are read back before the commit expires the new rows, so the
+response costs no extra queries.
+
+For models with a version column, a row saved elsewhere after it was
+loaded fails the flush; the batch is then rolled back and applied again
+with that row's update or delete reported as a conflict, together with
+its current version. An update record carrying the `version` it was
+based on is checked by the updater, which raises VersionConflict so the
+record is reported the same way.
+"""
+from flask import jsonify
+from sqlalchemy import inspect, select
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+
+MAX_BATCH_SIZE = 5000
+
+# Times a batch is applied again after a version conflict before giving up
+MAX_CONFLICT_RETRIES = 3
+
+# Errors a builder/updater raises for a bad record
+RECORD_ERRORS = (KeyError, ValueError, TypeError)
+
+
+class VersionConflict(Exception):
+    """The record changed since the version an update was based on"""
+
+    def __init__(self, version):
+        super().__init__(f'Record is at version {version}')
+        self.version = version
+
+
+def _describe(exc):
+    if isinstance(exc, KeyError):
+        return f'Missing field: {exc.args[0]}'
+    return str(exc)
+
+
+def apply_batch(model, data, build=None, update=None, delete=None, scope=None):
+    """
+    Apply a batch body to `model` and return a Flask response.
+
+    build(record) -> new instance; update(instance, record) mutates it;
+    delete(instance) removes it (defaults to session.delete). `scope` is an
+    optional filter criterion restricting which rows may be updated/deleted.
+    Omitting build or update disables that operation.
+    """
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+
+    creates = data.get('create') or []
+    updates = data.get('update') or []
+    deletes = data.get('delete') or []
+    atomic = bool(data.get('atomic', False))
+
+    if not all(isinstance(part, list) for part in (creates, updates, deletes)):
+        return jsonify({'error': 'create, update and delete must be arrays'}), 400
+
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds {MAX_BATCH_SIZE} records'}), 400
+
+    if (creates and build is None) or (updates and update is None):
+        return jsonify({'error': 'Operation not supported for this resource'}), 400
+
+    version_column = inspect(model).version_id_col
+    stale = {}
+    for attempt in range(MAX_CONFLICT_RETRIES + 1):
+        loaded = {}
+        try:
+            return _apply(model, creates, updates, deletes, atomic, build, update, delete, scope, loaded, stale)
+        except StaleDataError:
+            db.session.rollback()
+            if version_column is None or attempt == MAX_CONFLICT_RETRIES:
+                raise
+            stale.update(_stale_rows(model, version_column, loaded))
+
+
+def _stale_rows(model, version_column, loaded):
+    """{id: current version or None} of the rows whose version moved on since they were loaded"""
+    current = dict(db.session.execute(
+        select(model.id, version_column).where(model.id.in_(list(loaded)))
+    ).all())
+    return {
+        row_id: current.get(row_id)
+        for row_id, version in loaded.items() if current.get(row_id) != version
+    }
+
+
+def _conflict(op, index, version):
+    return {'op': op, 'index': index, 'error': 'Record was changed by another save', 'version': version}
+
+
+def _apply(model, creates, updates, deletes, atomic, build, update, delete, scope, loaded, stale):
+    """
+    One attempt at a batch. Records the version of each row it loads in
+    `loaded`; rows in `stale` are reported as conflicts instead of written.
+    """
+    errors = []
+    created = []
+
+    for index, record in enumerate(creates):
+        try:
+            created.append((index, build(record)))
+        except RECORD_ERRORS as exc:
+            errors.append({'op': 'create', 'index': index, 'error': _describe(exc)})
+
+    # Load every targeted row in one query per operation
+    existing = _load(model, [r.get('id') for r in updates if isinstance(r, dict)] + list(deletes), scope)
+    version_column = inspect(model).version_id_col
+    if version_column is not None:
+        loaded.update((row_id, getattr(instance, version_column.key)) for row_id, instance in existing.items())
+
+    updated = []
+    for index, record in enumerate(updates):
+        instance = None
+        try:
+            instance = existing.get(record['id'])
+            if instance is None:
+                raise ValueError(f"Record {record['id']} not found")
+            if record['id'] in stale:
+                errors.append(_conflict('update', index, stale[record['id']]))
+                continue
+            update(instance, record)
+            updated.append(instance)
+        except VersionConflict as exc:
+            db.session.expire(instance)
+            errors.append(_conflict('update', index, exc.version))
+        except RECORD_ERRORS as exc:
+            # Discard whatever the updater changed before it failed
+            if instance is not None:
+                db.session.expire(instance)
+            errors.append({'op': 'update', 'index': index, 'error': _describe(exc)})
+
+    deleted = []
+    for index, record_id in enumerate(deletes):
+        instance = existing.get(record_id) if isinstance(record_id, int) else None
+        if instance is None:
+            errors.append({'op': 'delete', 'index': index, 'error': f'Record {record_id} not found'})
+            continue
+        if record_id in stale:
+            errors.append(_conflict('delete', index, stale[record_id]))
+            continue
+        (delete or db.session.delete)(instance)
+        deleted.append(record_id)
+
+    if errors and atomic:
+        db.session.rollback()
+        return jsonify({'errors': errors}), 400
+
+    db.session.add_all(instance for _, instance in created)
+    db.session.flush()
+    body = {
+        'created': [{'index': index, 'id': instance.id} for index, instance in created],
+        'updated': [instance.id for instance in updated],
+        'deleted': deleted,
+        'errors': errors
+    }
+    db.session.commit()
+
+    return jsonify(body)
+
+
+def _load(model, ids, scope):
+    ids = [i for i in ids if isinstance(i, int)]
+    if not ids:
+        return {}
+
+    query = model.query.filter(model.id.in_(ids))
+    if scope is not None:
+        query = query.filter(scope)
+    if hasattr(model, 'load_options'):
+        query = query.options(*model.load_options())
+
+    return {instance.id: instance for instance in query.all()}
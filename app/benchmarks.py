@@ -0,0 +1,107 @@
+"""
+Serializer Benchmarks - per-row cost of building and encoding list responses
+
+Seeds a temporary database with notes, events and recipes (with
+ingredients and tags), then times the two ways a list endpoint can build
+its JSON: hydrating ORM objects and calling to_dict(), or selecting row
+tuples and dumping them with the model's compiled schema. Encoding is
+timed separately with the standard library and with orjson. Run with
+`flask benchmark-serializers`.
+"""
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPEATS = 5
+
+
+def _seed(rows):
+    from sqlalchemy import insert
+    from app import db
+    from app.models import Note, Event, Recipe, RecipeIngredient, RecipeTag
+
+    now = datetime.utcnow()
+    db.session.execute(insert(Note), [
+        {'title': f'Note {i}', 'content': 'Lorem ipsum dolor sit amet. ' * 20, 'category': 'work',
+         'tags': 'alpha,beta', 'created_at': now, 'updated_at': now}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Event), [
+        {'title': f'Event {i}', 'description': 'Weekly sync', 'start_time': now + timedelta(hours=i),
+         'end_time': now + timedelta(hours=i + 1), 'location': 'Office', 'created_at': now, 'updated_at': now}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Recipe), [
+        {'name': f'Recipe {i}', 'description': 'Weeknight dinner', 'instructions': 'Cook it.',
+         'servings': 4, 'category': 'dinner', 'created_at': now, 'updated_at': now}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(RecipeIngredient), [
+        {'recipe_id': i + 1, 'name': f'ingredient {j}', 'quantity': '2', 'unit': 'cup'}
+        for i in range(rows) for j in range(5)
+    ])
+    db.session.execute(insert(RecipeTag), [
+        {'recipe_id': i + 1, 'tag_name': tag} for i in range(rows) for tag in ('quick', 'vegetarian')
+    ])
+    db.session.commit()
+
+
+def _best(function):
+    """Fastest of REPEATS runs in seconds, and the last result"""
+    from app import db
+
+    best, result = None, None
+    for _ in range(REPEATS):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_serializers(rows=1000):
+    """
+    Time list serialization for notes, events and recipes.
+
+    Returns a list of (model, method, microseconds per row).
+    """
+    from app import create_app, db
+    from app.models import Note, Event, Recipe
+    from app.schema import init_db
+    from app.serializers import orjson
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    try:
+        app = create_app(test_config={'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            init_db()
+            _seed(rows)
+
+            results = []
+            for model, options in ((Note, ()), (Event, ()), (Recipe, Recipe.load_options())):
+                schema = model.serializer
+                orm_seconds, _ = _best(lambda: [obj.to_dict() for obj in model.query.options(*options)])
+                row_seconds, dumped = _best(
+                    lambda: schema.dump_rows(db.session.query(*schema.columns()).all())
+                )
+                results.append((model.__name__, 'ORM objects + to_dict()', orm_seconds))
+                results.append((model.__name__, 'row tuples + compiled schema', row_seconds))
+
+                json_seconds, _ = _best(
+                    lambda: json.dumps(dumped, default=app.json.default, sort_keys=True, separators=(',', ':'))
+                )
+                results.append((model.__name__, 'encode with json', json_seconds))
+                if orjson is not None:
+                    orjson_seconds, _ = _best(lambda: app.json.dumps(dumped))
+                    results.append((model.__name__, 'encode with orjson', orjson_seconds))
+
+            db.engine.dispose()
+    finally:
+        os.remove(path)
+
+    return [(model, method, seconds / rows * 1e6) for model, method, seconds in results]
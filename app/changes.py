@@ -0,0 +1,66 @@
+"""
+Change Notifications - tell interested code which tables a commit touched
+
+Session events collect the tables of every inserted, updated or deleted
+row (including bulk query.update()/query.delete()) and, once the
+transaction commits, call the listeners registered for those tables.
+Caches hook in here instead of every write route invalidating them by hand.
+"""
+import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = 'loom_changed_tables'
+
+# (tables or None for all, callback)
+_listeners = []
+
+
+def on_change(*tables):
+    """Register a callback(changed_tables) run after commits touching `tables` (any table if none given)"""
+    def decorator(callback):
+        _listeners.append((frozenset(tables) or None, callback))
+        return callback
+    return decorator
+
+
+def _pending(session):
+    return session.info.setdefault(_SESSION_KEY, set())
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_flushed(session, flush_context, instances):
+    changed = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table and (obj not in session.dirty or session.is_modified(obj)):
+            changed.add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _pending(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify(session):
+    changed = session.info.pop(_SESSION_KEY, None)
+    if not changed:
+        return
+
+    for tables, callback in _listeners:
+        if tables is None or tables & changed:
+            try:
+                callback(frozenset(changed))
+            except Exception:
+                logger.exception(f"Change listener {callback.__name__} failed")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,86 @@
+"""
+CLI Commands - registered on the app as `flask <command>`
+"""
+import click
+
+
+def register_commands(app):
+    """Attach LOOM's management commands to the Flask CLI"""
+
+    @app.cli.command('sqlite-maintenance')
+    def sqlite_maintenance_command():
+        """Checkpoint the WAL and run PRAGMA optimize"""
+        from app import db
+        from app.sqlite import run_maintenance
+
+        run_maintenance(db)
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if a hot endpoint's query plan uses a full scan or temp sort"""
+        from app.query_plans import check_query_plans
+
+        regressions = check_query_plans()
+        for url, statement, problems in regressions:
+            click.echo(f'{url}:', err=True)
+            if statement:
+                click.echo(f'  {" ".join(statement.split())}', err=True)
+            for problem in problems:
+                click.echo(f'    -> {problem}', err=True)
+
+        if regressions:
+            raise SystemExit(1)
+
+        click.echo('All hot query plans use indexes')
+
+    @app.cli.command('check-query-budgets')
+    def check_query_budgets_command():
+        """Fail if a budgeted endpoint issues more queries than its @query_budget"""
+        from app.query_budget_checks import check_query_budgets
+
+        breaches = check_query_budgets()
+        for request, problem in breaches:
+            click.echo(f'{request}:', err=True)
+            for line in problem.splitlines():
+                click.echo(f'    {line}', err=True)
+
+        if breaches:
+            raise SystemExit(1)
+
+        click.echo('All budgeted endpoints stay within their query budgets')
+
+    @app.cli.command('benchmark-serializers')
+    @click.option('--rows', default=1000, show_default=True, help='Rows seeded per table')
+    def benchmark_serializers_command(rows):
+        """Report per-row cost of building and encoding list responses"""
+        from app.benchmarks import benchmark_serializers
+
+        for model, method, microseconds in benchmark_serializers(rows):
+            click.echo(f'{model:<8} {method:<30} {microseconds:8.2f} µs/row')
+
+    @app.cli.command('export-data')
+    @click.argument('output', type=click.File('w'), default='-')
+    def export_data_command(output):
+        """Write every table as NDJSON to OUTPUT (default stdout)"""
+        from app.modules.sync.transfer import export_lines
+
+        for chunk in export_lines():
+            output.write(chunk)
+
+    @app.cli.command('import-data')
+    @click.argument('source', type=click.File('r'), default='-')
+    @click.option('--replace', is_flag=True, help='Delete existing data before importing')
+    def import_data_command(source, replace):
+        """Load an NDJSON export from SOURCE (default stdin) in one transaction"""
+        from sqlalchemy.exc import IntegrityError
+        from app.modules.sync.transfer import TransferError, import_lines
+
+        try:
+            counts = import_lines(source, replace=replace)
+        except TransferError as exc:
+            raise click.ClickException(str(exc))
+        except IntegrityError as exc:
+            raise click.ClickException(f'Imported rows conflict with existing data: {exc.orig}')
+
+        for table, count in counts.items():
+            click.echo(f'{table}: {count}')
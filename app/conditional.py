@@ -0,0 +1,115 @@
+"""
+Conditional GET - ETag / Last-Modified validators for read APIs
+
+A `table_versions` row per table is bumped by triggers on every insert,
+update and delete, so validators stay correct across workers and for any
+write path. A GET decorated with @conditional reads the versions of the
+tables it depends on (one primary key lookup) and answers
+If-None-Match / If-Modified-Since with 304 before the view runs.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import text, bindparam
+from app import db
+
+_CHANGED_AT = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_VERSION_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{op} AFTER {op} ON {table} BEGIN
+        INSERT INTO table_versions (table_name, version, changed_at)
+        VALUES ('{table}', 1, {changed_at})
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = version + 1, changed_at = excluded.changed_at;
+    END
+"""
+
+
+def ensure_version_tracking():
+    """Create the table_versions table and a version trigger per model table"""
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                changed_at TEXT
+            )
+        """))
+
+        for table in db.metadata.sorted_tables:
+            track_versions(conn, table.name)
+
+
+def track_versions(conn, table):
+    """Create the version triggers for one table (also for tables outside the models)"""
+    for op in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(text(_VERSION_TRIGGER.format(table=table, op=op, changed_at=_CHANGED_AT)))
+
+
+def table_versions(tables):
+    """{table: (version, changed_at)} for the given tables"""
+    rows = db.session.execute(
+        text("SELECT table_name, version, changed_at FROM table_versions WHERE table_name IN :tables")
+        .bindparams(bindparam('tables', expanding=True)),
+        {'tables': list(tables)}
+    ).all()
+    return {row.table_name: (row.version, row.changed_at) for row in rows}
+
+
+def _last_modified(versions):
+    """Latest change as an aware datetime, or None if the tables were never written"""
+    stamps = [changed_at for _, changed_at in versions.values() if changed_at]
+    if not stamps:
+        return None
+    return datetime.fromisoformat(max(stamps)).replace(tzinfo=timezone.utc)
+
+
+def conditional(*tables, time_bucket=None):
+    """
+    Decorator adding ETag / Last-Modified validation to a GET view.
+
+    The validator covers the request URL and the versions of `tables`.
+    Views whose result also depends on the clock (e.g. "upcoming") pass
+    `time_bucket` seconds so their validator rolls over periodically.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(tables)
+
+            parts = [request.full_path]
+            parts += [f'{table}:{versions.get(table, (0, None))[0]}' for table in sorted(tables)]
+            if time_bucket:
+                parts.append(str(int(time.time() // time_bucket)))
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+            last_modified = _last_modified(versions)
+            # Last-Modified has one-second resolution; only send it once that
+            # second has passed so a later write in the same second is not missed
+            if last_modified and datetime.now(timezone.utc) - last_modified < timedelta(seconds=1):
+                last_modified = None
+            if time_bucket:
+                last_modified = None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(last_modified and since and last_modified.replace(microsecond=0) <= since)
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
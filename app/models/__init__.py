@@ -1,14 +1,17 @@
 """
 Database Models
 """
-from app.models.note import Note
+from app.models.note import Note, NoteTag, NoteRevision
 from app.models.event import Event
 from app.models.todo import Todo, TodoReminder
 from app.models.recipe import Recipe, RecipeIngredient, RecipeTag, ShoppingListItem
-from app.models.travel import Trip, Itinerary, PackingList, PackingItem, TravelExpense
+from app.models.travel import Trip, Itinerary, PackingList, PackingItem, TravelExpense, CurrencyRate
+from app.models.archive import ArchivedNote, ArchivedTodo, ArchivedTodoReminder
 
 __all__ = [
     'Note',
+    'NoteTag',
+    'NoteRevision',
     'Event',
     'Todo',
     'TodoReminder',
@@ -20,5 +23,9 @@ __all__ = [
     'Itinerary',
     'PackingList',
     'PackingItem',
-    'TravelExpense'
+    'TravelExpense',
+    'CurrencyRate',
+    'ArchivedNote',
+    'ArchivedTodo',
+    'ArchivedTodoReminder'
 ]
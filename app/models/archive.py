@@ -0,0 +1,60 @@
+"""
+Archive Models - cold tables for archived notes and old completed todos
+
+Each cold table has the columns of its hot table (without its indexes or
+foreign keys) plus `archived_at`, and dumps the same JSON shape, so rows
+can be moved between tiers with INSERT ... SELECT and listed together.
+"""
+from app.models.note import Note, NoteMixin
+from app.models.todo import Todo, TodoMixin, TodoReminder
+from app.serializers import Schema, SchemaMixin
+from app import db
+
+def _cold_table(name, model, *extra):
+    """Table `name` with a copy of every column of `model`, plus `archived_at`"""
+    columns = [
+        db.Column(
+            column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+            default=column.default.arg if column.default is not None and column.default.is_scalar else None,
+            server_default=column.server_default.arg if column.server_default is not None else None
+        )
+        for column in model.__table__.columns
+    ]
+    return db.Table(
+        name, db.metadata, *columns, db.Column('archived_at', db.DateTime, nullable=False), *extra
+    )
+
+class ArchivedNote(NoteMixin, db.Model):
+    """An archived note moved out of the notes table"""
+    __table__ = _cold_table('notes_archive', Note)
+
+    serializer = Schema(**Note.serializer.fields)
+
+    def __repr__(self):
+        return f'<ArchivedNote {self.title}>'
+
+class ArchivedTodo(TodoMixin, db.Model):
+    """A completed todo moved out of the todos table"""
+    __table__ = _cold_table('todos_archive', Todo)
+
+    reminders = db.relationship(
+        'ArchivedTodoReminder', primaryjoin='ArchivedTodo.id == foreign(ArchivedTodoReminder.todo_id)',
+        backref='todo', lazy=True, cascade='all, delete-orphan'
+    )
+
+    serializer = Schema(**Todo.serializer.fields)
+
+    def __repr__(self):
+        return f'<ArchivedTodo {self.title}>'
+
+class ArchivedTodoReminder(SchemaMixin, db.Model):
+    """A reminder of an archived todo"""
+    __table__ = _cold_table(
+        'todo_reminders_archive', TodoReminder,
+        db.Index('ix_todo_reminders_archive_todo_id', 'todo_id')
+    )
+
+    serializer = Schema(**TodoReminder.serializer.fields)
+
+    def __repr__(self):
+        return f'<ArchivedTodoReminder for Todo {self.todo_id}>'
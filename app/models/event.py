@@ -2,45 +2,51 @@
 Event Model - Calendar events and scheduling
 """
 from datetime import datetime
+from app.serializers import Schema, csv_list, iso
 from app import db
 
 class Event(db.Model):
     """Event model for calendar and scheduling"""
     __tablename__ = 'events'
+    __table_args__ = (
+        # Calendar expansion: recurring series that started before the window end
+        db.Index('ix_events_recurring_start', 'recurring', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     location = db.Column(db.String(200), nullable=True)
-    start_time = db.Column(db.DateTime, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
     end_time = db.Column(db.DateTime, nullable=True)
     all_day = db.Column(db.Boolean, default=False)
     category = db.Column(db.String(50), nullable=True)
     color = db.Column(db.String(7), default='#3788d8')  # Hex color code
     recurring = db.Column(db.Boolean, default=False)
     recurrence_rule = db.Column(db.String(100), nullable=True)  # RRULE format
+    recurrence_exdates = db.Column(db.Text, nullable=True)  # Comma-separated excluded occurrence starts
+    recurrence_until = db.Column(db.DateTime, nullable=True)  # Last occurrence start, NULL if unbounded
+    recurrence_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=True, index=True)  # Series this overrides
+    recurrence_start = db.Column(db.DateTime, nullable=True)  # Original start of the overridden occurrence
     reminder_minutes = db.Column(db.Integer, nullable=True)  # Minutes before event
+    reminder_at = db.Column(db.DateTime, nullable=True, index=True)  # Next pending reminder, NULL if none
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    serializer = Schema(
+        'id', 'title', 'description', 'location', 'all_day', 'category', 'color',
+        'recurring', 'recurrence_rule', 'recurrence_id', 'reminder_minutes',
+        start_time=iso, end_time=iso, recurrence_exdates=csv_list, recurrence_start=iso,
+        created_at=iso, updated_at=iso
+    )
+
     def __repr__(self):
         return f'<Event {self.title}>'
 
+    def exdates_list(self):
+        """Excluded occurrence starts as ISO strings"""
+        return self.recurrence_exdates.split(',') if self.recurrence_exdates else []
+
     def to_dict(self):
         """Convert event to dictionary"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'location': self.location,
-            'start_time': self.start_time.isoformat(),
-            'end_time': self.end_time.isoformat() if self.end_time else None,
-            'all_day': self.all_day,
-            'category': self.category,
-            'color': self.color,
-            'recurring': self.recurring,
-            'recurrence_rule': self.recurrence_rule,
-            'reminder_minutes': self.reminder_minutes,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return self.serializer.dump(self)
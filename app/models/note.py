@@ -2,11 +2,37 @@
 Note Model - Markdown-based note-taking
 """
 from datetime import datetime
+from app.serializers import Schema, csv_list, iso
 from app import db
 
-class Note(db.Model):
+class NoteMixin:
+    """Serialization shared by Note and ArchivedNote"""
+
+    # Columns only sent when a single note is opened
+    FULL_TEXT_FIELDS = ('content', 'content_html')
+
+    @classmethod
+    def list_serializer(cls, fields=None):
+        """Schema for note lists: previews only, unless `fields` asks for the full text"""
+        if fields is None:
+            return cls.serializer.without(*cls.FULL_TEXT_FIELDS)
+        return cls.serializer.only(fields)
+
+    def to_dict(self, include_content=True):
+        """Convert note to dictionary"""
+        serializer = self.serializer if include_content else self.list_serializer()
+        return serializer.dump(self)
+
+class Note(NoteMixin, db.Model):
     """Note model for storing markdown notes"""
     __tablename__ = 'notes'
+    __table_args__ = (
+        # get_notes: filter on is_archived (and category), ordered by pinned then most recent
+        db.Index('ix_notes_archived_pinned_updated', 'is_archived', 'is_pinned', 'updated_at'),
+        db.Index('ix_notes_archived_category_pinned_updated', 'is_archived', 'category', 'is_pinned', 'updated_at'),
+        # Dashboard: most recently updated non-archived notes
+        db.Index('ix_notes_archived_updated', 'is_archived', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -17,20 +43,85 @@ class Note(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     is_pinned = db.Column(db.Boolean, default=False)
     is_archived = db.Column(db.Boolean, default=False)
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)  # Bumped by every save
+    # Rendering cache, refreshed by render_note() when the content hash changes
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the content rendered below
+    content_html = db.Column(db.Text, nullable=True)
+    preview_html = db.Column(db.Text, nullable=True)  # Rendered opening lines for note cards
+    preview = db.Column(db.Text, nullable=True)  # Plain-text excerpt
+
+    # Indexed copy of `tags`, kept in step by set_note_tags()
+    tag_index = db.relationship('NoteTag', backref='note', lazy=True, cascade='all, delete-orphan')
+    # Earlier versions, recorded on save. Not a foreign key: history stays
+    # put while the note itself moves to the archive tier and back
+    revisions = db.relationship(
+        'NoteRevision', primaryjoin='Note.id == foreign(NoteRevision.note_id)',
+        backref='note', lazy=True, cascade='all, delete-orphan'
+    )
+
+    serializer = Schema(
+        'id', 'title', 'content', 'content_html', 'preview', 'preview_html', 'category',
+        'is_pinned', 'is_archived', 'version', tags=csv_list, created_at=iso, updated_at=iso
+    )
+
+    # Updates are compare-and-swap on the version loaded; saves assign the next one
+    __mapper_args__ = {'version_id_col': version, 'version_id_generator': False}
 
     def __repr__(self):
         return f'<Note {self.title}>'
 
+class NoteTag(db.Model):
+    """One tag of a note, for tag filters and tag counts"""
+    __tablename__ = 'note_tags'
+    __table_args__ = (
+        # Tag filters: note ids per tag
+        db.Index('ix_note_tags_tag_name_note', 'tag_name', 'note_id'),
+        db.UniqueConstraint('note_id', 'tag_name', name='uq_note_tags_note_tag'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('notes.id'), nullable=False)
+    tag_name = db.Column(db.String(50), nullable=False)
+
+    serializer = Schema('id', 'note_id', 'tag_name')
+
+    def __repr__(self):
+        return f'<NoteTag {self.tag_name}>'
+
     def to_dict(self):
-        """Convert note to dictionary"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'category': self.category,
-            'tags': self.tags.split(',') if self.tags else [],
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'is_pinned': self.is_pinned,
-            'is_archived': self.is_archived
-        }
+        """Convert note tag to dictionary"""
+        return self.serializer.dump(self)
+
+class NoteRevision(db.Model):
+    """
+    An earlier version of a note.
+
+    `data` holds either the full content (a snapshot) or a reverse line
+    delta that turns the next newer revision's content, or the note's
+    current content, back into this one.
+    """
+    __tablename__ = 'note_revisions'
+    __table_args__ = (
+        db.UniqueConstraint('note_id', 'version', name='uq_note_revisions_note_version'),
+        # Reconstruction: nearest snapshot at or above a version
+        db.Index('ix_note_revisions_note_snapshot_version', 'note_id', 'is_snapshot', 'version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, nullable=False)  # notes.id or notes_archive.id
+    version = db.Column(db.Integer, nullable=False)  # Note version this content was saved as
+    title = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # Characters of content
+    is_snapshot = db.Column(db.Boolean, default=False, nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # When this version was saved
+
+    # The stored encoding is internal; revisions are read through revisions.revision_content()
+    serializer = Schema('id', 'note_id', 'version', 'title', 'size', 'is_snapshot', created_at=iso)
+
+    def __repr__(self):
+        return f'<NoteRevision {self.note_id} v{self.version}>'
+
+    def to_dict(self):
+        """Convert note revision to dictionary"""
+        return self.serializer.dump(self)
@@ -2,14 +2,20 @@
 Recipe Model - Recipe management and meal planning
 """
 from datetime import datetime
+from sqlalchemy.orm import selectinload
+from app.serializers import Nested, Pluck, Schema, iso
 from app import db
 
 class Recipe(db.Model):
     """Recipe model for storing recipes"""
     __tablename__ = 'recipes'
+    __table_args__ = (
+        db.Index('ix_recipes_category_name', 'category', 'name'),
+        db.Index('ix_recipes_cuisine_name', 'cuisine', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
+    name = db.Column(db.String(200), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     instructions = db.Column(db.Text, nullable=True)
     prep_time = db.Column(db.Integer, nullable=True)  # Minutes
@@ -26,68 +32,73 @@ class Recipe(db.Model):
     ingredients = db.relationship('RecipeIngredient', backref='recipe', lazy=True, cascade='all, delete-orphan')
     tags = db.relationship('RecipeTag', backref='recipe', lazy=True, cascade='all, delete-orphan')
 
+    serializer = Schema(
+        'id', 'name', 'description', 'instructions', 'prep_time', 'cook_time', 'servings',
+        'category', 'cuisine', 'difficulty', 'image_url',
+        created_at=iso, updated_at=iso, ingredients=Nested(), tags=Pluck('tag_name')
+    )
+
     def __repr__(self):
         return f'<Recipe {self.name}>'
 
+    @classmethod
+    def load_options(cls):
+        """Loader options for the relationships walked by to_dict()"""
+        return (selectinload(cls.ingredients), selectinload(cls.tags))
+
     def to_dict(self):
         """Convert recipe to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'instructions': self.instructions,
-            'prep_time': self.prep_time,
-            'cook_time': self.cook_time,
-            'servings': self.servings,
-            'category': self.category,
-            'cuisine': self.cuisine,
-            'difficulty': self.difficulty,
-            'image_url': self.image_url,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'ingredients': [i.to_dict() for i in self.ingredients],
-            'tags': [t.tag_name for t in self.tags]
-        }
+        return self.serializer.dump(self)
 
 class RecipeIngredient(db.Model):
     """Ingredients for recipes"""
     __tablename__ = 'recipe_ingredients'
 
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.String(50), nullable=True)
     unit = db.Column(db.String(50), nullable=True)
     notes = db.Column(db.String(200), nullable=True)
 
+    serializer = Schema('id', 'recipe_id', 'name', 'quantity', 'unit', 'notes')
+
     def __repr__(self):
         return f'<RecipeIngredient {self.name}>'
 
     def to_dict(self):
         """Convert ingredient to dictionary"""
-        return {
-            'id': self.id,
-            'recipe_id': self.recipe_id,
-            'name': self.name,
-            'quantity': self.quantity,
-            'unit': self.unit,
-            'notes': self.notes
-        }
+        return self.serializer.dump(self)
 
 class RecipeTag(db.Model):
     """Tags for recipes"""
     __tablename__ = 'recipe_tags'
+    __table_args__ = (
+        # Tag filters and tag facet counts
+        db.Index('ix_recipe_tags_tag_name_recipe', 'tag_name', 'recipe_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
     tag_name = db.Column(db.String(50), nullable=False)
 
+    serializer = Schema('id', 'recipe_id', 'tag_name')
+
     def __repr__(self):
         return f'<RecipeTag {self.tag_name}>'
 
+    def to_dict(self):
+        """Convert tag to dictionary"""
+        return self.serializer.dump(self)
+
 class ShoppingListItem(db.Model):
     """Shopping list items generated from recipes"""
     __tablename__ = 'shopping_list_items'
+    __table_args__ = (
+        db.Index('ix_shopping_list_items_category_name', 'category', 'name'),
+        # Aggregation: unpurchased items for an ingredient
+        db.Index('ix_shopping_list_items_key', 'item_key', 'is_purchased'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -95,21 +106,17 @@ class ShoppingListItem(db.Model):
     unit = db.Column(db.String(50), nullable=True)
     category = db.Column(db.String(50), nullable=True)
     is_purchased = db.Column(db.Boolean, default=False)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=True, index=True)
+    item_key = db.Column(db.String(150), nullable=True)  # Normalized ingredient and unit dimension, for merging
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    serializer = Schema(
+        'id', 'name', 'quantity', 'unit', 'category', 'is_purchased', 'recipe_id', created_at=iso
+    )
+
     def __repr__(self):
         return f'<ShoppingListItem {self.name}>'
 
     def to_dict(self):
         """Convert shopping list item to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'quantity': self.quantity,
-            'unit': self.unit,
-            'category': self.category,
-            'is_purchased': self.is_purchased,
-            'recipe_id': self.recipe_id,
-            'created_at': self.created_at.isoformat()
-        }
+        return self.serializer.dump(self)
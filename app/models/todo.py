@@ -2,11 +2,27 @@
 Todo Model - Task management with reminders
 """
 from datetime import datetime
+from sqlalchemy.orm import selectinload
+from app.serializers import Nested, Schema, SchemaMixin, iso
 from app import db
 
-class Todo(db.Model):
+class TodoMixin(SchemaMixin):
+    """Loading and serialization shared by Todo and ArchivedTodo"""
+
+    @classmethod
+    def load_options(cls):
+        """Loader options for the relationships walked by to_dict()"""
+        return (selectinload(cls.reminders),)
+
+class Todo(TodoMixin, db.Model):
     """Todo model for task management"""
     __tablename__ = 'todos'
+    __table_args__ = (
+        # get_todos and the dashboard: filter on status, ordered by priority DESC then due date
+        db.Index('ix_todos_status_priority_due', 'status', db.text('priority DESC'), 'due_date'),
+        db.Index('ix_todos_priority_due', db.text('priority DESC'), 'due_date'),
+        db.Index('ix_todos_weekly_day', 'is_weekly', 'week_day'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -24,48 +40,30 @@ class Todo(db.Model):
     # Relationship to reminders
     reminders = db.relationship('TodoReminder', backref='todo', lazy=True, cascade='all, delete-orphan')
 
+    serializer = Schema(
+        'id', 'title', 'description', 'priority', 'status', 'is_weekly', 'week_day', 'category',
+        due_date=iso, completed_at=iso, created_at=iso, updated_at=iso, reminders=Nested()
+    )
+
     def __repr__(self):
         return f'<Todo {self.title}>'
 
-    def to_dict(self):
-        """Convert todo to dictionary"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'priority': self.priority,
-            'status': self.status,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'is_weekly': self.is_weekly,
-            'week_day': self.week_day,
-            'category': self.category,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'reminders': [r.to_dict() for r in self.reminders]
-        }
-
-class TodoReminder(db.Model):
+class TodoReminder(SchemaMixin, db.Model):
     """Timer-based reminders for todos"""
     __tablename__ = 'todo_reminders'
+    __table_args__ = (
+        # Reminder dispatch: unsent reminders in due order
+        db.Index('ix_todo_reminders_pending', 'is_sent', 'reminder_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    todo_id = db.Column(db.Integer, db.ForeignKey('todos.id'), nullable=False)
+    todo_id = db.Column(db.Integer, db.ForeignKey('todos.id'), nullable=False, index=True)
     reminder_time = db.Column(db.DateTime, nullable=False)
     message = db.Column(db.String(200), nullable=True)
     is_sent = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    serializer = Schema('id', 'todo_id', 'message', 'is_sent', reminder_time=iso, created_at=iso)
+
     def __repr__(self):
         return f'<TodoReminder for Todo {self.todo_id}>'
-
-    def to_dict(self):
-        """Convert reminder to dictionary"""
-        return {
-            'id': self.id,
-            'todo_id': self.todo_id,
-            'reminder_time': self.reminder_time.isoformat(),
-            'message': self.message,
-            'is_sent': self.is_sent,
-            'created_at': self.created_at.isoformat()
-        }
@@ -2,17 +2,22 @@
 Travel Model - Trip planning and management
 """
 from datetime import datetime
+from sqlalchemy.orm import selectinload
+from app.serializers import Nested, Schema, iso
 from app import db
 
 class Trip(db.Model):
     """Trip model for travel planning"""
     __tablename__ = 'trips'
+    __table_args__ = (
+        db.Index('ix_trips_status_start', 'status', 'start_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     destination = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    start_date = db.Column(db.Date, nullable=False)
+    start_date = db.Column(db.Date, nullable=False, index=True)
     end_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default='planning')  # planning, confirmed, completed, cancelled
     budget = db.Column(db.Float, nullable=True)
@@ -20,34 +25,52 @@ class Trip(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
-    itineraries = db.relationship('Itinerary', backref='trip', lazy=True, cascade='all, delete-orphan')
-    packing_lists = db.relationship('PackingList', backref='trip', lazy=True, cascade='all, delete-orphan')
-    expenses = db.relationship('TravelExpense', backref='trip', lazy=True, cascade='all, delete-orphan')
+    itineraries = db.relationship(
+        'Itinerary', backref='trip', lazy=True, cascade='all, delete-orphan',
+        order_by='(Itinerary.day_number, Itinerary.start_time, Itinerary.id)'
+    )
+    packing_lists = db.relationship(
+        'PackingList', backref='trip', lazy=True, cascade='all, delete-orphan', order_by='PackingList.id'
+    )
+    expenses = db.relationship(
+        'TravelExpense', backref='trip', lazy=True, cascade='all, delete-orphan',
+        order_by='(TravelExpense.date, TravelExpense.id)'
+    )
+
+    serializer = Schema(
+        'id', 'name', 'destination', 'description', 'status', 'budget',
+        start_date=iso, end_date=iso, created_at=iso, updated_at=iso
+    )
 
     def __repr__(self):
         return f'<Trip {self.name}>'
 
+    @classmethod
+    def load_options(cls, include=('itineraries', 'packing_lists', 'expenses')):
+        """Loader options for the sub-resources in `include`"""
+        options = []
+        if 'itineraries' in include:
+            options.append(selectinload(cls.itineraries))
+        if 'packing_lists' in include:
+            options.append(selectinload(cls.packing_lists).selectinload(PackingList.items))
+        if 'expenses' in include:
+            options.append(selectinload(cls.expenses))
+        return tuple(options)
+
     def to_dict(self):
         """Convert trip to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'destination': self.destination,
-            'description': self.description,
-            'start_date': self.start_date.isoformat(),
-            'end_date': self.end_date.isoformat(),
-            'status': self.status,
-            'budget': self.budget,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return self.serializer.dump(self)
 
 class Itinerary(db.Model):
     """Daily itinerary for trips"""
     __tablename__ = 'itineraries'
+    __table_args__ = (
+        # A trip's itinerary in day order
+        db.Index('ix_itineraries_trip_day', 'trip_id', 'day_number', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=False)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=False, index=True)
     day_number = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date, nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -58,85 +81,78 @@ class Itinerary(db.Model):
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    serializer = Schema(
+        'id', 'trip_id', 'day_number', 'title', 'description', 'location', 'notes',
+        date=iso, start_time=iso, end_time=iso, created_at=iso
+    )
+
     def __repr__(self):
         return f'<Itinerary Day {self.day_number} - {self.title}>'
 
     def to_dict(self):
         """Convert itinerary to dictionary"""
-        return {
-            'id': self.id,
-            'trip_id': self.trip_id,
-            'day_number': self.day_number,
-            'date': self.date.isoformat(),
-            'title': self.title,
-            'description': self.description,
-            'location': self.location,
-            'start_time': self.start_time.isoformat() if self.start_time else None,
-            'end_time': self.end_time.isoformat() if self.end_time else None,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat()
-        }
+        return self.serializer.dump(self)
 
 class PackingList(db.Model):
     """Packing lists for trips (reusable templates)"""
     __tablename__ = 'packing_lists'
 
     id = db.Column(db.Integer, primary_key=True)
-    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=True, index=True)
     name = db.Column(db.String(200), nullable=False)
-    is_template = db.Column(db.Boolean, default=False)
+    is_template = db.Column(db.Boolean, default=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationship to packing items
     items = db.relationship('PackingItem', backref='packing_list', lazy=True, cascade='all, delete-orphan')
 
+    serializer = Schema('id', 'trip_id', 'name', 'is_template', created_at=iso, items=Nested())
+
     def __repr__(self):
         return f'<PackingList {self.name}>'
 
+    @classmethod
+    def load_options(cls):
+        """Loader options for the relationships walked by to_dict()"""
+        return (selectinload(cls.items),)
+
     def to_dict(self):
         """Convert packing list to dictionary"""
-        return {
-            'id': self.id,
-            'trip_id': self.trip_id,
-            'name': self.name,
-            'is_template': self.is_template,
-            'created_at': self.created_at.isoformat(),
-            'items': [i.to_dict() for i in self.items]
-        }
+        return self.serializer.dump(self)
 
 class PackingItem(db.Model):
     """Individual items in packing lists"""
     __tablename__ = 'packing_items'
 
     id = db.Column(db.Integer, primary_key=True)
-    packing_list_id = db.Column(db.Integer, db.ForeignKey('packing_lists.id'), nullable=False)
+    packing_list_id = db.Column(db.Integer, db.ForeignKey('packing_lists.id'), nullable=False, index=True)
     item_name = db.Column(db.String(200), nullable=False)
     category = db.Column(db.String(50), nullable=True)  # clothing, toiletries, electronics, documents, etc.
     quantity = db.Column(db.Integer, default=1)
     is_packed = db.Column(db.Boolean, default=False)
     notes = db.Column(db.String(200), nullable=True)
 
+    serializer = Schema('id', 'packing_list_id', 'item_name', 'category', 'quantity', 'is_packed', 'notes')
+
     def __repr__(self):
         return f'<PackingItem {self.item_name}>'
 
     def to_dict(self):
         """Convert packing item to dictionary"""
-        return {
-            'id': self.id,
-            'packing_list_id': self.packing_list_id,
-            'item_name': self.item_name,
-            'category': self.category,
-            'quantity': self.quantity,
-            'is_packed': self.is_packed,
-            'notes': self.notes
-        }
+        return self.serializer.dump(self)
 
 class TravelExpense(db.Model):
     """Track expenses for trips"""
     __tablename__ = 'travel_expenses'
+    __table_args__ = (
+        # Covers the expense rollups so analytics never reads the table rows
+        db.Index('ix_travel_expenses_rollup', 'trip_id', 'date', 'category', 'currency', 'amount'),
+        # A trip's expenses in date order
+        db.Index('ix_travel_expenses_trip_date', 'trip_id', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=False)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=False, index=True)
     description = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50), nullable=True)  # accommodation, food, transport, activities, etc.
@@ -145,19 +161,31 @@ class TravelExpense(db.Model):
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    serializer = Schema(
+        'id', 'trip_id', 'description', 'amount', 'category', 'currency', 'notes', date=iso, created_at=iso
+    )
+
     def __repr__(self):
         return f'<TravelExpense {self.description} - {self.amount}>'
 
     def to_dict(self):
         """Convert expense to dictionary"""
-        return {
-            'id': self.id,
-            'trip_id': self.trip_id,
-            'description': self.description,
-            'amount': self.amount,
-            'category': self.category,
-            'date': self.date.isoformat(),
-            'currency': self.currency,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat()
-        }
+        return self.serializer.dump(self)
+
+class CurrencyRate(db.Model):
+    """Exchange rates used to convert expenses into the base currency"""
+    __tablename__ = 'currency_rates'
+
+    id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), nullable=False, unique=True)
+    rate = db.Column(db.Float, nullable=False)  # Value of one unit in the base currency
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    serializer = Schema('id', 'currency', 'rate', updated_at=iso)
+
+    def __repr__(self):
+        return f'<CurrencyRate {self.currency} {self.rate}>'
+
+    def to_dict(self):
+        """Convert rate to dictionary"""
+        return self.serializer.dump(self)
@@ -0,0 +1,211 @@
+"""
+Calendar Recurrence - Server-side RRULE expansion with an occurrence cache
+
+Recurring series are expanded only inside the requested window and merged
+with one-off events into a single stream ordered by start time.
+Expanded occurrence starts are cached per (series, window); entries are
+validated against the series' updated_at so a cache populated by another
+worker never serves a stale series.
+"""
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from dateutil.rrule import rrulestr
+from sqlalchemy import or_
+from app.models.event import Event
+from app import db
+
+# Occurrences are computed on naive UTC datetimes, the same way they are stored
+_UNTIL_UTC_RE = re.compile(r'(UNTIL=\d{8}T\d{6})Z', re.IGNORECASE)
+
+CACHE_MAX_ENTRIES = 4096
+
+
+def to_naive_utc(value):
+    """Normalize an aware datetime to the naive UTC form used in the database"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_exdates(values):
+    """Normalize a list of ISO datetimes into the stored comma-separated form"""
+    if not values:
+        return None
+    if isinstance(values, str):
+        values = values.split(',')
+
+    parsed = [to_naive_utc(datetime.fromisoformat(v.strip().replace('Z', '+00:00'))) for v in values if v.strip()]
+    return ','.join(sorted(dt.isoformat() for dt in parsed)) or None
+
+
+def build_ruleset(rule, dtstart, exdates=None):
+    """
+    Parse an RRULE string anchored at dtstart.
+
+    Raises ValueError if the rule cannot be parsed.
+    """
+    rule = _UNTIL_UTC_RE.sub(r'\1', rule.strip())
+    ruleset = rrulestr(rule, dtstart=to_naive_utc(dtstart), forceset=True)
+
+    for exdate in exdates or []:
+        ruleset.exdate(datetime.fromisoformat(exdate))
+
+    return ruleset
+
+
+def compute_until(rule, dtstart):
+    """Start of the last occurrence of a bounded rule, or None if it never ends"""
+    if not re.search(r'\b(COUNT|UNTIL)=', rule, re.IGNORECASE):
+        return None
+
+    last = None
+    for last in build_ruleset(rule, dtstart):
+        pass
+    return last
+
+
+def next_reminder_at(event, after):
+    """
+    When the event's next reminder is due strictly after `after`, or None.
+
+    For a recurring series this is the reminder of the first occurrence
+    starting after `after` + reminder_minutes, skipping overridden ones
+    (override events carry their own reminder).
+    """
+    if event.reminder_minutes is None:
+        return None
+
+    lead = timedelta(minutes=event.reminder_minutes)
+    after = to_naive_utc(after)
+
+    if not (event.recurring and event.recurrence_rule) or event.recurrence_id is not None:
+        remind_at = to_naive_utc(event.start_time) - lead
+        return remind_at if remind_at > after else None
+
+    ruleset = build_ruleset(event.recurrence_rule, event.start_time, event.exdates_list())
+    if event.id is not None:
+        overridden = db.session.query(Event.recurrence_start).filter(
+            Event.recurrence_id == event.id,
+            Event.recurrence_start.isnot(None)
+        )
+        for (recurrence_start,) in overridden:
+            ruleset.exdate(recurrence_start)
+
+    occurrence = ruleset.after(after + lead)
+    return occurrence - lead if occurrence else None
+
+
+class OccurrenceCache:
+    """Bounded LRU of expanded occurrence starts keyed by (series, window)"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, series_id, window, version):
+        with self._lock:
+            entry = self._entries.get((series_id, window))
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end((series_id, window))
+            return entry[1]
+
+    def set(self, series_id, window, version, starts):
+        with self._lock:
+            self._entries[(series_id, window)] = (version, starts)
+            self._entries.move_to_end((series_id, window))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, series_id):
+        """Drop every cached window for a series"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == series_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+occurrence_cache = OccurrenceCache()
+
+
+def _series_starts(series, window_start, window_end, overridden):
+    """Occurrence starts of a series inside the window, served from the cache when possible"""
+    window = (window_start, window_end)
+    version = series.updated_at
+
+    starts = occurrence_cache.get(series.id, window, version)
+    if starts is None:
+        ruleset = build_ruleset(series.recurrence_rule, series.start_time, series.exdates_list())
+
+        # Occurrences replaced by an override event are emitted by the override itself
+        for recurrence_start in overridden:
+            ruleset.exdate(recurrence_start)
+
+        starts = tuple(ruleset.between(window_start, window_end, inc=True))
+        occurrence_cache.set(series.id, window, version, starts)
+
+    return starts
+
+
+def _occurrences(series, window_start, window_end, overridden):
+    """Serialized occurrences of one series, in start order"""
+    base = series.to_dict()
+    duration = series.end_time - series.start_time if series.end_time else None
+
+    for start in _series_starts(series, window_start, window_end, overridden):
+        occurrence = dict(base)
+        occurrence['start_time'] = start.isoformat()
+        occurrence['end_time'] = (start + duration).isoformat() if duration is not None else None
+        occurrence['series_id'] = series.id
+        occurrence['occurrence_start'] = start.isoformat()
+        yield start, occurrence
+
+
+def expand_events(window_start, window_end):
+    """
+    All events starting inside [window_start, window_end] as dictionaries.
+
+    One-off events and override events come straight from the table;
+    recurring series are expanded within the window and merged in.
+    """
+    window_start = to_naive_utc(window_start)
+    window_end = to_naive_utc(window_end)
+
+    single_events = Event.query.filter(
+        or_(Event.recurring.isnot(True), Event.recurrence_rule.is_(None), Event.recurrence_id.isnot(None)),
+        Event.start_time >= window_start,
+        Event.start_time <= window_end
+    ).order_by(Event.start_time).all()
+
+    series_list = Event.query.filter(
+        Event.recurring.is_(True),
+        Event.recurrence_rule.isnot(None),
+        Event.recurrence_id.is_(None),
+        Event.start_time <= window_end,
+        Event.recurrence_until.is_(None) | (Event.recurrence_until >= window_start)
+    ).all()
+
+    # Original starts replaced by override events, loaded for all series at once
+    overridden = {}
+    if series_list:
+        rows = db.session.query(Event.recurrence_id, Event.recurrence_start).filter(
+            Event.recurrence_id.in_([series.id for series in series_list]),
+            Event.recurrence_start.isnot(None)
+        ).all()
+        for series_id, recurrence_start in rows:
+            overridden.setdefault(series_id, []).append(recurrence_start)
+
+    streams = [((event.start_time, event.to_dict()) for event in single_events)]
+    streams.extend(
+        _occurrences(series, window_start, window_end, overridden.get(series.id, ()))
+        for series in series_list
+    )
+
+    return [occurrence for _, occurrence in heapq.merge(*streams, key=lambda item: item[0])]
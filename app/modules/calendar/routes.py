@@ -3,8 +3,15 @@ Calendar Routes - Calendar view and event management
 """
 from flask import render_template, request, jsonify
 from datetime import datetime, timedelta
+from sqlalchemy import inspect
 from app.modules.calendar import calendar_bp
+from app.modules.calendar.recurrence import (
+    build_ruleset, compute_until, expand_events, next_reminder_at, occurrence_cache, parse_exdates,
+    to_naive_utc
+)
 from app.models.event import Event
+from app.batch import apply_batch
+from app.conditional import conditional
 from app import db
 
 @calendar_bp.route('/')
@@ -13,11 +20,18 @@ def index():
     return render_template('calendar/index.html')
 
 @calendar_bp.route('/api/events', methods=['GET'])
+@conditional('events')
 def get_events():
     """Get events for calendar view"""
     start_date = request.args.get('start')
     end_date = request.args.get('end')
 
+    # Recurring series can only be expanded inside a bounded window
+    if start_date and end_date:
+        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        return jsonify(expand_events(start_dt, end_dt))
+
     query = Event.query
 
     if start_date:
@@ -31,17 +45,65 @@ def get_events():
     events = query.order_by(Event.start_time).all()
     return jsonify([event.to_dict() for event in events])
 
-@calendar_bp.route('/api/events', methods=['POST'])
-def create_event():
-    """Create a new event"""
-    data = request.get_json()
-
+def _apply_recurrence(event, data):
+    """
+    Set recurrence fields from request data.
+
+    Raises ValueError if the rule, exception dates or overridden series are invalid.
+    """
+    if 'recurring' in data:
+        event.recurring = data['recurring']
+
+    if 'recurrence_rule' in data:
+        event.recurrence_rule = data['recurrence_rule'] or None
+
+    if 'recurrence_exdates' in data:
+        event.recurrence_exdates = parse_exdates(data['recurrence_exdates'])
+
+    if 'recurrence_id' in data:
+        event.recurrence_id = data['recurrence_id']
+        if event.recurrence_id is not None:
+            series = db.session.get(Event, event.recurrence_id)
+            if series is None or not series.recurring or series.recurrence_id is not None:
+                raise ValueError('recurrence_id must reference a recurring series')
+            if not (data.get('recurrence_start') or event.recurrence_start):
+                raise ValueError('recurrence_start is required when overriding an occurrence')
+
+    if 'recurrence_start' in data:
+        event.recurrence_start = to_naive_utc(
+            datetime.fromisoformat(data['recurrence_start'].replace('Z', '+00:00'))
+        ) if data['recurrence_start'] else None
+
+    if event.recurring and event.recurrence_rule:
+        build_ruleset(event.recurrence_rule, event.start_time, event.exdates_list())
+        event.recurrence_until = compute_until(event.recurrence_rule, event.start_time)
+    else:
+        event.recurrence_until = None
+
+def _touch_series(series_id):
+    """Bump a series' updated_at so cached expansions in every worker are invalidated"""
+    if series_id is None:
+        return
+    series = db.session.get(Event, series_id)
+    if series is not None:
+        series.updated_at = datetime.utcnow()
+    occurrence_cache.invalidate(series_id)
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _build_event(data):
+    """
+    New Event from request data, touching the series it overrides.
+
+    Raises ValueError for invalid dates or recurrence settings.
+    """
     event = Event(
         title=data['title'],
         description=data.get('description'),
         location=data.get('location'),
-        start_time=datetime.fromisoformat(data['start_time'].replace('Z', '+00:00')),
-        end_time=datetime.fromisoformat(data['end_time'].replace('Z', '+00:00')) if data.get('end_time') else None,
+        start_time=_parse_datetime(data['start_time']),
+        end_time=_parse_datetime(data['end_time']) if data.get('end_time') else None,
         all_day=data.get('all_day', False),
         category=data.get('category'),
         color=data.get('color', '#3788d8'),
@@ -50,26 +112,26 @@ def create_event():
         reminder_minutes=data.get('reminder_minutes')
     )
 
-    db.session.add(event)
-    db.session.commit()
-
-    return jsonify(event.to_dict()), 201
+    _apply_recurrence(event, data)
+    event.reminder_at = next_reminder_at(event, datetime.utcnow())
+    _touch_series(event.recurrence_id)
+    return event
 
-@calendar_bp.route('/api/events/<int:event_id>', methods=['PUT'])
-def update_event(event_id):
-    """Update an event"""
-    event = Event.query.get_or_404(event_id)
-    data = request.get_json()
+def _update_event(event, data):
+    """
+    Apply request data to an existing Event and invalidate affected series.
 
+    Raises ValueError for invalid dates or recurrence settings.
+    """
     event.title = data.get('title', event.title)
     event.description = data.get('description', event.description)
     event.location = data.get('location', event.location)
 
     if 'start_time' in data:
-        event.start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
+        event.start_time = _parse_datetime(data['start_time'])
 
     if 'end_time' in data:
-        event.end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00')) if data['end_time'] else None
+        event.end_time = _parse_datetime(data['end_time']) if data['end_time'] else None
 
     if 'all_day' in data:
         event.all_day = data['all_day']
@@ -80,6 +142,66 @@ def update_event(event_id):
     if 'color' in data:
         event.color = data['color']
 
+    if 'reminder_minutes' in data:
+        event.reminder_minutes = data['reminder_minutes']
+
+    previous_series = event.recurrence_id
+
+    _apply_recurrence(event, data)
+    event.reminder_at = next_reminder_at(event, datetime.utcnow())
+
+    occurrence_cache.invalidate(event.id)
+    _touch_series(previous_series)
+    if event.recurrence_id != previous_series:
+        _touch_series(event.recurrence_id)
+
+def _delete_event(event):
+    """Delete an event along with the overrides of its occurrences"""
+    # Already removed with its series earlier in the same batch
+    if inspect(event).deleted:
+        return
+
+    # Overrides of a deleted series have nothing left to override
+    for override in Event.query.filter_by(recurrence_id=event.id).all():
+        db.session.delete(override)
+    # recurrence_id has no relationship to order the deletes by, so the
+    # overrides go first or the series row would violate their foreign key
+    db.session.flush()
+    _touch_series(event.recurrence_id)
+    occurrence_cache.invalidate(event.id)
+
+    db.session.delete(event)
+
+@calendar_bp.route('/api/events', methods=['POST'])
+def create_event():
+    """Create a new event"""
+    try:
+        event = _build_event(request.get_json())
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({'error': str(exc)}), 400
+
+    db.session.add(event)
+    db.session.commit()
+
+    return jsonify(event.to_dict()), 201
+
+@calendar_bp.route('/api/events/batch', methods=['POST'])
+def batch_events():
+    """Create, update and delete many events in one transaction"""
+    return apply_batch(Event, request.get_json(), build=_build_event, update=_update_event, delete=_delete_event)
+
+@calendar_bp.route('/api/events/<int:event_id>', methods=['PUT'])
+def update_event(event_id):
+    """Update an event"""
+    event = Event.query.get_or_404(event_id)
+
+    try:
+        _update_event(event, request.get_json())
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({'error': str(exc)}), 400
+
     db.session.commit()
 
     return jsonify(event.to_dict())
@@ -88,7 +210,7 @@ def update_event(event_id):
 def delete_event(event_id):
     """Delete an event"""
     event = Event.query.get_or_404(event_id)
-    db.session.delete(event)
+    _delete_event(event)
     db.session.commit()
 
     return '', 204
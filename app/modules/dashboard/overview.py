@@ -0,0 +1,123 @@
+"""
+Dashboard Overview - aggregated, cached landing page snapshot
+
+The overview is built once and cached as serialized JSON, with a second
+snapshot for `include_archived=true` (recent notes and the note count
+over both tiers). Each snapshot is keyed by the trigger-maintained
+`table_versions` of the tables it reads (one primary key lookup), so a
+write through any worker retires it everywhere. The key also rolls over
+every DASHBOARD_CACHE_TTL seconds for the time-relative "upcoming" window.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import defer
+from app import db
+from app.archive import TieredSchema, union_tiers
+from app.conditional import table_versions
+from app.models import Note, Todo, ArchivedNote
+from app.modules.calendar.recurrence import expand_events
+
+OVERVIEW_LIMIT = 5
+
+_TABLES = ('notes', 'events', 'todos', 'todo_reminders')
+_ARCHIVED_TABLES = _TABLES + ('notes_archive',)
+
+
+class OverviewCache:
+    """Single cached snapshot: (key, body, etag)"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != key:
+            return None
+        return snapshot
+
+    def set(self, key, body, etag):
+        with self._lock:
+            self._snapshot = (key, body, etag)
+        return self._snapshot
+
+
+overview_cache = OverviewCache()
+archived_overview_cache = OverviewCache()
+
+
+def _snapshot_key(tables):
+    """Versions of `tables` plus the current TTL bucket"""
+    versions = table_versions(tables)
+    parts = [f'{table}:{versions.get(table, (0, None))[0]}' for table in tables]
+    parts.append(str(int(time.time() // current_app.config['DASHBOARD_CACHE_TTL'])))
+    return '|'.join(parts)
+
+
+def _recent_notes_with_archive():
+    """Most recently updated notes, archived ones included, as list dicts"""
+    serializer = Note.list_serializer()
+    tiers = union_tiers(serializer, ArchivedNote, (Note.updated_at,))
+    rows = db.session.query(*tiers.c).order_by(tiers.c.updated_at.desc()).limit(OVERVIEW_LIMIT).all()
+    return TieredSchema(serializer, ArchivedNote.list_serializer()).dump_rows(rows)
+
+
+def build_overview(include_archived=False):
+    """Compute the dashboard payload"""
+    now = datetime.utcnow()
+    week_end = datetime.combine(now.date() + timedelta(days=7), datetime.max.time())
+
+    # Recurring series are expanded so their next occurrences show up too
+    upcoming_events = expand_events(now, week_end)
+
+    pending_todos = Todo.query.options(*Todo.load_options()).filter_by(
+        status='pending'
+    ).order_by(Todo.priority.desc()).limit(OVERVIEW_LIMIT).all()
+
+    if include_archived:
+        recent_notes = _recent_notes_with_archive()
+        count_notes = (
+            select(func.count(Note.id)).scalar_subquery()
+            + select(func.count(ArchivedNote.id)).scalar_subquery()
+        )
+    else:
+        recent_notes = [
+            note.to_dict(include_content=False)
+            for note in Note.query.options(defer(Note.content), defer(Note.content_html)).filter_by(
+                is_archived=False
+            ).order_by(Note.updated_at.desc()).limit(OVERVIEW_LIMIT)
+        ]
+        count_notes = select(func.count(Note.id)).where(Note.is_archived.is_(False)).scalar_subquery()
+
+    # All counts in a single statement
+    notes_count, pending_count = db.session.execute(select(
+        count_notes,
+        select(func.count(Todo.id)).where(Todo.status == 'pending').scalar_subquery(),
+    )).one()
+
+    return {
+        'upcoming_events': upcoming_events[:OVERVIEW_LIMIT],
+        'pending_todos': [t.to_dict() for t in pending_todos],
+        'recent_notes': recent_notes,
+        'counts': {
+            'upcoming_events': len(upcoming_events),
+            'pending_todos': pending_count,
+            'notes': notes_count,
+        },
+    }
+
+
+def get_overview_snapshot(include_archived=False):
+    """Cached (body, etag) for the overview, rebuilding it when its tables changed"""
+    cache, tables = (archived_overview_cache, _ARCHIVED_TABLES) if include_archived else (overview_cache, _TABLES)
+    key = _snapshot_key(tables)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        body = current_app.json.dumps(build_overview(include_archived)).encode('utf-8')
+        etag = hashlib.sha1(key.encode('utf-8') + b'|' + body).hexdigest()
+        snapshot = cache.set(key, body, etag)
+    return snapshot[1], snapshot[2]
@@ -1,11 +1,11 @@
 """
 Dashboard Routes
 """
-from flask import render_template, jsonify
-from datetime import datetime, timedelta
+from flask import render_template, request, Response
 from app.modules.dashboard import dashboard_bp
-from app.models import Note, Event, Todo
-from app import db
+from app.modules.dashboard.overview import get_overview_snapshot
+from app.archive import include_archived
+from app.query_budget import query_budget
 
 @dashboard_bp.route('/')
 def index():
@@ -13,25 +13,13 @@ def index():
     return render_template('dashboard/index.html')
 
 @dashboard_bp.route('/api/overview')
+@query_budget(8)
 def overview():
-    """Get dashboard overview data"""
-    today = datetime.utcnow().date()
-    week_from_now = today + timedelta(days=7)
+    """Get dashboard overview data (with archived notes if `include_archived=true`)"""
+    body, etag = get_overview_snapshot(include_archived())
 
-    # Get upcoming events
-    upcoming_events = Event.query.filter(
-        Event.start_time >= datetime.utcnow(),
-        Event.start_time <= datetime.combine(week_from_now, datetime.max.time())
-    ).order_by(Event.start_time).limit(5).all()
-
-    # Get pending todos
-    pending_todos = Todo.query.filter_by(status='pending').order_by(Todo.priority.desc()).limit(5).all()
-
-    # Get recent notes
-    recent_notes = Note.query.filter_by(is_archived=False).order_by(Note.updated_at.desc()).limit(5).all()
-
-    return jsonify({
-        'upcoming_events': [e.to_dict() for e in upcoming_events],
-        'pending_todos': [t.to_dict() for t in pending_todos],
-        'recent_notes': [n.to_dict() for n in recent_notes]
-    })
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients must revalidate, which costs a 304 while the snapshot is unchanged
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,10 +1,13 @@
 """
 Events Routes - Chronological list view of events
 """
-from flask import render_template, request, jsonify
+from flask import render_template
 from datetime import datetime
 from app.modules.events import events_bp
 from app.models.event import Event
+from app.conditional import conditional
+from app.pagination import paginate, page_response, requested_fields
+from app import db
 
 @events_bp.route('/')
 def index():
@@ -12,23 +15,29 @@ def index():
     return render_template('events/index.html')
 
 @events_bp.route('/api/events/upcoming', methods=['GET'])
+@conditional('events', time_bucket=60)
 def get_upcoming_events():
     """Get upcoming events in chronological order"""
-    limit = request.args.get('limit', 50, type=int)
+    fields = requested_fields()
 
-    events = Event.query.filter(
+    serializer = Event.serializer.only(fields)
+    query = db.session.query(*serializer.columns(Event.start_time)).filter(
         Event.start_time >= datetime.utcnow()
-    ).order_by(Event.start_time).limit(limit).all()
+    )
 
-    return jsonify([event.to_dict() for event in events])
+    events, next_cursor = paginate(query, [(Event.start_time, False), (Event.id, False)], default_limit=50)
+    return page_response(events, next_cursor, schema=serializer)
 
 @events_bp.route('/api/events/past', methods=['GET'])
+@conditional('events', time_bucket=60)
 def get_past_events():
     """Get past events"""
-    limit = request.args.get('limit', 50, type=int)
+    fields = requested_fields()
 
-    events = Event.query.filter(
+    serializer = Event.serializer.only(fields)
+    query = db.session.query(*serializer.columns(Event.start_time)).filter(
         Event.start_time < datetime.utcnow()
-    ).order_by(Event.start_time.desc()).limit(limit).all()
+    )
 
-    return jsonify([event.to_dict() for event in events])
+    events, next_cursor = paginate(query, [(Event.start_time, True), (Event.id, True)], default_limit=50)
+    return page_response(events, next_cursor, schema=serializer)
@@ -0,0 +1,217 @@
+"""
+Note Patches - delta-encoded note saves, coalesced into one note write
+
+PATCH /notes/api/notes/<id> sends only what changed, with text edits as
+splices against the version the client last saw. Content-only saves are
+appended to `note_patches`, a small insert-only log, so an autosave writes
+bytes proportional to the edit rather than the note. Once a note's edits
+pause (or after a maximum delay) the flusher folds its patches into the
+note row in one write, so rendering, the FTS index and the change log see
+one update per burst of autosaves. Anything that needs the full note row
+flushes that note first.
+"""
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.batch import VersionConflict
+from app.conditional import track_versions
+from app.models.note import Note
+from app.modules.notes.rendering import rendered_fields
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS note_patches (
+        note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+        version INTEGER NOT NULL,
+        ops TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (note_id, version)
+    ) WITHOUT ROWID
+"""
+
+# Only inserted while the note is still below the new version, so a patch
+# can never land on top of a save made elsewhere in the meantime
+_APPEND = """
+    INSERT INTO note_patches (note_id, version, ops, created_at)
+    SELECT :note_id, :version, :ops, :created_at
+    WHERE (SELECT version FROM notes WHERE id = :note_id) < :version
+    ON CONFLICT DO NOTHING
+"""
+
+
+def ensure_patch_log():
+    """Create the patch log and track its version for conditional GETs of a note"""
+    with db.engine.begin() as conn:
+        conn.execute(text(_SCHEMA))
+        track_versions(conn, 'note_patches')
+
+
+def apply_ops(content, ops):
+    """
+    Apply splices to `content` and return the result.
+
+    Each op is {"start": i, "end": j, "text": "..."} and replaces
+    content[i:j]. Offsets count UTF-16 code units, as JavaScript string
+    indices do, and refer to the unpatched content, so ops must be in order
+    and must not overlap. Raises ValueError for a malformed patch.
+    """
+    if not isinstance(ops, list):
+        raise ValueError('content_patch must be a list of {start, end, text} ops')
+
+    data = (content or '').encode('utf-16-le')
+    units = len(data) // 2
+    parts = []
+    position = 0
+
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError('content_patch must be a list of {start, end, text} ops')
+        start = op.get('start')
+        end = op.get('end', start)
+        insert = op.get('text', '')
+        if (not all(isinstance(value, int) and not isinstance(value, bool) for value in (start, end))
+                or not isinstance(insert, str)):
+            raise ValueError('Each content_patch op needs integer start and end and string text')
+        if not position <= start <= end <= units:
+            raise ValueError('content_patch ops must be in order, not overlap and lie within the content')
+
+        parts.append(data[position * 2:start * 2])
+        parts.append(insert.encode('utf-16-le', 'surrogatepass'))
+        position = end
+
+    parts.append(data[position * 2:])
+    try:
+        return b''.join(parts).decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise ValueError('content_patch splits a character') from None
+
+
+def _pending(note_id):
+    return db.session.execute(
+        text("SELECT version, ops, created_at FROM note_patches WHERE note_id = :note_id ORDER BY version"),
+        {'note_id': note_id}
+    ).all()
+
+
+def pending_version(note):
+    """The note's version counting its logged patches, as clients see it"""
+    latest = db.session.execute(
+        text("SELECT max(version) FROM note_patches WHERE note_id = :note_id"), {'note_id': note.id}
+    ).scalar()
+    return latest or note.version
+
+
+def append_patch(note, base_version, ops):
+    """
+    Log a content patch made against `base_version` without rewriting the
+    note. Returns the note's new version; raises VersionConflict or
+    ValueError.
+    """
+    pending = _pending(note.id)
+    version = pending[-1].version if pending else note.version
+    if base_version != version:
+        raise VersionConflict(version)
+
+    # Validate against the content the client saw
+    content = note.content
+    for _, stored, _ in pending:
+        content = apply_ops(content, json.loads(stored))
+    apply_ops(content, ops)
+
+    inserted = db.session.execute(text(_APPEND), {
+        'note_id': note.id,
+        'version': version + 1,
+        'ops': json.dumps(ops, ensure_ascii=False),
+        'created_at': datetime.utcnow().isoformat(sep=' ')
+    }).rowcount
+    if not inserted:
+        raise VersionConflict(version + 1)
+    return version + 1
+
+
+def patched_fields(note):
+    """
+    The note's columns with its logged patches applied, without writing
+    anything; None if it has no patches.
+    """
+    pending = _pending(note.id)
+    if not pending:
+        return None
+
+    content = note.content
+    for _, ops, _ in pending:
+        content = apply_ops(content, json.loads(ops))
+
+    return {
+        'content': content,
+        'version': pending[-1].version,
+        'updated_at': datetime.fromisoformat(pending[-1].created_at),
+        **rendered_fields(content)
+    }
+
+
+def flush_note_patches(note):
+    """Fold the note's logged patches into its content; returns whether there were any"""
+    fields = patched_fields(note)
+    if fields is None:
+        return False
+
+    for key, value in fields.items():
+        setattr(note, key, value)
+
+    db.session.execute(
+        text("DELETE FROM note_patches WHERE note_id = :note_id AND version <= :version"),
+        {'note_id': note.id, 'version': note.version}
+    )
+    return True
+
+
+def flush_patches(idle=0, max_age=0):
+    """
+    Flush notes whose last patch is older than `idle` seconds or whose first
+    is older than `max_age`, one commit per note (all notes by default).
+    Returns the number of notes flushed.
+    """
+    now = datetime.utcnow()
+    note_ids = db.session.execute(text("""
+        SELECT note_id FROM note_patches
+        GROUP BY note_id
+        HAVING max(created_at) <= :idle_before OR min(created_at) <= :age_before
+    """), {
+        'idle_before': (now - timedelta(seconds=idle)).isoformat(sep=' '),
+        'age_before': (now - timedelta(seconds=max_age)).isoformat(sep=' ')
+    }).scalars().all()
+
+    flushed = 0
+    for note_id in note_ids:
+        note = db.session.get(Note, note_id)
+        if note is not None and flush_note_patches(note):
+            db.session.commit()
+            flushed += 1
+    return flushed
+
+
+def start_patch_flusher(app):
+    """Flush paused note edits on a daemon thread; returns a stop event (None if disabled)"""
+    idle = app.config['NOTE_PATCH_FLUSH_DELAY']
+    if not idle:
+        return None
+
+    max_age = max(app.config['NOTE_PATCH_MAX_DELAY'], idle)
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(idle / 2):
+            try:
+                with app.app_context():
+                    flush_patches(idle, max_age)
+            except Exception:
+                logger.exception("Flushing note patches failed")
+
+    thread = threading.Thread(target=loop, name='note-patch-flusher', daemon=True)
+    thread.start()
+    return stop
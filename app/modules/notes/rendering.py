@@ -0,0 +1,110 @@
+"""
+Notes Rendering - server-side markdown with a content-hash keyed HTML cache
+
+Each note stores the HTML its content renders to, a rendered preview of the
+opening lines and a plain-text excerpt, together with the SHA-256 of the
+content they came from. Saving a note re-renders only when that hash
+changes, so lists ship short pre-rendered previews and never the full text.
+"""
+import hashlib
+import markdown
+from markupsafe import Markup
+from sqlalchemy import select, update
+from app.models.note import Note
+from app import db
+
+# Markdown source characters shown on a note card
+PREVIEW_CHARS = 400
+# Plain-text excerpt length
+EXCERPT_CHARS = 200
+
+# Same behaviour as the client's marked.parse(..., {breaks: true})
+_EXTENSIONS = ['nl2br', 'fenced_code', 'tables', 'sane_lists']
+
+RENDER_BATCH = 500
+
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def render_markdown(content):
+    """HTML for a markdown string"""
+    if not content:
+        return ''
+    return markdown.markdown(content, extensions=_EXTENSIONS)
+
+
+def _truncate(text, limit):
+    """Text cut at the last whitespace before `limit`, with an ellipsis if shortened"""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(' ')
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + '…'
+
+
+def _truncate_markdown(content, limit):
+    """Opening `limit` characters of markdown, preferring to end at a line break"""
+    if len(content) <= limit:
+        return content
+    cut = content[:limit]
+    newline = cut.rfind('\n')
+    if newline > limit // 2:
+        return cut[:newline]
+    return _truncate(content, limit)
+
+
+def rendered_fields(content):
+    """Cached columns for `content`: hash, HTML, preview HTML and plain-text excerpt"""
+    content = content or ''
+    html = render_markdown(content)
+    preview_source = _truncate_markdown(content, PREVIEW_CHARS)
+    return {
+        'content_hash': content_hash(content),
+        'content_html': html,
+        'preview_html': html if preview_source == content else render_markdown(preview_source),
+        'preview': _truncate(Markup(html).striptags(), EXCERPT_CHARS),
+    }
+
+
+def render_note(note):
+    """Refresh the note's cached HTML if its content changed; returns whether it did"""
+    digest = content_hash(note.content)
+    if note.content_hash == digest:
+        return False
+
+    for key, value in rendered_fields(note.content).items():
+        setattr(note, key, value)
+    return True
+
+
+def render_missing_notes():
+    """
+    Render notes that have no cached HTML (written before the cache existed
+    or imported without it), a batch per executemany. Returns the count.
+    """
+    rendered = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Note.id, Note.content, Note.updated_at, Note.version)
+            .where(Note.content_hash.is_(None), Note.id > last_id)
+            .order_by(Note.id)
+            .limit(RENDER_BATCH)
+        ).all()
+        if not rows:
+            break
+
+        # updated_at and version are passed through: the backfill is not an edit
+        db.session.execute(update(Note), [
+            {'id': row.id, 'updated_at': row.updated_at, 'version': row.version, **rendered_fields(row.content)}
+            for row in rows
+        ])
+        db.session.commit()
+        rendered += len(rows)
+        last_id = rows[-1].id
+
+    return rendered
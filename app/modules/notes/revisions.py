@@ -0,0 +1,287 @@
+"""
+Note Revisions - version history stored as reverse deltas with snapshots
+
+Every save that changes a note's title or content records the version it
+replaces in `note_revisions`. Most revisions hold a reverse line delta
+against the next newer content, so history grows with the size of the
+edits rather than of the note. A revision is stored as a full snapshot
+once the deltas since the last snapshot add up to the content's size or
+MAX_DELTA_CHAIN of them, so rebuilding any version reads at most one
+snapshot and a bounded run of deltas. Compaction thins old history to one
+revision per day, then per week, re-encoding the revisions it keeps.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from flask import current_app
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+from app.models.note import Note, NoteRevision
+from app.sqlite import maintenance_task
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Deltas between snapshots (bounds the work to rebuild a revision)
+MAX_DELTA_CHAIN = 50
+
+_SESSION_KEY = 'loom_note_revisions'
+
+_CHAIN = """
+    SELECT count(*), coalesce(sum(length(data)), 0) FROM note_revisions
+    WHERE note_id = :note_id AND version > coalesce(
+        (SELECT max(version) FROM note_revisions WHERE note_id = :note_id AND is_snapshot), 0
+    )
+"""
+
+
+def ensure_revision_log():
+    """
+    Rebuild a revision table created with a foreign key to notes, whose ON
+    DELETE CASCADE would drop the history of notes moved to the archive
+    tier. Its triggers are recreated by the version and change log setup.
+    """
+    table = NoteRevision.__table__
+    with db.engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM pragma_foreign_key_list('note_revisions')")).first() is None:
+            return
+
+        for index in table.indexes:
+            index.drop(bind=conn)
+        conn.execute(text("ALTER TABLE note_revisions RENAME TO note_revisions_old"))
+        table.create(bind=conn)
+        columns = ', '.join(column.name for column in table.columns)
+        conn.execute(text(f"INSERT INTO note_revisions ({columns}) SELECT {columns} FROM note_revisions_old"))
+        conn.execute(text("DROP TABLE note_revisions_old"))
+
+    logger.info("Rebuilt note_revisions without its foreign key to notes")
+
+
+def _lines(content):
+    return (content or '').splitlines(keepends=True)
+
+
+def line_delta(source, target):
+    """
+    Ops turning `source` into `target`: [start, end, text] replaces lines
+    start:end of `source` with `text`.
+    """
+    a, b = _lines(source), _lines(target)
+
+    # Trim the unchanged head and tail so the matcher only sees the edited region
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+
+    matcher = SequenceMatcher(None, a[prefix:len(a) - suffix], b[prefix:len(b) - suffix])
+    return [
+        [prefix + i1, prefix + i2, ''.join(b[prefix + j1:prefix + j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+    ]
+
+
+def apply_line_delta(source, ops):
+    """Content produced by applying line_delta() ops to `source`"""
+    lines = _lines(source)
+    parts = []
+    position = 0
+    for start, end, insert in ops:
+        parts.extend(lines[position:start])
+        parts.append(insert)
+        position = end
+    parts.extend(lines[position:])
+    return ''.join(parts)
+
+
+def _encode(revision, content, newer, chain_length, chain_size):
+    """Store `content` in the revision as a delta against `newer`, or as a snapshot; returns the delta size"""
+    content = content or ''
+    data = json.dumps(line_delta(newer, content), ensure_ascii=False)
+    revision.size = len(content)
+    if chain_length >= MAX_DELTA_CHAIN or chain_size + len(data) >= len(content):
+        revision.is_snapshot = True
+        revision.data = content
+        return None
+    revision.is_snapshot = False
+    revision.data = data
+    return len(data)
+
+
+def _committed(session, note, history, column):
+    """Value of a note column as last flushed"""
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return session.execute(select(column).where(Note.id == note.id)).scalar()
+
+
+def _record_revision(session, note):
+    state = inspect(note)
+    content_history = state.attrs.content.history
+    title_history = state.attrs.title.history
+    if not (content_history.has_changes() or title_history.has_changes()):
+        return
+
+    version = _committed(session, note, state.attrs.version.history, Note.version)
+    pending = session.info.setdefault(_SESSION_KEY, {})
+
+    # Saved twice within a transaction at the same version: re-base the
+    # revision already recorded on the newest content
+    if (note.id, version) in pending:
+        revision, content, chain_length, chain_size = pending[(note.id, version)]
+        _encode(revision, content, note.content, chain_length, chain_size)
+        return
+
+    content = _committed(session, note, content_history, Note.content)
+    chain_length, chain_size = session.execute(text(_CHAIN), {'note_id': note.id}).one()
+    revision = NoteRevision(
+        note_id=note.id,
+        version=version,
+        title=_committed(session, note, title_history, Note.title),
+        created_at=_committed(session, note, state.attrs.updated_at.history, Note.updated_at) or datetime.utcnow()
+    )
+    _encode(revision, content, note.content, chain_length, chain_size)
+    session.add(revision)
+    pending[(note.id, version)] = (revision, content, chain_length, chain_size)
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_revisions(session, flush_context, instances):
+    for obj in list(session.dirty):
+        if isinstance(obj, Note) and session.is_modified(obj):
+            _record_revision(session, obj)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_revisions(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def revision_content(note, version):
+    """
+    (revision, content) for one of the note's earlier versions, or None.
+    Rebuilt from the nearest snapshot at or above it, else from the note's
+    current content.
+    """
+    upper = db.session.execute(
+        select(NoteRevision.version).where(
+            NoteRevision.note_id == note.id, NoteRevision.is_snapshot.is_(True), NoteRevision.version >= version
+        ).order_by(NoteRevision.version).limit(1)
+    ).scalar()
+
+    query = NoteRevision.query.filter(NoteRevision.note_id == note.id, NoteRevision.version >= version)
+    if upper is not None:
+        query = query.filter(NoteRevision.version <= upper)
+    chain = query.order_by(NoteRevision.version.desc()).all()
+    if not chain or chain[-1].version != version:
+        return None
+
+    return chain[-1], _rebuild(note.content, chain)[-1]
+
+
+def _rebuild(content, revisions):
+    """Content of each revision in `revisions` (newest first), walking back from `content`"""
+    contents = []
+    for revision in revisions:
+        if revision.is_snapshot:
+            content = revision.data
+        else:
+            content = apply_line_delta(content, json.loads(revision.data))
+        contents.append(content)
+    return contents
+
+
+def _compaction_cutoffs(now):
+    """
+    (keep_all_after, daily_after): revisions newer than the first are all
+    kept, then the last of each day down to the second, then of each week
+    """
+    return (
+        now - timedelta(days=current_app.config['NOTE_REVISIONS_KEEP_ALL_DAYS']),
+        now - timedelta(days=current_app.config['NOTE_REVISIONS_KEEP_DAILY_DAYS'])
+    )
+
+
+def _bucket(created_at, daily_after):
+    if created_at >= daily_after:
+        return created_at.strftime('%Y-%m-%d')
+    return created_at.strftime('%Y-%W')
+
+
+def compact_note_revisions(note, now=None):
+    """
+    Thin a note's history to the compaction policy, re-encoding what is
+    kept. Returns the number of revisions removed (commit to keep them so).
+    """
+    now = now or datetime.utcnow()
+    keep_all_after, daily_after = _compaction_cutoffs(now)
+
+    revisions = NoteRevision.query.filter_by(note_id=note.id).order_by(NoteRevision.version.desc()).all()
+    contents = _rebuild(note.content, revisions)
+
+    # Newest first, so each day or week keeps its last version
+    kept = []
+    buckets = set()
+    for revision, content in zip(revisions, contents):
+        if revision.created_at >= keep_all_after:
+            kept.append((revision, content))
+            continue
+        bucket = _bucket(revision.created_at, daily_after)
+        if bucket in buckets:
+            db.session.delete(revision)
+        else:
+            buckets.add(bucket)
+            kept.append((revision, content))
+
+    removed = len(revisions) - len(kept)
+    if not removed:
+        return 0
+
+    # Re-encode oldest first against the next kept version, as if recorded in order
+    chain_length, chain_size = 0, 0
+    for i in reversed(range(len(kept))):
+        revision, content = kept[i]
+        newer = kept[i - 1][1] if i else note.content
+        size = _encode(revision, content, newer, chain_length, chain_size)
+        if size is None:
+            chain_length, chain_size = 0, 0
+        else:
+            chain_length, chain_size = chain_length + 1, chain_size + size
+
+    return removed
+
+
+@maintenance_task
+def compact_revisions(now=None):
+    """Compact the history of notes with more than one old revision per day or week, a commit per note"""
+    now = now or datetime.utcnow()
+    keep_all_after, daily_after = _compaction_cutoffs(now)
+    note_ids = db.session.execute(text("""
+        SELECT DISTINCT note_id FROM (
+            SELECT note_id, CASE WHEN created_at >= :daily_after
+                THEN strftime('%Y-%m-%d', created_at) ELSE strftime('%Y-%W', created_at) END AS bucket
+            FROM note_revisions WHERE created_at < :keep_all_after
+            GROUP BY note_id, bucket HAVING count(*) > 1
+        )
+    """), {
+        'keep_all_after': keep_all_after.isoformat(sep=' '),
+        'daily_after': daily_after.isoformat(sep=' ')
+    }).scalars().all()
+
+    removed = 0
+    for note_id in note_ids:
+        note = db.session.get(Note, note_id)
+        if note is not None:
+            removed += compact_note_revisions(note, now)
+            db.session.commit()
+
+    if removed:
+        logger.info(f"Compacted note history: removed {removed} revisions from {len(note_ids)} notes")
+    return removed
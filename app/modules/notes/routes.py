@@ -1,84 +1,400 @@
 """
 Notes Routes - CRUD operations for notes
 """
-from flask import render_template, request, jsonify
+import difflib
+from flask import abort, render_template, request, jsonify, current_app
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 from app.modules.notes import notes_bp
-from app.models.note import Note
+from app.modules.notes.patches import (
+    append_patch, apply_ops, flush_note_patches, patched_fields, pending_version
+)
+from app.modules.notes.rendering import render_note
+from app.modules.notes.revisions import revision_content
+from app.modules.notes.search import SearchSchema, build_match_query, search_hits
+from app.modules.notes.tags import set_note_tags, tag_counts, tag_filter
+from app.models.note import Note, NoteRevision
+from app.models.archive import ArchivedNote
+from app.archive import TieredSchema, include_archived, restore_note, union_tiers
+from app.batch import VersionConflict, apply_batch
+from app.conditional import conditional
+from app.pagination import list_arg, paginate, page_response, requested_fields
+from app.query_budget import query_budget
+from app.serializers import iso
 from app import db
 
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_PAGE_SIZE = 200
+
+# Fields a PATCH may change, and those that cannot be set to null
+EDITABLE_FIELDS = ('title', 'content', 'category', 'tags', 'is_pinned', 'is_archived')
+REQUIRED_FIELDS = ('title', 'is_pinned', 'is_archived')
+
 @notes_bp.route('/')
 def index():
     """Notes list page"""
     return render_template('notes/index.html')
 
 @notes_bp.route('/api/notes', methods=['GET'])
+@conditional('notes', 'note_tags', 'notes_archive')
 def get_notes():
-    """Get all notes"""
+    """
+    Get all notes, optionally with any (or `tag_match=all`, all) of
+    `tags=a,b`. Archived notes are left out unless `include_archived=true`.
+    """
     category = request.args.get('category')
     search = request.args.get('search')
+    tags = list_arg('tags')
+    tag_match = request.args.get('tag_match', 'any')
+    fields = requested_fields()
+
+    if tag_match not in ('any', 'all'):
+        return jsonify({'error': 'tag_match must be any or all'}), 400
+    match_all = tag_match == 'all'
+    archived = include_archived()
+
+    # The full-text index covers the hot table only
+    if search and current_app.config.get('NOTES_FTS_ENABLED') and not archived:
+        return _search_notes(search, category, tags, match_all, fields)
+
+    # Plain row tuples with pre-rendered previews; the full text is fetched per note
+    serializer = Note.list_serializer(fields)
+    filters = _note_filters(Note, category, tags, match_all, search)
+
+    if archived:
+        tiers = union_tiers(
+            serializer, ArchivedNote, (Note.is_pinned, Note.updated_at),
+            hot_where=filters, cold_where=_note_filters(ArchivedNote, category, tags, match_all, search)
+        )
+        notes, next_cursor = paginate(
+            db.session.query(*tiers.c), [(tiers.c.is_pinned, True), (tiers.c.updated_at, True), (tiers.c.id, True)]
+        )
+        return page_response(notes, next_cursor, schema=TieredSchema(serializer, ArchivedNote.list_serializer(fields)))
+
+    query = db.session.query(*serializer.columns(Note.is_pinned, Note.updated_at)).filter(
+        Note.is_archived.is_(False), *filters
+    )
 
-    query = Note.query.filter_by(is_archived=False)
+    notes, next_cursor = paginate(query, [(Note.is_pinned, True), (Note.updated_at, True), (Note.id, True)])
+    return page_response(notes, next_cursor, schema=serializer)
+
+def _note_filters(model, category, tags, match_all, search):
+    """WHERE clauses for the get_notes filters on Note or ArchivedNote"""
+    filters = []
 
     if category:
-        query = query.filter_by(category=category)
+        filters.append(model.category == category)
+
+    if tags:
+        filters.append(tag_filter(tags, match_all, model))
 
     if search:
-        query = query.filter(Note.title.contains(search) | Note.content.contains(search))
+        filters.append(model.title.contains(search) | model.content.contains(search))
+
+    return filters
+
+def _search_notes(search, category, tags, match_all, fields):
+    """Ranked full-text search returning highlighted snippets instead of content"""
+    match = build_match_query(search)
+    if not match:
+        return jsonify([])
+
+    hits = search_hits(match)
+    serializer = Note.list_serializer(fields)
+    query = db.session.query(*serializer.columns(), hits.c.score, hits.c.title_hl, hits.c.snippet).join(
+        hits, hits.c.id == Note.id
+    ).filter(Note.is_archived.is_(False), *_note_filters(Note, category, tags, match_all, None))
+
+    notes, next_cursor = paginate(
+        query, [(hits.c.score, False), (Note.id, False)],
+        default_limit=SEARCH_PAGE_SIZE, max_limit=MAX_SEARCH_PAGE_SIZE
+    )
+    return page_response(notes, next_cursor, schema=SearchSchema(serializer, fields))
 
-    notes = query.order_by(Note.is_pinned.desc(), Note.updated_at.desc()).all()
-    return jsonify([note.to_dict() for note in notes])
+@notes_bp.route('/api/tags', methods=['GET'])
+@conditional('notes', 'note_tags')
+@query_budget(1)
+def get_tags():
+    """Tag cloud: every tag with its number of non-archived notes, optionally by `prefix=`"""
+    return jsonify([{'tag': tag, 'count': count} for tag, count in tag_counts(request.args.get('prefix'))])
 
 @notes_bp.route('/api/notes/<int:note_id>', methods=['GET'])
+@conditional('notes', 'note_patches', 'notes_archive')
 def get_note(note_id):
-    """Get a specific note"""
-    note = Note.query.get_or_404(note_id)
-    return jsonify(note.to_dict())
+    """Get a specific note (from the archive tier if it was moved there)"""
+    note = db.session.get(Note, note_id)
+    if note is None:
+        return jsonify(ArchivedNote.query.get_or_404(note_id).to_dict())
 
-@notes_bp.route('/api/notes', methods=['POST'])
-def create_note():
-    """Create a new note"""
-    data = request.get_json()
+    return jsonify(_note_dict(note))
+
+def _note_dict(note):
+    """
+    to_dict() including the note's pending autosaves, so a note opened
+    mid-edit shows them; writing them is left to the patch flusher.
+    """
+    data = note.to_dict()
+    patched = patched_fields(note)
+    if patched is not None:
+        data.update((key, value) for key, value in patched.items() if key in data)
+        data['updated_at'] = iso(patched['updated_at'])
+    return data
+
+def _get_note_or_404(note_id):
+    """Note to write to, moved back from the archive tier if it was moved there"""
+    note = db.session.get(Note, note_id) or restore_note(note_id)
+    if note is None:
+        abort(404)
+    return note
+
+def _find_note_or_404(note_id):
+    """Note or ArchivedNote to read from"""
+    return db.session.get(Note, note_id) or ArchivedNote.query.get_or_404(note_id)
 
+def _build_note(data):
+    """New Note from request data"""
     note = Note(
         title=data.get('title', 'Untitled'),
         content=data.get('content', ''),
         category=data.get('category'),
-        tags=','.join(data.get('tags', [])) if isinstance(data.get('tags'), list) else data.get('tags'),
         is_pinned=data.get('is_pinned', False)
     )
+    set_note_tags(note, data.get('tags', []))
+    render_note(note)
+    return note
+
+def _update_note(note, data):
+    """
+    Apply request data to an existing Note, based on the data's `version`
+    if it has one. Returns whether any field changed.
+    """
+    if 'version' in data:
+        # Checked before anything changes, so a conflict leaves the pending patches alone
+        version = pending_version(note)
+        if data['version'] != version:
+            raise VersionConflict(version)
+
+    for key in REQUIRED_FIELDS:
+        if key in data and data[key] is None:
+            raise ValueError(f'{key} cannot be null')
+
+    flush_note_patches(note)
+
+    changed = False
+    for key in ('title', 'content', 'category', 'is_pinned', 'is_archived'):
+        if key in data and data[key] != getattr(note, key):
+            setattr(note, key, data[key])
+            changed = True
+
+    if 'tags' in data:
+        tags = note.tags
+        set_note_tags(note, data['tags'])
+        changed = changed or note.tags != tags
+
+    # A save that changes nothing keeps its version
+    if changed:
+        render_note(note)
+        note.version += 1
+    return changed
+
+@notes_bp.route('/api/notes', methods=['POST'])
+def create_note():
+    """Create a new note"""
+    try:
+        note = _build_note(request.get_json())
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     db.session.add(note)
     db.session.commit()
 
     return jsonify(note.to_dict()), 201
 
+@notes_bp.route('/api/notes/batch', methods=['POST'])
+def batch_notes():
+    """Create, update and delete many notes in one transaction"""
+    return apply_batch(Note, request.get_json(), build=_build_note, update=_update_note)
+
 @notes_bp.route('/api/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     """Update an existing note"""
-    note = Note.query.get_or_404(note_id)
+    note = _get_note_or_404(note_id)
+
+    try:
+        _update_note(note, request.get_json())
+    except VersionConflict as exc:
+        db.session.rollback()
+        return jsonify({'error': 'Note was changed by another save', 'version': exc.version}), 409
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        db.session.commit()
+    except StaleDataError:
+        return _version_conflict(note_id)
+
+    return jsonify(note.to_dict())
+
+def _version_conflict(note_id):
+    """409 with the note's current version, after a save lost the race to another one"""
+    db.session.rollback()
+    current = db.session.execute(select(Note.version).where(Note.id == note_id)).scalar()
+    return jsonify({'error': 'Note was changed by another save', 'version': current}), 409
+
+@notes_bp.route('/api/notes/<int:note_id>', methods=['PATCH'])
+def patch_note(note_id):
+    """
+    Update some fields of a note saved at `version`.
+
+    `content_patch` is a list of {start, end, text} splices against the
+    content at that version. Content-only patches are logged and folded
+    into the note once edits pause. Returns only the new version (unchanged
+    if nothing changed), or 409 with the current version if the note was
+    saved elsewhere meanwhile.
+    """
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
 
-    note.title = data.get('title', note.title)
-    note.content = data.get('content', note.content)
-    note.category = data.get('category', note.category)
+    base_version = data.get('version')
+    if isinstance(base_version, bool) or not isinstance(base_version, int):
+        return jsonify({'error': 'version is required'}), 400
+    if 'content' in data and 'content_patch' in data:
+        return jsonify({'error': 'Send content or content_patch, not both'}), 400
 
-    if 'tags' in data:
-        note.tags = ','.join(data['tags']) if isinstance(data['tags'], list) else data['tags']
+    note = _get_note_or_404(note_id)
+    ops = data.get('content_patch')
+    changes = {key: value for key, value in data.items() if key not in ('version', 'content_patch')}
 
-    if 'is_pinned' in data:
-        note.is_pinned = data['is_pinned']
+    unknown = sorted(changes.keys() - set(EDITABLE_FIELDS))
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
 
-    if 'is_archived' in data:
-        note.is_archived = data['is_archived']
+    try:
+        if ops is not None and not changes and current_app.config['NOTE_PATCH_FLUSH_DELAY']:
+            version = append_patch(note, base_version, ops)
+            written = True
+        else:
+            flushed = flush_note_patches(note)
+            if note.version != base_version:
+                raise VersionConflict(note.version)
+            if ops is not None:
+                changes['content'] = apply_ops(note.content, ops)
+            written = _update_note(note, changes) or flushed
+            version = note.version
 
-    db.session.commit()
+        if written:
+            db.session.commit()
+    except VersionConflict as exc:
+        db.session.rollback()
+        return jsonify({'error': 'Note was changed by another save', 'version': exc.version}), 409
+    except StaleDataError:
+        return _version_conflict(note_id)
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify({'error': str(exc)}), 400
+
+    return jsonify({'id': note_id, 'version': version})
+
+@notes_bp.route('/api/notes/<int:note_id>/revisions', methods=['GET'])
+@conditional('notes', 'note_revisions', 'notes_archive')
+def get_revisions(note_id):
+    """Earlier versions of a note, newest first (without their content)"""
+    _find_note_or_404(note_id)
+
+    serializer = NoteRevision.serializer
+    query = db.session.query(*serializer.columns()).filter(NoteRevision.note_id == note_id)
+    revisions, next_cursor = paginate(query, [(NoteRevision.version, True)])
+    return page_response(revisions, next_cursor, schema=serializer)
+
+def _version_content(note, version, patched=None):
+    """
+    (title, content) of the note at `version`, or None if that version is
+    not kept. `patched` is the note's patched_fields(), if it has any.
+    """
+    if patched is not None and version == patched['version']:
+        return note.title, patched['content']
+    if version == note.version:
+        return note.title, note.content
+    found = revision_content(note, version)
+    if found is None:
+        return None
+    revision, content = found
+    return revision.title, content
+
+@notes_bp.route('/api/notes/<int:note_id>/revisions/<int:version>', methods=['GET'])
+@conditional('notes', 'note_revisions', 'notes_archive')
+def get_revision(note_id, version):
+    """A note's title and content as of an earlier version"""
+    note = _find_note_or_404(note_id)
+
+    found = revision_content(note, version)
+    if found is None:
+        return jsonify({'error': 'Revision not found'}), 404
+
+    revision, content = found
+    return jsonify({**revision.to_dict(), 'content': content})
+
+@notes_bp.route('/api/notes/<int:note_id>/revisions/<int:version>/diff', methods=['GET'])
+@conditional('notes', 'note_revisions', 'note_patches', 'notes_archive')
+def diff_revision(note_id, version):
+    """Unified diff from an earlier version to `to=` (another version; the current one by default)"""
+    note = _find_note_or_404(note_id)
+    # Pending autosaves count as the current version without being written here
+    patched = patched_fields(note)
+    current = patched['version'] if patched is not None else note.version
+
+    to_version = request.args.get('to', current, type=int)
+    old, new = _version_content(note, version, patched), _version_content(note, to_version, patched)
+    if old is None or new is None:
+        return jsonify({'error': 'Revision not found'}), 404
+
+    # Lines without their endings, so a last line lacking a newline still diffs cleanly
+    diff = difflib.unified_diff(
+        (old[1] or '').splitlines(), (new[1] or '').splitlines(),
+        fromfile=f'v{version}', tofile=f'v{to_version}', lineterm=''
+    )
+    return jsonify({
+        'from': version,
+        'to': to_version,
+        'title': {'from': old[0], 'to': new[0]},
+        'diff': '\n'.join(diff)
+    })
+
+@notes_bp.route('/api/notes/<int:note_id>/revisions/<int:version>/restore', methods=['POST'])
+def restore_revision(note_id, version):
+    """
+    Save an earlier version's title and content as the note's newest
+    version; the version it replaces is kept in the history. Pass the
+    current `version` to get 409 instead if the note was saved meanwhile.
+    """
+    data = request.get_json(silent=True) or {}
+    note = _get_note_or_404(note_id)
+    flush_note_patches(note)
+
+    if 'version' in data and data['version'] != note.version:
+        db.session.rollback()
+        return jsonify({'error': 'Note was changed by another save', 'version': note.version}), 409
+
+    found = revision_content(note, version)
+    if found is None:
+        db.session.rollback()
+        return jsonify({'error': 'Revision not found'}), 404
+
+    revision, content = found
+    _update_note(note, {'title': revision.title, 'content': content})
+    try:
+        db.session.commit()
+    except StaleDataError:
+        return _version_conflict(note_id)
 
     return jsonify(note.to_dict())
 
 @notes_bp.route('/api/notes/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
     """Delete a note"""
-    note = Note.query.get_or_404(note_id)
+    note = _get_note_or_404(note_id)
     db.session.delete(note)
     db.session.commit()
 
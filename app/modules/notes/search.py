@@ -0,0 +1,146 @@
+"""
+Notes Search - SQLite FTS5 full-text index over note titles and content
+
+The index is an external-content FTS5 table shadowing `notes`, kept in
+sync by triggers so every write path (ORM or raw SQL) updates it.
+"""
+import logging
+import re
+from markupsafe import escape
+from sqlalchemy import Float, Integer, Text, column, text
+from sqlalchemy.exc import OperationalError
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# BM25 column weights: a hit in the title counts ten times a hit in the body
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 24
+
+# Control characters used as highlight markers so the snippet can be
+# HTML-escaped before the markers are turned into <mark> tags
+_MARK_OPEN = '\x02'
+_MARK_CLOSE = '\x03'
+
+_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def ensure_search_index():
+    """
+    Create the FTS5 table and sync triggers if missing.
+
+    Returns False when the SQLite build lacks FTS5, in which case search
+    falls back to LIKE matching.
+    """
+    try:
+        with db.engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+            )).first() is not None
+
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+
+            if not existed:
+                # Index notes that were written before the FTS table existed
+                conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+    except OperationalError as exc:
+        logger.warning(f"FTS5 unavailable, note search will use LIKE: {exc}")
+        return False
+
+    return True
+
+
+def build_match_query(search):
+    """
+    Translate user input into an FTS5 MATCH expression.
+
+    Quoted text becomes a phrase query, bare words become prefix queries so
+    results update as the user types. All terms must match.
+    """
+    terms = []
+    for phrase, word in _TOKEN_RE.findall(search):
+        if phrase.strip():
+            terms.append('"{}"'.format(phrase.replace('"', '""')))
+        elif word:
+            word = word.replace('"', '')
+            if word:
+                terms.append('"{}"*'.format(word))
+
+    return ' '.join(terms)
+
+
+def _to_html(marked):
+    """Escape a highlighted fragment and turn the markers into <mark> tags"""
+    if marked is None:
+        return None
+    return str(escape(marked)).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def search_hits(match):
+    """
+    Ranked hits for an FTS5 MATCH expression, as a subquery of (id, score,
+    title_hl, snippet) to join to `notes`. Lower scores rank higher (BM25);
+    the highlights carry markers turned into <mark> tags by SearchSchema.
+    """
+    statement = text(f"""
+        SELECT rowid AS id,
+               bm25(notes_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS score,
+               highlight(notes_fts, 0, :mark_open, :mark_close) AS title_hl,
+               snippet(notes_fts, 1, :mark_open, :mark_close, '…', {SNIPPET_TOKENS}) AS snippet
+        FROM notes_fts
+        WHERE notes_fts MATCH :match
+    """).bindparams(match=match, mark_open=_MARK_OPEN, mark_close=_MARK_CLOSE)
+
+    return statement.columns(
+        column('id', Integer), column('score', Float), column('title_hl', Text), column('snippet', Text)
+    ).subquery('hits')
+
+
+class SearchSchema:
+    """Dumps note rows joined to search_hits() with their highlighted title, snippet and score"""
+
+    FIELDS = ('title_highlight', 'snippet', 'score')
+
+    def __init__(self, schema, fields=None):
+        self.schema = schema
+        self.extras = [name for name in self.FIELDS if fields is None or name in fields]
+
+    def dump_rows(self, rows):
+        dumped = self.schema.dump_rows(rows)
+        for data, row in zip(dumped, rows):
+            hit = {'title_highlight': _to_html(row.title_hl), 'snippet': _to_html(row.snippet), 'score': row.score}
+            data.update((name, hit[name]) for name in self.extras)
+        return dumped
@@ -0,0 +1,174 @@
+"""
+Note Tags - normalized tag index with trigger-maintained tag counts
+
+`Note.tags` keeps the comma-separated string the API returns; `note_tags`
+holds one indexed row per (note, tag) so tag filters are index lookups.
+`note_tag_counts` holds the number of non-archived notes per tag and is
+maintained by triggers on `note_tags` and on archiving, so the tag cloud
+reads one row per tag instead of splitting every note's tags.
+"""
+from sqlalchemy import and_, func, or_, select, text
+from app.models.note import Note, NoteTag
+from app import db
+
+MAX_TAG_LENGTH = 50
+
+_LIVE_NOTE = "(SELECT coalesce(is_archived, 0) = 0 FROM notes WHERE id = {note_id})"
+
+_INCREMENT = """
+    INSERT INTO note_tag_counts (tag_name, count) SELECT {tag}, 1 WHERE {live}
+    ON CONFLICT (tag_name) DO UPDATE SET count = count + 1;
+"""
+_DECREMENT = """
+    UPDATE note_tag_counts SET count = count - 1 WHERE tag_name = {tag} AND {live};
+    DELETE FROM note_tag_counts WHERE tag_name = {tag} AND count <= 0;
+"""
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS note_tag_counts (
+        tag_name TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS note_tag_counts_ai AFTER INSERT ON note_tags BEGIN
+        {_INCREMENT.format(tag='new.tag_name', live=_LIVE_NOTE.format(note_id='new.note_id'))}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS note_tag_counts_ad AFTER DELETE ON note_tags BEGIN
+        {_DECREMENT.format(tag='old.tag_name', live=_LIVE_NOTE.format(note_id='old.note_id'))}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS note_tag_counts_au AFTER UPDATE OF tag_name, note_id ON note_tags BEGIN
+        {_DECREMENT.format(tag='old.tag_name', live=_LIVE_NOTE.format(note_id='old.note_id'))}
+        {_INCREMENT.format(tag='new.tag_name', live=_LIVE_NOTE.format(note_id='new.note_id'))}
+    END
+    """,
+    # Archived notes drop out of the counts and come back when restored
+    """
+    CREATE TRIGGER IF NOT EXISTS note_tag_counts_archive AFTER UPDATE OF is_archived ON notes
+    WHEN coalesce(old.is_archived, 0) != coalesce(new.is_archived, 0) BEGIN
+        UPDATE note_tag_counts SET count = count - 1
+        WHERE new.is_archived AND tag_name IN (SELECT tag_name FROM note_tags WHERE note_id = new.id);
+        DELETE FROM note_tag_counts WHERE count <= 0;
+        INSERT INTO note_tag_counts (tag_name, count)
+        SELECT tag_name, 1 FROM note_tags WHERE note_id = new.id AND NOT new.is_archived
+        ON CONFLICT (tag_name) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+_REBUILD = """
+    INSERT INTO note_tag_counts (tag_name, count)
+    SELECT note_tags.tag_name, count(*) FROM note_tags
+    JOIN notes ON notes.id = note_tags.note_id
+    WHERE coalesce(notes.is_archived, 0) = 0
+    GROUP BY note_tags.tag_name
+"""
+
+
+def ensure_tag_counts():
+    """Create the tag count table and its triggers, counting existing tags if it is new"""
+    with db.engine.begin() as conn:
+        existed = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_tag_counts'"
+        )).first() is not None
+
+        for statement in _SCHEMA:
+            conn.execute(text(statement))
+
+        if not existed:
+            conn.execute(text(_REBUILD))
+
+
+def parse_tags(value, strict=True):
+    """
+    Tag names from a list or a comma-separated string: trimmed, without
+    empties or duplicates, in the order given. Over-long names raise
+    ValueError, or are cut short when not `strict`.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, list):
+        raise ValueError('tags must be a list or a comma-separated string')
+
+    names = []
+    for name in value:
+        name = str(name).strip()
+        if len(name) > MAX_TAG_LENGTH:
+            if strict:
+                raise ValueError(f'Tag longer than {MAX_TAG_LENGTH} characters: {name[:20]}…')
+            name = name[:MAX_TAG_LENGTH].rstrip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def set_note_tags(note, value):
+    """Set a note's tags string and bring its indexed tag rows in step"""
+    names = parse_tags(value)
+    note.tags = ','.join(names) or None
+
+    # A new note has nothing to remove; skip loading its (empty) tag rows
+    current = {tag.tag_name: tag for tag in note.tag_index} if note.id is not None else {}
+    for name, tag in current.items():
+        if name not in names:
+            note.tag_index.remove(tag)
+    for name in names:
+        if name not in current:
+            note.tag_index.append(NoteTag(tag_name=name))
+
+
+def tag_filter(tags, match_all=False, model=Note):
+    """
+    WHERE clause on Note for notes having any (or all) of `tags`. Notes in
+    the archive tier have no tag rows, so for another `model` its tags
+    string is searched instead.
+    """
+    if model is not Note:
+        wrapped = ',' + model.tags + ','
+        matches = [func.instr(wrapped, f',{tag},') > 0 for tag in tags]
+        return and_(*matches) if match_all else or_(*matches)
+
+    tagged = select(NoteTag.note_id).where(NoteTag.tag_name.in_(tags))
+    if match_all and len(tags) > 1:
+        tagged = tagged.group_by(NoteTag.note_id).having(func.count(NoteTag.tag_name.distinct()) == len(tags))
+    return Note.id.in_(tagged)
+
+
+def tag_counts(prefix=None):
+    """[(tag, number of non-archived notes)] in tag order, optionally starting with `prefix`"""
+    sql = "SELECT tag_name, count FROM note_tag_counts"
+    params = {}
+    if prefix:
+        # A range on the primary key rather than LIKE, so the lookup stays indexed
+        sql += " WHERE tag_name >= :prefix AND tag_name < :prefix || char(1114111)"
+        params['prefix'] = prefix
+    sql += " ORDER BY tag_name"
+    return [tuple(row) for row in db.session.execute(text(sql), params)]
+
+
+def index_missing_tags():
+    """
+    Add tag rows for notes whose tags string has none (written before the
+    index existed or imported without it). Returns the number of notes.
+    """
+    notes = db.session.execute(
+        select(Note.id, Note.tags).where(
+            Note.tags.isnot(None), Note.tags != '',
+            Note.id.notin_(select(NoteTag.note_id))
+        )
+    ).all()
+
+    rows = []
+    for note_id, tags in notes:
+        rows.extend({'note_id': note_id, 'tag_name': name} for name in parse_tags(tags, strict=False))
+    if rows:
+        db.session.execute(NoteTag.__table__.insert(), rows)
+    db.session.commit()
+    return len(notes)
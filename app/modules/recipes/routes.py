@@ -1,9 +1,15 @@
 """
 Recipes Routes - Recipe management and shopping lists
 """
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, current_app
 from app.modules.recipes import recipes_bp
 from app.models.recipe import Recipe, RecipeIngredient, RecipeTag, ShoppingListItem
+from app.modules.recipes.search import facet_counts, recipe_filters
+from app.modules.recipes.shopping import add_recipes_to_list
+from app.batch import apply_batch
+from app.conditional import conditional
+from app.pagination import list_arg, paginate, page_response, requested_fields
+from app.query_budget import query_budget
 from app import db
 
 @recipes_bp.route('/')
@@ -12,38 +18,57 @@ def index():
     return render_template('recipes/index.html')
 
 @recipes_bp.route('/api/recipes', methods=['GET'])
+@conditional('recipes', 'recipe_ingredients', 'recipe_tags')
+@query_budget(3)
 def get_recipes():
-    """Get all recipes"""
-    category = request.args.get('category')
-    cuisine = request.args.get('cuisine')
-    search = request.args.get('search')
-
-    query = Recipe.query
-
-    if category:
-        query = query.filter_by(category=category)
-
-    if cuisine:
-        query = query.filter_by(cuisine=cuisine)
-
-    if search:
-        query = query.filter(Recipe.name.contains(search) | Recipe.description.contains(search))
-
-    recipes = query.order_by(Recipe.name).all()
-    return jsonify([recipe.to_dict() for recipe in recipes])
+    """Get all recipes, optionally filtered by search text, ingredients and tags"""
+    fields = requested_fields()
+
+    # Row tuples; ingredients and tags are loaded with one query each by dump_rows()
+    serializer = Recipe.serializer.only(fields)
+    query = db.session.query(*serializer.columns(Recipe.name)).filter(*_search_filters())
+
+    recipes, next_cursor = paginate(query, [(Recipe.name, False), (Recipe.id, False)])
+    return page_response(recipes, next_cursor, schema=serializer)
+
+@recipes_bp.route('/api/recipes/facets', methods=['GET'])
+@conditional('recipes', 'recipe_ingredients', 'recipe_tags')
+@query_budget(1)
+def get_recipe_facets():
+    """Recipe counts per category, cuisine, difficulty and tag for the same filters as the list"""
+    return jsonify(facet_counts(_search_filters()))
+
+def _search_filters():
+    """
+    Recipe filters from the query string: category, cuisine and difficulty
+    match exactly, `search` is full-text over every field, and every one of
+    `ingredients=flour,eggs` and `tags=quick,vegan` must be present.
+    """
+    clauses = []
+    for facet in ('category', 'cuisine', 'difficulty'):
+        value = request.args.get(facet)
+        if value:
+            clauses.append(getattr(Recipe, facet) == value)
+
+    clauses += recipe_filters(
+        search=request.args.get('search'),
+        ingredients=list_arg('ingredients'),
+        tags=list_arg('tags'),
+        fts_enabled=current_app.config.get('RECIPES_FTS_ENABLED', False)
+    )
+    return clauses
 
 @recipes_bp.route('/api/recipes/<int:recipe_id>', methods=['GET'])
+@conditional('recipes', 'recipe_ingredients', 'recipe_tags')
+@query_budget(3)
 def get_recipe(recipe_id):
     """Get a specific recipe"""
-    recipe = Recipe.query.get_or_404(recipe_id)
+    recipe = Recipe.query.options(*Recipe.load_options()).filter_by(id=recipe_id).first_or_404()
     return jsonify(recipe.to_dict())
 
-@recipes_bp.route('/api/recipes', methods=['POST'])
-def create_recipe():
-    """Create a new recipe"""
-    data = request.get_json()
-
-    recipe = Recipe(
+def _build_recipe(data):
+    """New Recipe (with its ingredients and tags) from request data"""
+    return Recipe(
         name=data['name'],
         description=data.get('description'),
         instructions=data.get('instructions'),
@@ -53,40 +78,21 @@ def create_recipe():
         category=data.get('category'),
         cuisine=data.get('cuisine'),
         difficulty=data.get('difficulty', 'medium'),
-        image_url=data.get('image_url')
-    )
-
-    db.session.add(recipe)
-    db.session.flush()
-
-    # Add ingredients
-    if 'ingredients' in data:
-        for ing_data in data['ingredients']:
-            ingredient = RecipeIngredient(
-                recipe_id=recipe.id,
+        image_url=data.get('image_url'),
+        ingredients=[
+            RecipeIngredient(
                 name=ing_data['name'],
                 quantity=ing_data.get('quantity'),
                 unit=ing_data.get('unit'),
                 notes=ing_data.get('notes')
             )
-            db.session.add(ingredient)
-
-    # Add tags
-    if 'tags' in data:
-        for tag_name in data['tags']:
-            tag = RecipeTag(recipe_id=recipe.id, tag_name=tag_name)
-            db.session.add(tag)
-
-    db.session.commit()
-
-    return jsonify(recipe.to_dict()), 201
-
-@recipes_bp.route('/api/recipes/<int:recipe_id>', methods=['PUT'])
-def update_recipe(recipe_id):
-    """Update a recipe"""
-    recipe = Recipe.query.get_or_404(recipe_id)
-    data = request.get_json()
+            for ing_data in data.get('ingredients', [])
+        ],
+        tags=[RecipeTag(tag_name=tag_name) for tag_name in data.get('tags', [])]
+    )
 
+def _update_recipe(recipe, data):
+    """Apply request data to an existing Recipe"""
     recipe.name = data.get('name', recipe.name)
     recipe.description = data.get('description', recipe.description)
     recipe.instructions = data.get('instructions', recipe.instructions)
@@ -97,6 +103,34 @@ def update_recipe(recipe_id):
     recipe.cuisine = data.get('cuisine', recipe.cuisine)
     recipe.difficulty = data.get('difficulty', recipe.difficulty)
 
+def _delete_recipe(recipe):
+    """Delete a recipe, keeping the shopping list items made from it"""
+    # Keep shopping list items, they just no longer point at a recipe
+    ShoppingListItem.query.filter_by(recipe_id=recipe.id).update({'recipe_id': None})
+
+    db.session.delete(recipe)
+
+@recipes_bp.route('/api/recipes', methods=['POST'])
+def create_recipe():
+    """Create a new recipe"""
+    recipe = _build_recipe(request.get_json())
+
+    # Ingredients and tags are inserted in the same flush as the recipe
+    db.session.add(recipe)
+    db.session.commit()
+
+    return jsonify(recipe.to_dict()), 201
+
+@recipes_bp.route('/api/recipes/batch', methods=['POST'])
+def batch_recipes():
+    """Create, update and delete many recipes in one transaction"""
+    return apply_batch(Recipe, request.get_json(), build=_build_recipe, update=_update_recipe, delete=_delete_recipe)
+
+@recipes_bp.route('/api/recipes/<int:recipe_id>', methods=['PUT'])
+def update_recipe(recipe_id):
+    """Update a recipe"""
+    recipe = Recipe.query.get_or_404(recipe_id)
+    _update_recipe(recipe, request.get_json())
     db.session.commit()
 
     return jsonify(recipe.to_dict())
@@ -105,35 +139,78 @@ def update_recipe(recipe_id):
 def delete_recipe(recipe_id):
     """Delete a recipe"""
     recipe = Recipe.query.get_or_404(recipe_id)
-    db.session.delete(recipe)
+    _delete_recipe(recipe)
     db.session.commit()
 
     return '', 204
 
 @recipes_bp.route('/api/shopping-list', methods=['GET'])
+@conditional('shopping_list_items')
+@query_budget(1)
 def get_shopping_list():
     """Get shopping list"""
-    items = ShoppingListItem.query.order_by(ShoppingListItem.category, ShoppingListItem.name).all()
-    return jsonify([item.to_dict() for item in items])
+    items, next_cursor = paginate(ShoppingListItem.query, [
+        (ShoppingListItem.category, False), (ShoppingListItem.name, False), (ShoppingListItem.id, False)
+    ])
+    return page_response(items, next_cursor, requested_fields())
+
+def _parse_servings(value):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError('servings must be a positive number')
+    return value
 
 @recipes_bp.route('/api/shopping-list/from-recipe/<int:recipe_id>', methods=['POST'])
 def add_recipe_to_shopping_list(recipe_id):
-    """Add recipe ingredients to shopping list"""
-    recipe = Recipe.query.get_or_404(recipe_id)
+    """Add recipe ingredients to shopping list, optionally scaled to `servings`"""
+    data = request.get_json(silent=True) or {}
 
-    for ingredient in recipe.ingredients:
-        item = ShoppingListItem(
-            name=ingredient.name,
-            quantity=ingredient.quantity,
-            unit=ingredient.unit,
-            recipe_id=recipe.id
-        )
-        db.session.add(item)
+    try:
+        servings = _parse_servings(data.get('servings'))
+        add_recipes_to_list([(recipe_id, servings)])
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except LookupError:
+        return jsonify({'error': 'Recipe not found'}), 404
 
     db.session.commit()
 
     return jsonify({'message': 'Ingredients added to shopping list'}), 201
 
+@recipes_bp.route('/api/shopping-list/from-recipes', methods=['POST'])
+@query_budget(7)
+def add_recipes_to_shopping_list():
+    """
+    Merge the ingredients of many recipes (e.g. a week's meal plan) into the shopping list.
+
+    Body: {"recipes": [{"id": 1, "servings": 4}, ...]}. Servings scale each
+    recipe from its own serving count. Returns the merged items written.
+    """
+    data = request.get_json(silent=True) or {}
+    requested = data.get('recipes')
+    if not isinstance(requested, list) or not requested:
+        return jsonify({'error': 'recipes must be a non-empty array'}), 400
+
+    selection = []
+    try:
+        for entry in requested:
+            if not isinstance(entry, dict) or isinstance(entry.get('id'), bool) or not isinstance(entry.get('id'), int):
+                raise ValueError('Each recipe needs an integer id')
+            selection.append((entry['id'], _parse_servings(entry.get('servings'))))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        items = add_recipes_to_list(selection)
+    except LookupError as exc:
+        return jsonify({'error': str(exc)}), 404
+
+    body = [item.to_dict() for item in items]
+    db.session.commit()
+
+    return jsonify(body), 201
+
 @recipes_bp.route('/api/shopping-list/<int:item_id>', methods=['DELETE'])
 def delete_shopping_item(item_id):
     """Delete a shopping list item"""
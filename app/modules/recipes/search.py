@@ -0,0 +1,194 @@
+"""
+Recipes Search - SQLite FTS5 index over recipes, their ingredients and tags
+
+One FTS5 row per recipe holds its name, description, instructions, the
+names of its ingredients and its tags. Triggers on all three tables keep
+it in sync, so "recipes with flour and eggs" is a single MATCH on the
+ingredients column instead of loading every recipe with its ingredients.
+Tag filters are exact and use the (tag_name, recipe_id) index, so they
+agree with the tag facet counts.
+"""
+import logging
+from sqlalchemy import Integer, func, literal, null, select, text, union_all
+from sqlalchemy.exc import OperationalError
+from app.models.recipe import Recipe, RecipeIngredient, RecipeTag
+from app.modules.notes.search import build_match_query
+from app import db
+
+logger = logging.getLogger(__name__)
+
+FACETS = ('category', 'cuisine', 'difficulty')
+
+_INGREDIENTS_SQL = "(SELECT group_concat(name, ' ') FROM recipe_ingredients WHERE recipe_id = {id})"
+_TAGS_SQL = "(SELECT group_concat(tag_name, ' ') FROM recipe_tags WHERE recipe_id = {id})"
+
+
+def _reindex_children(column, source, recipe_id):
+    return f"UPDATE recipes_fts SET {column} = {source.format(id=recipe_id)} WHERE rowid = {recipe_id};"
+
+
+_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        name, description, instructions, ingredients, tags,
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts(rowid, name, description, instructions, ingredients, tags)
+        VALUES (new.id, new.name, new.description, new.instructions,
+                {_INGREDIENTS_SQL.format(id='new.id')}, {_TAGS_SQL.format(id='new.id')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipes_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE OF name, description, instructions ON recipes BEGIN
+        UPDATE recipes_fts
+        SET name = new.name, description = new.description, instructions = new.instructions
+        WHERE rowid = new.id;
+    END
+    """,
+]
+
+# Ingredient and tag rows re-index the owning recipe's column
+for _table, _column, _source in (
+    ('recipe_ingredients', 'ingredients', _INGREDIENTS_SQL),
+    ('recipe_tags', 'tags', _TAGS_SQL),
+):
+    _SCHEMA += [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_{_column}_ai AFTER INSERT ON {_table} BEGIN
+            {_reindex_children(_column, _source, 'new.recipe_id')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_{_column}_ad AFTER DELETE ON {_table} BEGIN
+            {_reindex_children(_column, _source, 'old.recipe_id')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_{_column}_au AFTER UPDATE ON {_table} BEGIN
+            {_reindex_children(_column, _source, 'old.recipe_id')}
+            {_reindex_children(_column, _source, 'new.recipe_id')}
+        END
+        """,
+    ]
+
+_REBUILD = f"""
+    INSERT INTO recipes_fts(rowid, name, description, instructions, ingredients, tags)
+    SELECT id, name, description, instructions,
+           {_INGREDIENTS_SQL.format(id='recipes.id')}, {_TAGS_SQL.format(id='recipes.id')}
+    FROM recipes
+"""
+
+
+def ensure_search_index():
+    """
+    Create the FTS5 table and sync triggers if missing.
+
+    Returns False when the SQLite build lacks FTS5, in which case recipe
+    search falls back to LIKE matching.
+    """
+    try:
+        with db.engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+            )).first() is not None
+
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+
+            if not existed:
+                # Index recipes that were written before the FTS table existed
+                conn.execute(text(_REBUILD))
+    except OperationalError as exc:
+        logger.warning(f"FTS5 unavailable, recipe search will use LIKE: {exc}")
+        return False
+
+    return True
+
+
+def _phrase(value):
+    return '"{}"'.format(value.replace('"', '""'))
+
+
+def build_recipe_match(search=None, ingredients=()):
+    """
+    FTS5 MATCH expression for free text over every column plus ingredients
+    that must all appear in the ingredients column ("olive oil" is a phrase).
+    """
+    terms = []
+    if search:
+        terms.append(build_match_query(search))
+    terms += [f'ingredients : {_phrase(ingredient)}' for ingredient in ingredients]
+    return ' '.join(term for term in terms if term)
+
+
+def recipe_filters(search=None, ingredients=(), tags=(), fts_enabled=True):
+    """
+    WHERE clauses on Recipe for a text search, required ingredients and
+    required tags (all must match).
+    """
+    clauses = []
+
+    if fts_enabled:
+        match = build_recipe_match(search, ingredients)
+        if match:
+            matched = text("SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH :recipe_match").bindparams(
+                recipe_match=match
+            ).columns(rowid=Integer)
+            clauses.append(Recipe.id.in_(matched))
+    else:
+        if search:
+            clauses.append(Recipe.name.contains(search) | Recipe.description.contains(search))
+        for ingredient in ingredients:
+            clauses.append(Recipe.ingredients.any(RecipeIngredient.name.contains(ingredient)))
+
+    if tags:
+        tagged = select(RecipeTag.recipe_id).where(RecipeTag.tag_name.in_(tags)).group_by(
+            RecipeTag.recipe_id
+        ).having(func.count(RecipeTag.tag_name.distinct()) == len(tags))
+        clauses.append(Recipe.id.in_(tagged))
+
+    return clauses
+
+
+def facet_counts(clauses):
+    """
+    Recipe counts per category, cuisine, difficulty and tag among the
+    recipes matching `clauses`, in one query.
+
+    Returns {'total': n, 'category': {value: count}, ..., 'tags': {tag: count}}.
+    """
+    matched = select(Recipe.id, *[getattr(Recipe, facet) for facet in FACETS]).where(
+        *clauses
+    ).cte('matched').prefix_with('MATERIALIZED')
+
+    counts = [
+        select(literal('total').label('facet'), null().label('value'), func.count().label('count'))
+        .select_from(matched)
+    ]
+    counts += [
+        select(literal(facet), matched.c[facet], func.count())
+        .where(matched.c[facet].isnot(None))
+        .group_by(matched.c[facet])
+        for facet in FACETS
+    ]
+    counts.append(
+        select(literal('tags'), RecipeTag.tag_name, func.count(RecipeTag.recipe_id.distinct()))
+        .where(RecipeTag.recipe_id.in_(select(matched.c.id)))
+        .group_by(RecipeTag.tag_name)
+    )
+
+    result = {'total': 0, **{facet: {} for facet in FACETS}, 'tags': {}}
+    for facet, value, count in db.session.execute(union_all(*counts)):
+        if facet == 'total':
+            result['total'] = count
+        else:
+            result[facet][value] = count
+    return result
@@ -0,0 +1,289 @@
+"""
+Shopping List Aggregation - parse, normalize and merge recipe ingredients
+
+Ingredient quantities and units are free text. They are parsed into a
+number and a canonical unit (millilitres, grams or a plain count) so the
+same ingredient coming from many recipes, or already on the list, merges
+into one line. Ingredients that cannot be converted into each other
+(e.g. flour by volume and by weight) stay on separate lines.
+"""
+import re
+from collections import OrderedDict
+from fractions import Fraction
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
+from app.models.recipe import Recipe, ShoppingListItem
+from app import db
+
+# unit alias -> (dimension, factor to the canonical unit)
+_UNITS = {}
+
+for _aliases, _dimension, _factor in (
+    (('ml', 'milliliter', 'millilitre'), 'volume', 1),
+    (('l', 'liter', 'litre'), 'volume', 1000),
+    (('tsp', 'teaspoon', 't'), 'volume', 4.92892),
+    (('tbsp', 'tablespoon', 'tbs', 'tbl'), 'volume', 14.7868),
+    (('cup', 'c'), 'volume', 236.588),
+    (('fl oz', 'fluid ounce'), 'volume', 29.5735),
+    (('pint', 'pt'), 'volume', 473.176),
+    (('quart', 'qt'), 'volume', 946.353),
+    (('gallon', 'gal'), 'volume', 3785.41),
+    (('g', 'gram', 'gramme'), 'mass', 1),
+    (('kg', 'kilogram', 'kilo'), 'mass', 1000),
+    (('mg', 'milligram'), 'mass', 0.001),
+    (('oz', 'ounce'), 'mass', 28.3495),
+    (('lb', 'pound'), 'mass', 453.592),
+    (('', 'piece', 'pc', 'each', 'ea', 'whole', 'x'), 'count', 1),
+):
+    for _alias in _aliases:
+        _UNITS[_alias] = (_dimension, _factor)
+
+# Canonical unit shown for each dimension, and the larger unit used past 1000
+_DISPLAY_UNITS = {'volume': ('ml', 'l'), 'mass': ('g', 'kg'), 'count': (None, None)}
+
+_UNICODE_FRACTIONS = {'¼': '1/4', '½': '1/2', '¾': '3/4', '⅓': '1/3', '⅔': '2/3', '⅛': '1/8'}
+_QUANTITY_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)?\s*(\d+/\d+)?\s*(?:(?:-|to)\s*([\d./\s]+))?\s*$')
+
+
+def parse_quantity(text):
+    """
+    Numeric value of a free-text quantity ("2", "1.5", "1 1/2", "½", "2-3"), or None.
+
+    Ranges use their upper bound so the list never comes up short.
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return Fraction(text).limit_denominator(1000)
+
+    text = str(text).strip().lower()
+    for symbol, fraction in _UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f' {fraction}')
+
+    match = _QUANTITY_RE.match(text)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+
+    whole, fraction, upper = match.groups()
+    if upper:
+        return parse_quantity(upper)
+
+    value = Fraction(whole) if whole else Fraction(0)
+    if fraction:
+        value += Fraction(fraction)
+    return value
+
+
+def normalize_unit(unit):
+    """(dimension, factor to canonical) for a unit string, or None if unknown"""
+    unit = (unit or '').strip().lower().rstrip('.')
+    if unit in _UNITS:
+        return _UNITS[unit]
+    # Plurals: cups, tbsps, pounds, pieces, ...
+    if unit.endswith('es') and unit[:-2] in _UNITS:
+        return _UNITS[unit[:-2]]
+    if unit.endswith('s') and unit[:-1] in _UNITS:
+        return _UNITS[unit[:-1]]
+    return None
+
+
+def ingredient_key(name):
+    """Case- and plural-insensitive form of an ingredient name"""
+    words = re.sub(r'\s+', ' ', name.strip().lower()).split(' ')
+    last = words[-1]
+    if last.endswith('ies') and len(last) > 4:
+        last = last[:-3] + 'y'
+    elif last.endswith('oes'):
+        last = last[:-2]
+    elif last.endswith('s') and not last.endswith('ss') and len(last) > 3:
+        last = last[:-1]
+    words[-1] = last
+    return ' '.join(words)
+
+
+def _format_number(value):
+    value = round(float(value), 2)
+    return str(int(value)) if value == int(value) else f'{value:g}'
+
+
+class ShoppingAggregate:
+    """One merged shopping list line"""
+
+    def __init__(self, key, name, dimension, unit):
+        self.key = key
+        self.name = name
+        self.dimension = dimension
+        self.unit = unit  # Shown as-is for units we cannot convert
+        self.amount = Fraction(0)  # In the canonical unit
+        self.units = {}  # Conversion factor -> unit as first written
+        self.texts = []  # Quantities that could not be parsed
+        self.recipe_ids = set()
+        self.unattributed = False  # Folds in a row not credited to a single recipe
+        self.category = None
+
+    def add(self, quantity, unit, factor, recipe_id=None, scale=1):
+        # Merged lines are stored as "2 + to taste"; split them back up
+        parts = quantity.split(' + ') if isinstance(quantity, str) else [quantity]
+        for part in parts:
+            value = parse_quantity(part)
+            if value is not None:
+                self.amount += value * Fraction(scale).limit_denominator(1000) * Fraction(factor).limit_denominator(100000)
+                self.units.setdefault(factor, _clean_unit(unit))
+            elif part and part not in self.texts:
+                self.texts.append(str(part))
+        if recipe_id is not None:
+            self.recipe_ids.add(recipe_id)
+        else:
+            self.unattributed = True
+
+    @property
+    def recipe_id(self):
+        """The one recipe every part of the line came from, or None"""
+        if self.unattributed or len(self.recipe_ids) != 1:
+            return None
+        return next(iter(self.recipe_ids))
+
+    def quantity_and_unit(self):
+        """Display quantity and unit, keeping the original unit when every part used the same one"""
+        parts = []
+        unit = self.unit
+
+        if self.amount:
+            amount = self.amount
+            if self.dimension in _DISPLAY_UNITS:
+                if len(self.units) == 1 and self.dimension != 'count':
+                    factor, unit = next(iter(self.units.items()))
+                    amount /= Fraction(factor).limit_denominator(100000)
+                else:
+                    unit, large = _DISPLAY_UNITS[self.dimension]
+                    if large and amount >= 1000:
+                        amount, unit = amount / 1000, large
+            parts.append(_format_number(amount))
+
+        parts.extend(self.texts)
+        return (' + '.join(parts) or None), unit
+
+
+def _clean_unit(unit):
+    return (unit or '').strip().lower()
+
+
+def line_key(name, unit):
+    """(merge key, dimension, conversion factor, whether the unit is known) for an ingredient"""
+    normalized = normalize_unit(unit)
+    # Unknown units only merge with the same unit
+    dimension, factor = normalized or (f'unit:{ingredient_key(_clean_unit(unit))}', 1)
+    return f'{ingredient_key(name)}|{dimension}', dimension, factor, normalized is not None
+
+
+def aggregate(entries, existing=()):
+    """
+    Merge ingredient entries into shopping list lines.
+
+    `entries` are (name, quantity, unit, recipe_id, scale) tuples;
+    `existing` are ShoppingListItem rows whose quantities are folded in
+    first. Returns {key: ShoppingAggregate} in first-seen order.
+    """
+    lines = OrderedDict()
+
+    def add(name, quantity, unit, recipe_id, scale):
+        key, dimension, factor, known = line_key(name, unit)
+        if key not in lines:
+            lines[key] = ShoppingAggregate(key, name.strip(), dimension, None if known else unit)
+        lines[key].add(quantity, unit, factor, recipe_id, scale)
+        return lines[key]
+
+    for item in existing:
+        line = add(item.name, item.quantity, item.unit, item.recipe_id, 1)
+        line.category = line.category or item.category
+
+    for name, quantity, unit, recipe_id, scale in entries:
+        add(name, quantity, unit, recipe_id, scale)
+
+    return lines
+
+
+def add_recipes_to_list(selection):
+    """
+    Merge the ingredients of the selected recipes into the shopping list.
+
+    `selection` is a list of (recipe id, servings wanted or None for the
+    recipe's own); a recipe may appear more than once. Unpurchased items
+    for the same ingredient are updated in place and duplicates among them
+    folded together, using one executemany each for inserts and updates.
+    Returns the resulting shopping list items for those ingredients.
+    Raises LookupError if a recipe does not exist.
+    """
+    recipe_ids = {recipe_id for recipe_id, _ in selection}
+    recipes = {
+        recipe.id: recipe
+        for recipe in Recipe.query.options(selectinload(Recipe.ingredients)).filter(Recipe.id.in_(recipe_ids))
+    }
+    missing = recipe_ids - set(recipes)
+    if missing:
+        raise LookupError(f"Recipe {', '.join(map(str, sorted(missing)))} not found")
+
+    entries = []
+    for recipe_id, servings in selection:
+        recipe = recipes[recipe_id]
+        scale = Fraction(servings).limit_denominator(1000) / recipe.servings if servings and recipe.servings else 1
+        entries.extend(
+            (ingredient.name, ingredient.quantity, ingredient.unit, recipe.id, scale)
+            for ingredient in recipe.ingredients
+        )
+
+    keys = {line_key(name, unit)[0] for name, _, unit, _, _ in entries}
+
+    candidates = ShoppingListItem.query.filter(
+        ShoppingListItem.is_purchased.is_(False),
+        ShoppingListItem.item_key.in_(keys) | ShoppingListItem.item_key.is_(None)
+    ).order_by(ShoppingListItem.id).all()
+
+    existing = {}
+    backfill = {}  # Items from before keys were stored get theirs now
+    for item in candidates:
+        key = item.item_key or line_key(item.name, item.unit)[0]
+        if item.item_key is None:
+            backfill[item.id] = (item, key)
+        if key in keys:
+            existing.setdefault(key, []).append(item)
+
+    lines = aggregate(entries, [item for items in existing.values() for item in items])
+
+    inserts, updates, duplicates = [], [], []
+    for key, line in lines.items():
+        quantity, unit = line.quantity_and_unit()
+        values = {
+            'quantity': quantity,
+            'unit': unit,
+            'recipe_id': line.recipe_id,
+            'item_key': key
+        }
+
+        items = existing.get(key)
+        if items:
+            updates.append({'id': items[0].id, **values})
+            duplicates.extend(item.id for item in items[1:])
+            for item in items:
+                backfill.pop(item.id, None)
+        else:
+            inserts.append({'name': line.name, 'category': line.category, **values})
+
+    # Same columns as the merged rows so all updates share one executemany
+    updates.extend(
+        {'id': item.id, 'quantity': item.quantity, 'unit': item.unit, 'recipe_id': item.recipe_id, 'item_key': key}
+        for item, key in backfill.values()
+    )
+
+    if duplicates:
+        ShoppingListItem.query.filter(ShoppingListItem.id.in_(duplicates)).delete(synchronize_session=False)
+    if updates:
+        db.session.execute(update(ShoppingListItem), updates)
+    if inserts:
+        # Keep NULL columns in the statement so every row shares one executemany
+        db.session.execute(insert(ShoppingListItem).execution_options(render_nulls=True), inserts)
+
+    return ShoppingListItem.query.execution_options(populate_existing=True).filter(
+        ShoppingListItem.is_purchased.is_(False),
+        ShoppingListItem.item_key.in_(keys)
+    ).order_by(ShoppingListItem.id).all()
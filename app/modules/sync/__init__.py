@@ -0,0 +1,8 @@
+"""
+Sync Module - Delta sync for clients with a local cache
+"""
+from flask import Blueprint
+
+sync_bp = Blueprint('sync', __name__)
+
+from app.modules.sync import routes
@@ -0,0 +1,103 @@
+"""
+Sync Change Log - trigger-maintained log of row changes for delta sync
+
+Every insert, update and delete on a model table writes a row to
+`change_log` with a monotonically increasing `seq`. Older entries for the
+same row are removed by the trigger, so the log holds one entry per live
+row plus one tombstone per deleted row. Tombstones older than the
+retention period are pruned; the highest pruned seq is the horizon below
+which a client watermark can no longer be served incrementally.
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.sqlite import maintenance_task
+
+logger = logging.getLogger(__name__)
+
+_CHANGED_AT = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS {table}_changelog_{op} AFTER {op} ON {table} BEGIN
+        DELETE FROM change_log WHERE table_name = '{table}' AND row_id = {ref}.id;
+        INSERT INTO change_log (table_name, row_id, op, changed_at)
+        VALUES ('{table}', {ref}.id, '{kind}', {changed_at});
+    END
+"""
+
+
+def ensure_change_log():
+    """Create the change log, its triggers, and backfill rows written before it existed"""
+    with db.engine.begin() as conn:
+        existed = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'"
+        )).first() is not None
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at TEXT NOT NULL
+            )
+        """))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_change_log_row ON change_log (table_name, row_id)"
+        ))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS change_log_horizon (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL
+            )
+        """))
+        conn.execute(text("INSERT OR IGNORE INTO change_log_horizon (id, seq) VALUES (1, 0)"))
+
+        for table in db.metadata.sorted_tables:
+            for op, ref, kind in (('INSERT', 'new', 'upsert'), ('UPDATE', 'new', 'upsert'), ('DELETE', 'old', 'delete')):
+                conn.execute(text(_TRIGGER.format(
+                    table=table.name, op=op, ref=ref, kind=kind, changed_at=_CHANGED_AT
+                )))
+
+            if not existed:
+                conn.execute(text(
+                    f"INSERT OR IGNORE INTO change_log (table_name, row_id, op, changed_at) "
+                    f"SELECT '{table.name}', id, 'upsert', {_CHANGED_AT} FROM {table.name}"
+                ))
+
+
+def horizon():
+    """Lowest watermark that can still be synced incrementally"""
+    return db.session.execute(text("SELECT seq FROM change_log_horizon WHERE id = 1")).scalar() or 0
+
+
+def changes_since(since, limit):
+    """Up to `limit` change log entries after `since`, in sequence order"""
+    return db.session.execute(text(
+        "SELECT seq, table_name, row_id, op FROM change_log WHERE seq > :since ORDER BY seq LIMIT :limit"
+    ), {'since': since, 'limit': limit}).all()
+
+
+@maintenance_task
+def prune_tombstones(retention_days=None):
+    """Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS and advance the horizon past them"""
+    if retention_days is None:
+        retention_days = current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS']
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat(sep=' ')
+
+    with db.engine.begin() as conn:
+        pruned = conn.execute(text(
+            "SELECT MAX(seq) FROM change_log WHERE op = 'delete' AND changed_at < :cutoff"
+        ), {'cutoff': cutoff}).scalar()
+        if pruned is None:
+            return 0
+
+        deleted = conn.execute(text(
+            "DELETE FROM change_log WHERE op = 'delete' AND seq <= :seq"
+        ), {'seq': pruned}).rowcount
+        conn.execute(text("UPDATE change_log_horizon SET seq = MAX(seq, :seq) WHERE id = 1"), {'seq': pruned})
+
+    logger.info(f"Pruned {deleted} sync tombstones up to seq {pruned}")
+    return deleted
@@ -0,0 +1,154 @@
+"""
+Sync Routes - Delta sync across every module
+"""
+import json
+from datetime import datetime
+from flask import request, jsonify, Response, stream_with_context, current_app
+from sqlalchemy.exc import IntegrityError
+from app.modules.sync import sync_bp
+from app.modules.sync.changelog import changes_since, horizon
+from app.modules.sync.stream import broadcaster
+from app.modules.sync.transfer import TransferError, export_lines, import_lines
+from app import db
+
+SYNC_PAGE_SIZE = 1000
+MAX_SYNC_PAGE_SIZE = 5000
+_ID_CHUNK = 500
+
+RETRY = 1000  # Milliseconds before EventSource reconnects
+BUSY_RETRY = 5000  # Milliseconds, when the worker's waiting slots are taken
+
+def _models_by_table():
+    return {mapper.local_table.name: mapper.class_ for mapper in db.Model.registry.mappers}
+
+def _load_rows(model, ids):
+    """Serialize rows of one model, loading them in chunks"""
+    query = model.query
+    if hasattr(model, 'load_options'):
+        query = query.options(*model.load_options())
+
+    rows = []
+    for start in range(0, len(ids), _ID_CHUNK):
+        chunk = ids[start:start + _ID_CHUNK]
+        rows.extend(row.to_dict() for row in query.filter(model.id.in_(chunk)).all())
+    return rows
+
+@sync_bp.route('/sync', methods=['GET'])
+def sync():
+    """
+    Rows created or updated since the `since` watermark, plus tombstones.
+
+    Returns the new watermark to pass as `since` next time. `reset` is true
+    when the watermark predates pruned tombstones and the client must drop
+    its cache and apply this response as a full sync.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', SYNC_PAGE_SIZE, type=int), MAX_SYNC_PAGE_SIZE)
+
+    reset = 0 < since < horizon()
+    if reset:
+        since = 0
+
+    entries = changes_since(since, limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserts = {}
+    deleted = {}
+    for entry in entries:
+        if entry.op == 'delete':
+            deleted.setdefault(entry.table_name, []).append(entry.row_id)
+        else:
+            upserts.setdefault(entry.table_name, []).append(entry.row_id)
+
+    models = _models_by_table()
+    changes = {
+        table: _load_rows(models[table], ids)
+        for table, ids in upserts.items()
+        if table in models
+    }
+
+    watermark = entries[-1].seq if entries else since
+
+    return jsonify({
+        'watermark': watermark,
+        'has_more': has_more,
+        'reset': reset,
+        'changes': changes,
+        'deleted': deleted
+    })
+
+@sync_bp.route('/export', methods=['GET'])
+def export_data():
+    """Stream every table as NDJSON"""
+    filename = f"loom-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    return Response(
+        stream_with_context(export_lines()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@sync_bp.route('/import', methods=['POST'])
+def import_data():
+    """
+    Import an NDJSON export from the request body, streamed line by line.
+
+    Pass `replace=true` to clear existing data first; otherwise imported
+    ids must not collide with existing rows. Nothing is written on error.
+    """
+    replace = request.args.get('replace', 'false').lower() == 'true'
+
+    try:
+        counts = import_lines(request.stream, replace=replace)
+    except TransferError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except IntegrityError:
+        return jsonify({'error': 'Imported rows conflict with existing data (use replace=true)'}), 409
+
+    return jsonify({'imported': counts}), 201
+
+@sync_bp.route('/stream', methods=['GET'])
+def stream():
+    """
+    Server-Sent Events feed of changes: one `change` event per row written,
+    `{"model", "id", "op", "updated_at"}`, filtered by `?tables=a,b`.
+
+    Each response is a long-poll: it ends as soon as there are changes, or
+    after SSE_LONG_POLL_WAIT, and EventSource reconnects with Last-Event-ID.
+    A `resync` event means changes were missed (e.g. a long disconnect) and
+    the client should refetch or run /api/sync.
+    """
+    tables = {name for name in request.args.get('tables', '').split(',') if name}
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+
+    head = broadcaster.subscribe(current_app._get_current_object(), last_event_id)
+    if head is None:
+        # Every waiting slot of this worker is taken; come back later
+        resume = '' if last_event_id is None else f'id: {last_event_id}\n'
+        return _event_stream(f'retry: {BUSY_RETRY}\n{resume}\n')
+
+    cursor = head if last_event_id is None else last_event_id
+    try:
+        # Ending the request frees its worker thread; the browser reconnects with Last-Event-ID
+        events = broadcaster.wait(cursor, current_app.config['SSE_LONG_POLL_WAIT'])
+    finally:
+        broadcaster.unsubscribe()
+
+    if events is None:
+        cursor = broadcaster.head
+        return _event_stream(f'retry: {RETRY}\nid: {cursor}\nevent: resync\ndata: {{}}\n\n')
+
+    if events:
+        cursor = events[-1]['seq']
+    body = ''.join(
+        f"id: {event['seq']}\nevent: change\ndata: {json.dumps(event)}\n\n"
+        for event in events
+        if not tables or event['model'] in tables
+    )
+    # End on the cursor, so the reconnect resumes after filtered-out events too
+    return _event_stream(f'retry: {RETRY}\n\n' + body + f'id: {cursor}\n\n')
+
+def _event_stream(body):
+    response = Response(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
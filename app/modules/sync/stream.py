@@ -0,0 +1,149 @@
+"""
+Change Stream - fan out change log entries to Server-Sent Events clients
+
+One poller thread per worker process follows `change_log` by sequence
+number and appends compact change events to a shared ring buffer. An SSE
+request is just a cursor into that buffer waiting on a condition
+variable, so open tabs cost no queries of their own and the database sees
+one indexed range read per poll no matter how many clients are connected.
+Writes made in this process wake the poller immediately; writes from other
+workers are picked up within SSE_POLL_INTERVAL.
+
+Requests are short long-polls that hold a worker thread while they wait,
+so at most SSE_MAX_WAITING wait at once per worker; the rest are answered
+straight away and retry later, leaving the other threads for normal requests.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from sqlalchemy import text
+from app.changes import on_change
+from app import db
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = 2048
+# The poller keeps running this long after the last request, so clients
+# reconnecting between long-polls find their cursor still in the buffer
+IDLE_TIMEOUT = 60  # Seconds
+_FETCH_LIMIT = 500
+
+
+class ChangeBroadcaster:
+    """Ring buffer of recent change events shared by every stream in the process"""
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)  # (seq, event dict)
+        self._head = None  # Highest seq seen
+        self._floor = None  # Events up to this seq are not in the buffer
+        self._subscribers = 0
+        self._idle_since = None
+        self._condition = threading.Condition()
+        self._poke = threading.Event()
+        self._thread = None
+        self._app = None
+
+    @property
+    def head(self):
+        return self._head
+
+    def subscribe(self, app, after=None):
+        """
+        Register a waiting request, starting the poller on first use; returns
+        the current head seq, or None if SSE_MAX_WAITING requests already wait.
+
+        A poller started for a client resuming from `after` fills the buffer
+        from there when those changes are still recent enough to fit.
+        """
+        with self._condition:
+            if self._subscribers >= app.config['SSE_MAX_WAITING']:
+                return None
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._app = app
+                self._events.clear()
+                with app.app_context():
+                    self._head = self._fetch_head()
+                if after is not None and 0 <= self._head - after <= self._events.maxlen:
+                    self._head = after
+                self._floor = self._head
+                self._thread = threading.Thread(target=self._run, name='change-stream', daemon=True)
+                self._thread.start()
+                self._poke.set()
+            return self._head
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+            if self._subscribers <= 0:
+                self._idle_since = time.monotonic()
+
+    def wake(self):
+        self._poke.set()
+
+    def wait(self, after, timeout):
+        """
+        Events with seq > `after`, waiting up to `timeout` seconds for some.
+
+        Returns None if `after` is older than the buffer (the caller must resync).
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._head > after, timeout)
+            if after < self._floor:
+                return None
+            return [event for seq, event in self._events if seq > after]
+
+    def _run(self):
+        poll_interval = self._app.config['SSE_POLL_INTERVAL']
+        while True:
+            self._poke.wait(poll_interval)
+            self._poke.clear()
+
+            with self._condition:
+                if self._subscribers <= 0 and time.monotonic() - self._idle_since > IDLE_TIMEOUT:
+                    self._thread = None
+                    return
+
+            try:
+                with self._app.app_context():
+                    self._poll()
+            except Exception:
+                logger.exception("Change stream poll failed")
+
+    def _fetch_head(self):
+        return db.session.execute(text("SELECT COALESCE(MAX(seq), 0) FROM change_log")).scalar()
+
+    def _poll(self):
+        while True:
+            rows = db.session.execute(text(
+                "SELECT seq, table_name, row_id, op, changed_at FROM change_log "
+                "WHERE seq > :head ORDER BY seq LIMIT :limit"
+            ), {'head': self._head, 'limit': _FETCH_LIMIT}).all()
+            if not rows:
+                return
+
+            with self._condition:
+                for row in rows:
+                    if len(self._events) == self._events.maxlen:
+                        self._floor = self._events[0][0]
+                    self._events.append((row.seq, {
+                        'seq': row.seq,
+                        'model': row.table_name,
+                        'id': row.row_id,
+                        'op': row.op,
+                        'updated_at': row.changed_at.replace(' ', 'T')
+                    }))
+                self._head = rows[-1].seq
+                self._condition.notify_all()
+
+            if len(rows) < _FETCH_LIMIT:
+                return
+
+
+broadcaster = ChangeBroadcaster()
+
+
+@on_change()
+def _wake_broadcaster(changed_tables):
+    broadcaster.wake()
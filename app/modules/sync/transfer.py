@@ -0,0 +1,165 @@
+"""
+Data Transfer - streaming NDJSON export and import of every model table
+
+An export is one JSON object per line: a header line
+    {"format": "loom-export", "version": 1, "tables": [...]}
+followed by {"table": ..., "row": {...}} lines, parents before children.
+Rows are read through a streaming cursor and written a line at a time, and
+the importer inserts them in batches, so memory stays flat regardless of
+database size. Primary keys are kept, which preserves every relationship.
+"""
+import json
+import logging
+from datetime import date, datetime, time
+from sqlalchemy import select, text
+from app.modules.notes.patches import flush_patches
+from app.modules.notes.rendering import render_missing_notes
+from app.modules.notes.tags import index_missing_tags
+from app import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = 'loom-export'
+EXPORT_VERSION = 1
+BATCH_SIZE = 1000
+
+
+class TransferError(ValueError):
+    """Raised when an import stream is malformed or does not match the schema"""
+
+
+def _tables():
+    # Import models so every table is registered on the metadata
+    import app.models  # noqa: F401
+    return db.metadata.sorted_tables
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def export_lines(batch_size=BATCH_SIZE):
+    """Yield the export as NDJSON lines"""
+    # Fold in pending note autosaves so the export has the latest content
+    flush_patches()
+
+    tables = _tables()
+    yield json.dumps({
+        'format': EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'tables': [table.name for table in tables]
+    }) + '\n'
+
+    with db.engine.connect() as conn:
+        for table in tables:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            for partition in result.mappings().partitions():
+                yield ''.join(
+                    json.dumps({'table': table.name, 'row': dict(row)}, default=_json_default) + '\n'
+                    for row in partition
+                )
+
+
+def _converter(column):
+    """Function turning a JSON value back into the column's Python type"""
+    if isinstance(column.type, db.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat
+    if isinstance(column.type, db.Time):
+        return time.fromisoformat
+    return None
+
+
+def _row_parser(table):
+    converters = {column.name: _converter(column) for column in table.columns}
+
+    def parse(row):
+        unknown = set(row) - set(converters)
+        if unknown:
+            raise TransferError(f"Unknown columns for {table.name}: {', '.join(sorted(unknown))}")
+        return {
+            key: converters[key](value) if value is not None and converters[key] else value
+            for key, value in row.items()
+        }
+    return parse
+
+
+def import_lines(lines, replace=False, batch_size=BATCH_SIZE):
+    """
+    Import an export stream in one transaction and return {table: row count}.
+
+    With `replace`, existing rows are deleted first; otherwise imported
+    primary keys must not collide with existing rows.
+    """
+    tables = {table.name: table for table in _tables()}
+    parsers = {}
+    counts = {}
+    pending = []
+    pending_table = None
+
+    def flush(conn):
+        if pending:
+            conn.execute(tables[pending_table].insert(), pending)
+            counts[pending_table] = counts.get(pending_table, 0) + len(pending)
+            pending.clear()
+
+    lines = iter(lines)
+    header = _decode(next(lines, b''), 1)
+    if header.get('format') != EXPORT_FORMAT or header.get('version') != EXPORT_VERSION:
+        raise TransferError('Not a LOOM export (bad or missing header line)')
+
+    with db.engine.begin() as conn:
+        # Check foreign keys at commit so row order within a table does not matter
+        conn.execute(text('PRAGMA defer_foreign_keys = ON'))
+
+        if replace:
+            for table in reversed(list(tables.values())):
+                conn.execute(table.delete())
+
+        for number, line in enumerate(lines, start=2):
+            if not line.strip():
+                continue
+            record = _decode(line, number)
+
+            name = record.get('table')
+            if name not in tables or not isinstance(record.get('row'), dict):
+                raise TransferError(f'Line {number}: unknown table or missing row')
+
+            parse = parsers.get(name) or parsers.setdefault(name, _row_parser(tables[name]))
+            try:
+                row = parse(record['row'])
+            except (TypeError, ValueError) as exc:
+                raise TransferError(f'Line {number}: {exc}') from exc
+
+            # An executemany batch needs one table and one set of columns
+            if name != pending_table or (pending and row.keys() != pending[0].keys()):
+                flush(conn)
+                pending_table = name
+            pending.append(row)
+
+            if len(pending) >= batch_size:
+                flush(conn)
+
+        flush(conn)
+
+    # Older exports carry no note HTML or note tag rows
+    render_missing_notes()
+    index_missing_tags()
+
+    logger.info(f"Imported {sum(counts.values())} rows into {len(counts)} tables")
+    return counts
+
+
+def _decode(line, number):
+    try:
+        record = json.loads(line)
+    except ValueError as exc:
+        raise TransferError(f'Line {number}: invalid JSON') from exc
+    if not isinstance(record, dict):
+        raise TransferError(f'Line {number}: expected a JSON object')
+    return record
@@ -1,10 +1,16 @@
 """
 Todos Routes - Task management with reminders
 """
-from flask import render_template, request, jsonify
+from flask import abort, render_template, request, jsonify
 from datetime import datetime
 from app.modules.todos import todos_bp
 from app.models.todo import Todo, TodoReminder
+from app.models.archive import ArchivedTodo
+from app.archive import TieredSchema, include_archived, restore_todo, union_tiers
+from app.batch import apply_batch
+from app.conditional import conditional
+from app.pagination import paginate, page_response, projection_options, requested_fields
+from app.query_budget import query_budget
 from app import db
 
 @todos_bp.route('/')
@@ -13,12 +19,18 @@ def index():
     return render_template('todos/index.html')
 
 @todos_bp.route('/api/todos', methods=['GET'])
+@conditional('todos', 'todo_reminders', 'todos_archive', 'todo_reminders_archive')
+@query_budget(3)
 def get_todos():
-    """Get all todos"""
+    """Get all todos; completed todos moved to the archive tier only with `include_archived=true`"""
     status = request.args.get('status')
     priority = request.args.get('priority')
+    fields = requested_fields()
 
-    query = Todo.query
+    if include_archived():
+        return _get_todos_with_archive(status, priority, fields)
+
+    query = Todo.query.options(*Todo.load_options(), *projection_options(Todo, fields))
 
     if status:
         query = query.filter_by(status=status)
@@ -26,55 +38,69 @@ def get_todos():
     if priority:
         query = query.filter_by(priority=priority)
 
-    todos = query.order_by(Todo.priority.desc(), Todo.due_date).all()
-    return jsonify([todo.to_dict() for todo in todos])
+    todos, next_cursor = paginate(query, [(Todo.priority, True), (Todo.due_date, False), (Todo.id, False)])
+    return page_response(todos, next_cursor, fields)
 
-@todos_bp.route('/api/todos', methods=['POST'])
-def create_todo():
-    """Create a new todo"""
-    data = request.get_json()
+def _get_todos_with_archive(status, priority, fields):
+    """get_todos over both tiers: row tuples, with each tier's reminders loaded in one query"""
+    serializer = Todo.serializer.only(fields)
+    hot_where, cold_where = [], []
+
+    if status:
+        hot_where.append(Todo.status == status)
+        cold_where.append(ArchivedTodo.status == status)
+
+    if priority:
+        hot_where.append(Todo.priority == priority)
+        cold_where.append(ArchivedTodo.priority == priority)
+
+    tiers = union_tiers(
+        serializer, ArchivedTodo, (Todo.priority, Todo.due_date), hot_where=hot_where, cold_where=cold_where
+    )
+    todos, next_cursor = paginate(
+        db.session.query(*tiers.c), [(tiers.c.priority, True), (tiers.c.due_date, False), (tiers.c.id, False)]
+    )
+    return page_response(todos, next_cursor, schema=TieredSchema(serializer, ArchivedTodo.serializer.only(fields)))
+
+def _get_todo_or_404(todo_id):
+    """Todo to write to, moved back from the archive tier if it was moved there"""
+    todo = db.session.get(Todo, todo_id) or restore_todo(todo_id)
+    if todo is None:
+        abort(404)
+    return todo
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
 
-    todo = Todo(
+def _build_todo(data):
+    """New Todo (with its reminders) from request data"""
+    return Todo(
         title=data['title'],
         description=data.get('description'),
         priority=data.get('priority', 'medium'),
         status=data.get('status', 'pending'),
-        due_date=datetime.fromisoformat(data['due_date'].replace('Z', '+00:00')) if data.get('due_date') else None,
+        due_date=_parse_datetime(data['due_date']) if data.get('due_date') else None,
         is_weekly=data.get('is_weekly', False),
         week_day=data.get('week_day'),
-        category=data.get('category')
-    )
-
-    db.session.add(todo)
-    db.session.commit()
-
-    # Create reminders if specified
-    if 'reminders' in data:
-        for reminder_data in data['reminders']:
-            reminder = TodoReminder(
-                todo_id=todo.id,
-                reminder_time=datetime.fromisoformat(reminder_data['reminder_time'].replace('Z', '+00:00')),
+        category=data.get('category'),
+        reminders=[
+            TodoReminder(
+                reminder_time=_parse_datetime(reminder_data['reminder_time']),
                 message=reminder_data.get('message')
             )
-            db.session.add(reminder)
-
-        db.session.commit()
-
-    return jsonify(todo.to_dict()), 201
-
-@todos_bp.route('/api/todos/<int:todo_id>', methods=['PUT'])
-def update_todo(todo_id):
-    """Update a todo"""
-    todo = Todo.query.get_or_404(todo_id)
-    data = request.get_json()
+            for reminder_data in data.get('reminders', [])
+        ]
+    )
 
+def _update_todo(todo, data):
+    """Apply request data to an existing Todo"""
     todo.title = data.get('title', todo.title)
     todo.description = data.get('description', todo.description)
     todo.priority = data.get('priority', todo.priority)
     todo.status = data.get('status', todo.status)
 
     if 'due_date' in data and data['due_date']:
-        todo.due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
+        todo.due_date = _parse_datetime(data['due_date'])
 
     if 'completed_at' in data:
         if data['completed_at']:
@@ -82,6 +108,27 @@ def update_todo(todo_id):
         else:
             todo.completed_at = None
 
+@todos_bp.route('/api/todos', methods=['POST'])
+def create_todo():
+    """Create a new todo"""
+    todo = _build_todo(request.get_json())
+
+    # Reminders are inserted in the same flush as the todo
+    db.session.add(todo)
+    db.session.commit()
+
+    return jsonify(todo.to_dict()), 201
+
+@todos_bp.route('/api/todos/batch', methods=['POST'])
+def batch_todos():
+    """Create, update and delete many todos in one transaction"""
+    return apply_batch(Todo, request.get_json(), build=_build_todo, update=_update_todo)
+
+@todos_bp.route('/api/todos/<int:todo_id>', methods=['PUT'])
+def update_todo(todo_id):
+    """Update a todo"""
+    todo = _get_todo_or_404(todo_id)
+    _update_todo(todo, request.get_json())
     db.session.commit()
 
     return jsonify(todo.to_dict())
@@ -89,14 +136,16 @@ def update_todo(todo_id):
 @todos_bp.route('/api/todos/<int:todo_id>', methods=['DELETE'])
 def delete_todo(todo_id):
     """Delete a todo"""
-    todo = Todo.query.get_or_404(todo_id)
+    todo = _get_todo_or_404(todo_id)
     db.session.delete(todo)
     db.session.commit()
 
     return '', 204
 
 @todos_bp.route('/api/todos/weekly', methods=['GET'])
+@conditional('todos', 'todo_reminders')
+@query_budget(2)
 def get_weekly_todos():
     """Get weekly recurring todos"""
-    weekly_todos = Todo.query.filter_by(is_weekly=True).order_by(Todo.week_day).all()
+    weekly_todos = Todo.query.options(*Todo.load_options()).filter_by(is_weekly=True).order_by(Todo.week_day).all()
     return jsonify([todo.to_dict() for todo in weekly_todos])
@@ -0,0 +1,231 @@
+"""
+Travel Analytics - expense rollups, budget burn-down and cross-trip totals
+
+Totals are SQL aggregates over the covering (trip_id, date, category,
+currency, amount) index rather than maintained rollup rows, so they can
+never drift from the expenses. Amounts are converted to the base currency
+(TRAVEL_BASE_CURRENCY) with the locally stored `currency_rates`; expenses
+in a currency without a rate are reported instead of silently counted,
+both for the trip and in each category or day total they leave partial.
+"""
+from datetime import date, datetime
+from sqlalchemy import case, func, literal, null, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+from app.models.travel import Trip, TravelExpense, CurrencyRate
+from app import db
+
+
+def _expense_rows(base_currency, *where):
+    """Expenses with their currency normalized and amount converted (NULL without a rate)"""
+    currency = func.coalesce(func.upper(TravelExpense.currency), base_currency)
+    rate = case((currency == base_currency, 1.0), else_=CurrencyRate.rate)
+    return select(
+        TravelExpense.id,
+        TravelExpense.trip_id,
+        TravelExpense.date,
+        TravelExpense.category,
+        currency.label('currency'),
+        TravelExpense.amount,
+        (TravelExpense.amount * rate).label('converted')
+    ).outerjoin(CurrencyRate, CurrencyRate.currency == currency).where(*where)
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def _missing_rates(expenses):
+    """Aggregate of the currencies of a group's expenses that have no rate, comma-separated"""
+    # Deduplicated by _split(): DISTINCT here would need a temp B-tree per group
+    return func.group_concat(expenses.c.currency).filter(expenses.c.converted.is_(None))
+
+
+def _split(currencies):
+    return sorted(set(currencies.split(','))) if currencies else []
+
+
+def trip_analytics(trip, base_currency, today=None):
+    """
+    Totals per category, day and currency for one trip, plus budget burn-down.
+
+    All rollups come from a single UNION ALL statement.
+    """
+    expenses = _expense_rows(base_currency, TravelExpense.trip_id == trip.id).cte('expenses').prefix_with(
+        'MATERIALIZED'
+    )
+
+    rollups = union_all(
+        select(
+            literal('category').label('dimension'), expenses.c.category.label('key'),
+            func.sum(expenses.c.converted).label('total'), null().label('amount'),
+            func.count().label('count'), _missing_rates(expenses).label('missing')
+        ).group_by(expenses.c.category),
+        select(
+            literal('day'), expenses.c.date, func.sum(expenses.c.converted), null(), func.count(),
+            _missing_rates(expenses)
+        ).group_by(expenses.c.date),
+        select(
+            literal('currency'), expenses.c.currency, func.sum(expenses.c.converted),
+            func.sum(expenses.c.amount), func.count(), null()
+        ).group_by(expenses.c.currency),
+    )
+
+    # Category and day totals leave out expenses in `missing_rates` currencies
+    by_category, by_day, by_currency = [], [], []
+    for row in db.session.execute(rollups):
+        if row.dimension == 'category':
+            by_category.append({
+                'category': row.key, 'total': _round(row.total), 'count': row.count,
+                'missing_rates': _split(row.missing)
+            })
+        elif row.dimension == 'day':
+            by_day.append({
+                'date': row.key, 'total': _round(row.total or 0), 'count': row.count,
+                'missing_rates': _split(row.missing)
+            })
+        else:
+            by_currency.append({
+                'currency': row.key,
+                'amount': _round(row.amount),
+                'total': _round(row.total),
+                'count': row.count
+            })
+
+    spent = sum(row['total'] for row in by_currency if row['total'] is not None)
+    by_category.sort(key=lambda row: row['total'] or 0, reverse=True)
+
+    # Burn-down: cumulative spend and remaining budget after each day with expenses
+    by_day.sort(key=lambda row: row['date'])
+    cumulative = 0
+    for row in by_day:
+        cumulative += row['total']
+        row['cumulative'] = _round(cumulative)
+        row['remaining'] = _round(trip.budget - cumulative) if trip.budget is not None else None
+
+    return {
+        'trip_id': trip.id,
+        'base_currency': base_currency,
+        'total': _round(spent),
+        'count': sum(row['count'] for row in by_currency),
+        'by_category': by_category,
+        'by_day': by_day,
+        'by_currency': by_currency,
+        'missing_rates': sorted(row['currency'] for row in by_currency if row['total'] is None),
+        'budget': _budget_status(trip, spent, by_day, today or date.today())
+    }
+
+
+def _budget_status(trip, spent, by_day, today):
+    """Budget use so far and a straight-line projection over the trip's days"""
+    days_total = (trip.end_date - trip.start_date).days + 1
+    days_elapsed = min(max((today - trip.start_date).days + 1, 0), days_total)
+
+    # Spend dated before the trip is bookings; only spend during it is extrapolated
+    booked = sum(row['total'] for row in by_day if row['date'] < trip.start_date.isoformat())
+    projected = spent
+    if 0 < days_elapsed < days_total:
+        projected = booked + (spent - booked) / days_elapsed * days_total
+
+    status = {
+        'budget': trip.budget,
+        'spent': _round(spent),
+        'remaining': None,
+        'percent_used': None,
+        'days_total': days_total,
+        'days_elapsed': days_elapsed,
+        'booked_before_trip': _round(booked),
+        'daily_average': _round((spent - booked) / days_elapsed) if days_elapsed else None,
+        'projected_total': _round(projected),
+        'over_budget': False
+    }
+    if trip.budget is not None:
+        status['remaining'] = _round(trip.budget - spent)
+        status['percent_used'] = _round(spent / trip.budget * 100) if trip.budget else None
+        status['over_budget'] = projected > trip.budget
+    return status
+
+
+def trips_summary(base_currency, status=None):
+    """
+    Spend against budget for every trip (optionally one status) and the
+    combined totals per category, in two aggregate queries.
+    """
+    trip_filter = (Trip.status == status,) if status else ()
+    expenses = _expense_rows(
+        base_currency, TravelExpense.trip_id.in_(select(Trip.id).where(*trip_filter))
+    ).subquery('expenses')
+
+    per_trip = db.session.execute(
+        select(
+            Trip.id, Trip.name, Trip.destination, Trip.start_date, Trip.end_date, Trip.status, Trip.budget,
+            func.count(expenses.c.id).label('count'),
+            func.sum(expenses.c.converted).label('total'),
+            func.count(expenses.c.id).filter(expenses.c.converted.is_(None)).label('unconverted')
+        )
+        .outerjoin(expenses, expenses.c.trip_id == Trip.id)
+        .where(*trip_filter)
+        .group_by(Trip.id)
+        .order_by(Trip.start_date.desc(), Trip.id.desc())
+    ).all()
+
+    per_category = db.session.execute(
+        select(
+            expenses.c.category, func.sum(expenses.c.converted).label('total'), func.count().label('count'),
+            _missing_rates(expenses).label('missing')
+        )
+        .group_by(expenses.c.category)
+        .order_by(func.sum(expenses.c.converted).desc())
+    ).all()
+
+    trips = []
+    for row in per_trip:
+        spent = row.total or 0
+        trips.append({
+            'id': row.id,
+            'name': row.name,
+            'destination': row.destination,
+            'start_date': row.start_date.isoformat(),
+            'end_date': row.end_date.isoformat(),
+            'status': row.status,
+            'budget': row.budget,
+            'spent': _round(spent),
+            'remaining': _round(row.budget - spent) if row.budget is not None else None,
+            'count': row.count,
+            'unconverted_count': row.unconverted
+        })
+
+    return {
+        'base_currency': base_currency,
+        'total': _round(sum(trip['spent'] for trip in trips)),
+        'budget': _round(sum(trip['budget'] for trip in trips if trip['budget'] is not None)),
+        'trips': trips,
+        'by_category': [
+            {
+                'category': row.category, 'total': _round(row.total), 'count': row.count,
+                'missing_rates': _split(row.missing)
+            }
+            for row in per_category
+        ]
+    }
+
+
+def set_rates(rates, base_currency):
+    """Insert or update {currency: rate} in one statement; returns the normalized codes"""
+    rows = []
+    for currency, rate in rates.items():
+        if not isinstance(currency, str) or len(currency) != 3:
+            raise ValueError(f'Invalid currency code: {currency!r}')
+        if currency.upper() == base_currency:
+            # Base currency amounts are never converted, so a rate would be ignored
+            raise ValueError(f'{base_currency} is the base currency and takes no rate')
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0:
+            raise ValueError(f'Rate for {currency} must be a positive number')
+        rows.append({'currency': currency.upper(), 'rate': float(rate)})
+
+    if rows:
+        statement = insert(CurrencyRate)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[CurrencyRate.currency],
+            set_={'rate': statement.excluded.rate, 'updated_at': datetime.utcnow()}
+        ), rows)
+    return [row['currency'] for row in rows]
@@ -0,0 +1,78 @@
+"""
+Packing Templates - create a trip's packing list from reusable templates
+
+Template items are copied with one INSERT ... SELECT, so the cost does not
+grow with template size. When several templates are merged, items with the
+same name (ignoring case and surrounding spaces) become one item: the first
+template listed supplies its name, category and notes, and the largest
+quantity wins, so two templates that both pack a toothbrush give one.
+"""
+from sqlalchemy import case, func, insert, literal, select
+from app.models.travel import PackingList, PackingItem
+from app import db
+
+
+def _scaled_quantity(quantity, trip_days, template_days, scale_categories):
+    """Quantity scaled by trip length, rounded up (integer arithmetic, so it stays in SQL)"""
+    if not template_days:
+        return quantity
+
+    scaled = func.max((quantity * trip_days + template_days - 1) // template_days, 1)
+    if scale_categories is None:
+        return scaled
+    return case((PackingItem.category.in_(scale_categories), scaled), else_=quantity)
+
+
+def instantiate_templates(trip, template_ids, name=None, template_days=None, scale_categories=None):
+    """
+    Create a packing list for `trip` holding the merged items of the templates.
+
+    With `template_days` (the trip length the templates were written for),
+    quantities are scaled to the trip's length; `scale_categories` limits
+    scaling to those categories (e.g. clothing, but not a passport).
+    Raises LookupError if an id is not a template. Returns the new list.
+    """
+    found = set(db.session.execute(
+        select(PackingList.id).where(PackingList.id.in_(template_ids), PackingList.is_template.is_(True))
+    ).scalars())
+    missing = [template_id for template_id in template_ids if template_id not in found]
+    if missing:
+        raise LookupError(f"Template {', '.join(map(str, missing))} not found")
+
+    packing_list = PackingList(trip_id=trip.id, name=name or f'{trip.name} Packing List', is_template=False)
+    db.session.add(packing_list)
+    db.session.flush()
+
+    key = func.lower(func.trim(PackingItem.item_name))
+    template_order = case(
+        {template_id: position for position, template_id in enumerate(template_ids)},
+        value=PackingItem.packing_list_id
+    )
+    trip_days = (trip.end_date - trip.start_date).days + 1
+
+    ranked = select(
+        func.trim(PackingItem.item_name).label('item_name'),
+        PackingItem.category,
+        PackingItem.notes,
+        _scaled_quantity(
+            func.max(func.coalesce(PackingItem.quantity, 1)).over(partition_by=key),
+            trip_days, template_days, scale_categories
+        ).label('quantity'),
+        func.row_number().over(partition_by=key, order_by=(template_order, PackingItem.id)).label('rank'),
+        template_order.label('template_order'),
+        PackingItem.id
+    ).where(PackingItem.packing_list_id.in_(template_ids)).subquery('ranked')
+
+    db.session.execute(
+        insert(PackingItem).from_select(
+            ['packing_list_id', 'item_name', 'category', 'quantity', 'is_packed', 'notes'],
+            select(
+                literal(packing_list.id), ranked.c.item_name, ranked.c.category, ranked.c.quantity,
+                literal(False), ranked.c.notes
+            ).where(ranked.c.rank == 1).order_by(ranked.c.template_order, ranked.c.id)
+        )
+    )
+
+    # The items were written behind the ORM's back; load them on next access
+    db.session.expire(packing_list, ['items'])
+    return packing_list
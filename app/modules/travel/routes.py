@@ -1,10 +1,16 @@
 """
 Travel Routes - Trip planning, itineraries, packing lists, expenses
 """
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, current_app
 from datetime import datetime
 from app.modules.travel import travel_bp
-from app.models.travel import Trip, Itinerary, PackingList, PackingItem, TravelExpense
+from app.models.travel import Trip, Itinerary, PackingList, PackingItem, TravelExpense, CurrencyRate
+from app.modules.travel.analytics import set_rates, trip_analytics, trips_summary
+from app.modules.travel.packing import instantiate_templates
+from app.batch import apply_batch
+from app.conditional import conditional
+from app.pagination import paginate, page_response, projection_options, requested_fields
+from app.query_budget import query_budget
 from app import db
 
 @travel_bp.route('/')
@@ -14,36 +20,52 @@ def index():
 
 # Trip routes
 @travel_bp.route('/api/trips', methods=['GET'])
+@conditional('trips')
+@query_budget(1)
 def get_trips():
     """Get all trips"""
     status = request.args.get('status')
+    fields = requested_fields()
 
-    query = Trip.query
+    query = Trip.query.options(*projection_options(Trip, fields))
 
     if status:
         query = query.filter_by(status=status)
 
-    trips = query.order_by(Trip.start_date.desc()).all()
-    return jsonify([trip.to_dict() for trip in trips])
+    trips, next_cursor = paginate(query, [(Trip.start_date, True), (Trip.id, True)])
+    return page_response(trips, next_cursor, fields)
+
+TRIP_SUB_RESOURCES = ('itineraries', 'packing_lists', 'expenses')
 
 @travel_bp.route('/api/trips/<int:trip_id>', methods=['GET'])
+@conditional('trips', 'itineraries', 'packing_lists', 'packing_items', 'travel_expenses')
+@query_budget(5)
 def get_trip(trip_id):
-    """Get a specific trip with all details"""
-    trip = Trip.query.get_or_404(trip_id)
+    """
+    Get a specific trip with its details.
+
+    `include=itineraries,expenses` limits the sub-resources loaded and
+    returned (default: all of them; `include=` for just the trip). Long
+    trips can page through the sub-resource endpoints instead.
+    """
+    include = TRIP_SUB_RESOURCES
+    if 'include' in request.args:
+        include = [name.strip() for name in request.args['include'].split(',') if name.strip()]
+        unknown = set(include) - set(TRIP_SUB_RESOURCES)
+        if unknown:
+            return jsonify({'error': f"Unknown include: {', '.join(sorted(unknown))}"}), 400
+
+    trip = Trip.query.options(*Trip.load_options(include)).filter_by(id=trip_id).first_or_404()
 
     trip_data = trip.to_dict()
-    trip_data['itineraries'] = [i.to_dict() for i in trip.itineraries]
-    trip_data['packing_lists'] = [p.to_dict() for p in trip.packing_lists]
-    trip_data['expenses'] = [e.to_dict() for e in trip.expenses]
+    for name in include:
+        trip_data[name] = [row.to_dict() for row in getattr(trip, name)]
 
     return jsonify(trip_data)
 
-@travel_bp.route('/api/trips', methods=['POST'])
-def create_trip():
-    """Create a new trip"""
-    data = request.get_json()
-
-    trip = Trip(
+def _build_trip(data):
+    """New Trip from request data"""
+    return Trip(
         name=data['name'],
         destination=data['destination'],
         description=data.get('description'),
@@ -53,17 +75,8 @@ def create_trip():
         budget=data.get('budget')
     )
 
-    db.session.add(trip)
-    db.session.commit()
-
-    return jsonify(trip.to_dict()), 201
-
-@travel_bp.route('/api/trips/<int:trip_id>', methods=['PUT'])
-def update_trip(trip_id):
-    """Update a trip"""
-    trip = Trip.query.get_or_404(trip_id)
-    data = request.get_json()
-
+def _update_trip(trip, data):
+    """Apply request data to an existing Trip"""
     trip.name = data.get('name', trip.name)
     trip.destination = data.get('destination', trip.destination)
     trip.description = data.get('description', trip.description)
@@ -76,6 +89,26 @@ def update_trip(trip_id):
     if 'end_date' in data:
         trip.end_date = datetime.fromisoformat(data['end_date']).date()
 
+@travel_bp.route('/api/trips', methods=['POST'])
+def create_trip():
+    """Create a new trip"""
+    trip = _build_trip(request.get_json())
+
+    db.session.add(trip)
+    db.session.commit()
+
+    return jsonify(trip.to_dict()), 201
+
+@travel_bp.route('/api/trips/batch', methods=['POST'])
+def batch_trips():
+    """Create, update and delete many trips in one transaction"""
+    return apply_batch(Trip, request.get_json(), build=_build_trip, update=_update_trip)
+
+@travel_bp.route('/api/trips/<int:trip_id>', methods=['PUT'])
+def update_trip(trip_id):
+    """Update a trip"""
+    trip = Trip.query.get_or_404(trip_id)
+    _update_trip(trip, request.get_json())
     db.session.commit()
 
     return jsonify(trip.to_dict())
@@ -90,14 +123,10 @@ def delete_trip(trip_id):
     return '', 204
 
 # Itinerary routes
-@travel_bp.route('/api/trips/<int:trip_id>/itinerary', methods=['POST'])
-def create_itinerary(trip_id):
-    """Add itinerary item to trip"""
-    trip = Trip.query.get_or_404(trip_id)
-    data = request.get_json()
-
-    itinerary = Itinerary(
-        trip_id=trip.id,
+def _build_itinerary(trip_id, data):
+    """New Itinerary item for a trip from request data"""
+    return Itinerary(
+        trip_id=trip_id,
         day_number=data['day_number'],
         date=datetime.fromisoformat(data['date']).date(),
         title=data['title'],
@@ -108,24 +137,89 @@ def create_itinerary(trip_id):
         notes=data.get('notes')
     )
 
+@travel_bp.route('/api/trips/<int:trip_id>/itinerary', methods=['GET'])
+@conditional('trips', 'itineraries')
+@query_budget(2)
+def get_itinerary(trip_id):
+    """Get a trip's itinerary in day order"""
+    trip = Trip.query.get_or_404(trip_id)
+    fields = requested_fields()
+
+    query = Itinerary.query.options(*projection_options(Itinerary, fields)).filter_by(trip_id=trip.id)
+
+    itineraries, next_cursor = paginate(
+        query, [(Itinerary.day_number, False), (Itinerary.start_time, False), (Itinerary.id, False)]
+    )
+    return page_response(itineraries, next_cursor, fields)
+
+@travel_bp.route('/api/trips/<int:trip_id>/itinerary', methods=['POST'])
+def create_itinerary(trip_id):
+    """Add itinerary item to trip"""
+    trip = Trip.query.get_or_404(trip_id)
+    itinerary = _build_itinerary(trip.id, request.get_json())
+
     db.session.add(itinerary)
     db.session.commit()
 
     return jsonify(itinerary.to_dict()), 201
 
+@travel_bp.route('/api/trips/<int:trip_id>/itinerary/batch', methods=['POST'])
+def batch_itinerary(trip_id):
+    """Add and remove many itinerary items of a trip in one transaction"""
+    trip = Trip.query.get_or_404(trip_id)
+    return apply_batch(
+        Itinerary, request.get_json(),
+        build=lambda data: _build_itinerary(trip.id, data),
+        scope=Itinerary.trip_id == trip.id
+    )
+
 # Packing list routes
 @travel_bp.route('/api/packing-lists', methods=['GET'])
+@conditional('packing_lists', 'packing_items')
+@query_budget(2)
 def get_packing_lists():
     """Get all packing lists including templates"""
     templates_only = request.args.get('templates_only', 'false').lower() == 'true'
 
-    query = PackingList.query
+    query = PackingList.query.options(*PackingList.load_options())
 
     if templates_only:
         query = query.filter_by(is_template=True)
 
-    packing_lists = query.all()
-    return jsonify([pl.to_dict() for pl in packing_lists])
+    packing_lists, next_cursor = paginate(query, [(PackingList.id, False)])
+    return page_response(packing_lists, next_cursor, requested_fields())
+
+@travel_bp.route('/api/trips/<int:trip_id>/packing-lists', methods=['GET'])
+@conditional('trips', 'packing_lists', 'packing_items')
+@query_budget(3)
+def get_trip_packing_lists(trip_id):
+    """Get a trip's packing lists with their items"""
+    trip = Trip.query.get_or_404(trip_id)
+
+    query = PackingList.query.options(*PackingList.load_options()).filter_by(trip_id=trip.id)
+
+    packing_lists, next_cursor = paginate(query, [(PackingList.id, False)])
+    return page_response(packing_lists, next_cursor, requested_fields())
+
+@travel_bp.route('/api/packing-lists/<int:list_id>/items', methods=['GET'])
+@conditional('packing_lists', 'packing_items')
+@query_budget(2)
+def get_packing_items(list_id):
+    """Get the items of a packing list, optionally one category or only unpacked ones"""
+    packing_list = PackingList.query.get_or_404(list_id)
+    category = request.args.get('category')
+    unpacked_only = request.args.get('unpacked_only', 'false').lower() == 'true'
+
+    query = PackingItem.query.filter_by(packing_list_id=packing_list.id)
+
+    if category:
+        query = query.filter_by(category=category)
+
+    if unpacked_only:
+        query = query.filter_by(is_packed=False)
+
+    items, next_cursor = paginate(query, [(PackingItem.id, False)])
+    return page_response(items, next_cursor, requested_fields())
 
 @travel_bp.route('/api/trips/<int:trip_id>/packing-list', methods=['POST'])
 def create_packing_list(trip_id):
@@ -158,15 +252,54 @@ def create_packing_list(trip_id):
 
     return jsonify(packing_list.to_dict()), 201
 
-# Expense routes
-@travel_bp.route('/api/trips/<int:trip_id>/expenses', methods=['POST'])
-def create_expense(trip_id):
-    """Add expense to trip"""
+@travel_bp.route('/api/trips/<int:trip_id>/packing-list/from-templates', methods=['POST'])
+@query_budget(5)
+def create_packing_list_from_templates(trip_id):
+    """
+    Create a trip's packing list by merging one or more templates.
+
+    Body: {"template_ids": [1, 2], "name": "...", "template_days": 3,
+    "scale_categories": ["clothing"]}. With template_days, quantities are
+    scaled to the trip's length (only in scale_categories, if given).
+    """
     trip = Trip.query.get_or_404(trip_id)
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+
+    template_ids = data.get('template_ids')
+    if (not isinstance(template_ids, list) or not template_ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in template_ids)):
+        return jsonify({'error': 'template_ids must be a non-empty array of ids'}), 400
+
+    template_days = data.get('template_days')
+    if template_days is not None and (isinstance(template_days, bool) or not isinstance(template_days, int)
+                                      or template_days <= 0):
+        return jsonify({'error': 'template_days must be a positive integer'}), 400
+
+    scale_categories = data.get('scale_categories')
+    if scale_categories is not None and (not isinstance(scale_categories, list)
+                                         or not all(isinstance(c, str) for c in scale_categories)):
+        return jsonify({'error': 'scale_categories must be an array of strings'}), 400
+
+    try:
+        packing_list = instantiate_templates(
+            trip, list(dict.fromkeys(template_ids)),
+            name=data.get('name'),
+            template_days=template_days,
+            scale_categories=scale_categories
+        )
+    except LookupError as exc:
+        return jsonify({'error': str(exc)}), 404
+
+    body = packing_list.to_dict()
+    db.session.commit()
 
-    expense = TravelExpense(
-        trip_id=trip.id,
+    return jsonify(body), 201
+
+# Expense routes
+def _build_expense(trip_id, data):
+    """New TravelExpense for a trip from request data"""
+    return TravelExpense(
+        trip_id=trip_id,
         description=data['description'],
         amount=data['amount'],
         category=data.get('category'),
@@ -175,7 +308,84 @@ def create_expense(trip_id):
         notes=data.get('notes')
     )
 
+@travel_bp.route('/api/trips/<int:trip_id>/expenses', methods=['GET'])
+@conditional('trips', 'travel_expenses')
+@query_budget(2)
+def get_expenses(trip_id):
+    """Get a trip's expenses in date order, optionally one category"""
+    trip = Trip.query.get_or_404(trip_id)
+    category = request.args.get('category')
+    fields = requested_fields()
+
+    query = TravelExpense.query.options(*projection_options(TravelExpense, fields)).filter_by(trip_id=trip.id)
+
+    if category:
+        query = query.filter_by(category=category)
+
+    expenses, next_cursor = paginate(query, [(TravelExpense.date, False), (TravelExpense.id, False)])
+    return page_response(expenses, next_cursor, fields)
+
+@travel_bp.route('/api/trips/<int:trip_id>/expenses', methods=['POST'])
+def create_expense(trip_id):
+    """Add expense to trip"""
+    trip = Trip.query.get_or_404(trip_id)
+    expense = _build_expense(trip.id, request.get_json())
+
     db.session.add(expense)
     db.session.commit()
 
     return jsonify(expense.to_dict()), 201
+
+@travel_bp.route('/api/trips/<int:trip_id>/expenses/batch', methods=['POST'])
+def batch_expenses(trip_id):
+    """Add and remove many expenses of a trip in one transaction"""
+    trip = Trip.query.get_or_404(trip_id)
+    return apply_batch(
+        TravelExpense, request.get_json(),
+        build=lambda data: _build_expense(trip.id, data),
+        scope=TravelExpense.trip_id == trip.id
+    )
+
+# Analytics routes
+@travel_bp.route('/api/trips/analytics', methods=['GET'])
+@conditional('trips', 'travel_expenses', 'currency_rates')
+@query_budget(2)
+def get_trips_analytics():
+    """Spend against budget for every trip and combined category totals"""
+    return jsonify(trips_summary(current_app.config['TRAVEL_BASE_CURRENCY'], status=request.args.get('status')))
+
+@travel_bp.route('/api/trips/<int:trip_id>/analytics', methods=['GET'])
+@conditional('trips', 'travel_expenses', 'currency_rates', time_bucket=3600)
+@query_budget(2)
+def get_trip_analytics(trip_id):
+    """Expense totals per category, day and currency with budget burn-down"""
+    trip = Trip.query.get_or_404(trip_id)
+    return jsonify(trip_analytics(trip, current_app.config['TRAVEL_BASE_CURRENCY']))
+
+@travel_bp.route('/api/currency-rates', methods=['GET'])
+@conditional('currency_rates')
+@query_budget(1)
+def get_currency_rates():
+    """Get stored exchange rates into the base currency"""
+    rates = CurrencyRate.query.order_by(CurrencyRate.currency).all()
+    return jsonify({
+        'base_currency': current_app.config['TRAVEL_BASE_CURRENCY'],
+        'rates': [rate.to_dict() for rate in rates]
+    })
+
+@travel_bp.route('/api/currency-rates', methods=['PUT'])
+def update_currency_rates():
+    """Set exchange rates: {"rates": {"EUR": 1.08, ...}} (value of one unit in the base currency)"""
+    data = request.get_json(silent=True) or {}
+    rates = data.get('rates')
+    if not isinstance(rates, dict):
+        return jsonify({'error': 'rates must be an object of currency: rate'}), 400
+
+    try:
+        currencies = set_rates(rates, current_app.config['TRAVEL_BASE_CURRENCY'])
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    db.session.commit()
+
+    return jsonify({'updated': currencies})
@@ -0,0 +1,180 @@
+"""
+Pagination helpers - opaque keyset cursors and field projection for list APIs
+
+List endpoints keep returning a JSON array. Passing `limit` or `cursor`
+switches them to keyset pagination on the endpoint's existing sort order;
+the cursor for the following page is returned in the X-Next-Cursor header.
+`fields=a,b,c` trims each row to the named fields and skips loading
+unrequested Text columns (note content, recipe instructions, ...).
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from flask import request, jsonify, abort
+from sqlalchemy import and_, or_, inspect, false, literal
+from sqlalchemy.orm import defer
+from sqlalchemy.types import Date, DateTime, Text, Time
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+
+    return values
+
+
+def _bad_request(message):
+    response = jsonify({'error': message})
+    response.status_code = 400
+    abort(response)
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    if isinstance(column.type, Time):
+        return time.fromisoformat(value)
+    return value
+
+
+def _after(column, descending, value):
+    """Rows strictly after `value` in this column's sort direction (SQLite NULL ordering)"""
+    if descending:
+        # NULLs sort last in descending order
+        if value is None:
+            return false()
+        return or_(column < literal(value, column.type), column.is_(None))
+
+    # NULLs sort first in ascending order
+    if value is None:
+        return column.isnot(None)
+    return column > literal(value, column.type)
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == literal(value, column.type)
+
+
+def _keyset_filter(order_by, values):
+    """Lexicographic "after this row" predicate over a multi-column sort"""
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        prefix = [_equal(col, val) for (col, _), val in zip(order_by[:i], values[:i])]
+        clauses.append(and_(*prefix, _after(column, descending, values[i])))
+    return or_(*clauses)
+
+
+def paginate(query, order_by, default_limit=None, max_limit=MAX_PAGE_SIZE):
+    """
+    Order and page a query with keyset pagination.
+
+    `order_by` is a list of (column, descending) pairs ending in a unique
+    column. Returns (rows, next_cursor). Without `limit`/`cursor` in the
+    request (and no default_limit) every row is returned, as before.
+    """
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order_by])
+
+    if cursor:
+        try:
+            raw_values = decode_cursor(cursor)
+            if len(raw_values) != len(order_by):
+                raise ValueError('Invalid cursor')
+            values = [_load_value(column, value) for (column, _), value in zip(order_by, raw_values)]
+        except ValueError:
+            _bad_request('Invalid cursor')
+        query = query.filter(_keyset_filter(order_by, values))
+
+    if limit is None:
+        if default_limit is None and not cursor:
+            return query.all(), None
+        limit = default_limit or DEFAULT_PAGE_SIZE
+
+    limit = max(1, min(limit, max_limit))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor([_dump_value(getattr(last, column.key)) for column, _ in order_by])
+    return rows, next_cursor
+
+
+def requested_fields():
+    """Field names from `fields=`, or None to return full rows"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()} | {'id'}
+
+
+def list_arg(name):
+    """Comma-separated query parameter as a list of non-empty values"""
+    raw = request.args.get(name)
+    if not raw:
+        return []
+    return [value.strip() for value in raw.split(',') if value.strip()]
+
+
+def projection_options(model, fields):
+    """Loader options deferring the Text columns a projection does not include"""
+    if fields is None:
+        return ()
+    return tuple(
+        defer(getattr(model, column.key))
+        for column in inspect(model).columns
+        if isinstance(column.type, Text) and column.key not in fields
+    )
+
+
+def serialize(obj, fields=None):
+    """to_dict() restricted to the requested fields"""
+    # Only the requested fields are read, so deferred columns are never lazy-loaded
+    return type(obj).serializer.only(fields).dump(obj)
+
+
+def page_response(rows, next_cursor=None, fields=None, schema=None):
+    """
+    JSON array response carrying the next page's cursor in X-Next-Cursor.
+
+    `rows` are model instances, or with `schema` tuples selected with
+    schema.columns() that are dumped without building ORM objects.
+    """
+    if schema is not None:
+        response = jsonify(schema.dump_rows(rows))
+    else:
+        response = jsonify([serialize(row, fields) for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,79 @@
+"""
+Query Budget - Count SQL statements per request and enforce per-endpoint limits
+
+Endpoints declare how many statements they may issue with @query_budget.
+Going over budget is logged; with QUERY_BUDGET_STRICT enabled (tests, CI)
+it raises instead so an N+1 regression fails loudly. `flask
+check-query-budgets` requests every budgeted endpoint that way.
+"""
+import logging
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_active_counter = ContextVar('query_counter', default=None)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode when an endpoint issues more queries than its budget"""
+
+
+class QueryCounter:
+    """Context manager recording every statement executed inside it"""
+
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+        self._token = None
+        self._parent = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        self._parent = _active_counter.get()
+        self._token = _active_counter.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_counter.reset(self._token)
+        # Nested counters also count towards the enclosing one
+        if self._parent is not None:
+            self._parent.statements.extend(self.statements)
+            self._parent.parameters.extend(self.parameters)
+        return False
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _active_counter.get()
+    if counter is not None:
+        counter.statements.append(statement)
+        counter.parameters.append(parameters)
+
+
+def query_budget(max_queries):
+    """Decorator limiting the number of SQL statements a view may execute"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryCounter() as counter:
+                response = view(*args, **kwargs)
+
+            if counter.count > max_queries:
+                message = (f"{view.__name__} issued {counter.count} queries "
+                           f"(budget {max_queries})")
+                if current_app.config.get('QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+                logger.warning(message)
+
+            return response
+        # Lets `flask check-query-budgets` find every budgeted endpoint
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
@@ -0,0 +1,155 @@
+"""
+Query Budget Checks - N+1 regression suite for @query_budget endpoints
+
+Every endpoint declaring a @query_budget is requested in strict mode
+against a temporary database seeded with SEED_ROWS rows per table (and
+children per row), so a query issued per row shows up as a breach
+instead of a warning in the log. Endpoints with a budget but no request
+in BUDGETED_REQUESTS are reported too. Run with `flask check-query-budgets`.
+"""
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+SEED_ROWS = 20
+
+# (method, url, JSON body) covering every @query_budget endpoint; writes come last
+BUDGETED_REQUESTS = [
+    ('GET', '/api/overview', None),
+    ('GET', '/api/overview?include_archived=true', None),
+    ('GET', '/notes/api/tags', None),
+    ('GET', '/todos/api/todos', None),
+    ('GET', '/todos/api/todos?status=pending', None),
+    ('GET', '/todos/api/todos?include_archived=true', None),
+    ('GET', '/todos/api/todos/weekly', None),
+    ('GET', '/recipes/api/recipes', None),
+    ('GET', '/recipes/api/recipes?ingredients=flour&tags=quick', None),
+    ('GET', '/recipes/api/recipes/facets', None),
+    ('GET', '/recipes/api/recipes/1', None),
+    ('GET', '/recipes/api/shopping-list', None),
+    ('GET', '/travel/api/trips', None),
+    ('GET', '/travel/api/trips/1', None),
+    ('GET', '/travel/api/trips/1?include=itineraries,packing_lists,expenses', None),
+    ('GET', '/travel/api/trips/1/itinerary', None),
+    ('GET', '/travel/api/trips/1/expenses', None),
+    ('GET', '/travel/api/trips/1/packing-lists', None),
+    ('GET', '/travel/api/packing-lists', None),
+    ('GET', '/travel/api/packing-lists/1/items', None),
+    ('GET', '/travel/api/trips/analytics', None),
+    ('GET', '/travel/api/trips/1/analytics', None),
+    ('GET', '/travel/api/currency-rates', None),
+    ('POST', '/recipes/api/shopping-list/from-recipes',
+     {'recipes': [{'id': i, 'servings': 2} for i in range(1, SEED_ROWS + 1)]}),
+    # Templates are seeded after one packing list per trip
+    ('POST', '/travel/api/trips/1/packing-list/from-templates',
+     {'template_ids': list(range(SEED_ROWS + 1, 2 * SEED_ROWS + 1)), 'template_days': 3}),
+]
+
+
+def _seed(rows):
+    """`rows` rows per table, each parent with several children, some of them archived"""
+    from app import db
+    from app.archive import archive_notes, archive_todos
+    from app.models import (
+        Note, Event, Todo, TodoReminder, Recipe, RecipeIngredient, RecipeTag, ShoppingListItem,
+        Trip, Itinerary, PackingList, PackingItem, TravelExpense, CurrencyRate
+    )
+
+    now = datetime.utcnow()
+    today = date.today()
+    old = now - timedelta(days=365)
+
+    db.session.add_all(
+        Note(title=f'Note {i}', content=f'Note {i} body', category='work', tags='work,home',
+             is_archived=i % 4 == 0, created_at=old, updated_at=old)
+        for i in range(rows)
+    )
+    db.session.add_all(
+        Event(title=f'Event {i}', start_time=now + timedelta(hours=i), recurring=i % 5 == 0,
+              recurrence_rule='FREQ=DAILY' if i % 5 == 0 else None)
+        for i in range(rows)
+    )
+    db.session.add_all(
+        Todo(title=f'Todo {i}', priority='high', is_weekly=i % 3 == 0, week_day=i % 7,
+             status='completed' if i % 4 == 0 else 'pending', completed_at=old if i % 4 == 0 else None,
+             reminders=[TodoReminder(reminder_time=now + timedelta(days=j)) for j in range(3)])
+        for i in range(rows)
+    )
+    db.session.add_all(
+        Recipe(name=f'Recipe {i}', category='dinner', cuisine='italian', servings=4,
+               ingredients=[RecipeIngredient(name=name, quantity='2', unit='cup')
+                            for name in ('flour', 'sugar', f'spice {i}')],
+               tags=[RecipeTag(tag_name=tag) for tag in ('quick', 'vegetarian')])
+        for i in range(rows)
+    )
+    db.session.add_all(ShoppingListItem(name=f'item {i}') for i in range(rows))
+    db.session.add_all(
+        Trip(name=f'Trip {i}', destination='Rome', start_date=today, end_date=today + timedelta(days=6),
+             budget=1000,
+             itineraries=[Itinerary(day_number=day + 1, date=today + timedelta(days=day), title=f'Day {day + 1}')
+                          for day in range(rows)],
+             packing_lists=[PackingList(name=f'Bag {i}',
+                                        items=[PackingItem(item_name=f'Item {j}') for j in range(rows)])],
+             expenses=[TravelExpense(description=f'Expense {j}', amount=10, category='food',
+                                     currency='EUR' if j % 2 else 'USD', date=today + timedelta(days=j % 7))
+                       for j in range(rows)])
+        for i in range(rows)
+    )
+    db.session.add_all(
+        PackingList(name=f'Template {i}', is_template=True,
+                    items=[PackingItem(item_name=f'Thing {j}', category='clothing') for j in range(5)])
+        for i in range(rows)
+    )
+    db.session.add(CurrencyRate(currency='EUR', rate=1.1))
+    db.session.commit()
+
+    archive_notes(now)
+    archive_todos(now)
+
+
+def check_query_budgets():
+    """
+    Request every budgeted endpoint in strict mode.
+
+    Returns a list of (endpoint or request, problem) for each breach.
+    """
+    from app import create_app, db
+    from app.query_budget import QueryBudgetExceeded
+    from app.schema import init_db
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    try:
+        app = create_app(test_config={
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'QUERY_BUDGET_STRICT': True, 'TESTING': True
+        })
+        with app.app_context():
+            init_db()
+            _seed(SEED_ROWS)
+
+            client = app.test_client()
+            urls = app.url_map.bind('localhost')
+            breaches = []
+            covered = set()
+
+            for method, url, body in BUDGETED_REQUESTS:
+                request = f'{method} {url}'
+                covered.add(urls.match(url.split('?')[0], method=method)[0])
+                try:
+                    response = client.open(url, method=method, json=body)
+                except QueryBudgetExceeded as exc:
+                    breaches.append((request, str(exc)))
+                    continue
+                if response.status_code >= 400:
+                    breaches.append((request, f'HTTP {response.status_code}'))
+
+            for endpoint, view in app.view_functions.items():
+                if getattr(view, 'query_budget', None) is not None and endpoint not in covered:
+                    breaches.append((endpoint, 'has a query budget but no request in BUDGETED_REQUESTS'))
+
+            db.engine.dispose()
+    finally:
+        os.remove(path)
+
+    return breaches
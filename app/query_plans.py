@@ -0,0 +1,149 @@
+"""
+Query Plan Checks - EXPLAIN QUERY PLAN regression suite for hot endpoints
+
+Each hot endpoint is requested against a freshly seeded temporary
+database; every SELECT it issues is run through EXPLAIN QUERY PLAN and
+reported if SQLite falls back to a full table scan or a temporary
+B-tree sort. Run with `flask check-query-plans`.
+"""
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+# (url, plan steps the endpoint is allowed to use)
+HOT_ENDPOINTS = [
+    ('/api/overview', ()),
+    ('/notes/api/notes', ()),
+    ('/notes/api/notes?category=work', ()),
+    ('/notes/api/notes?limit=20', ()),
+    ('/notes/api/notes?tags=work,home', ()),
+    # Requiring every tag groups only the tag rows that matched
+    ('/notes/api/notes?tags=work,home&tag_match=all', ('USE TEMP B-TREE FOR GROUP BY',)),
+    # The tag cloud reads the whole (one row per tag) counts table in key order
+    ('/notes/api/tags', ('SCAN note_tag_counts',)),
+    ('/notes/api/tags?prefix=wo', ()),
+    # Ranking sorts only the rows that matched the full-text index
+    ('/notes/api/notes?search=plan', ('USE TEMP B-TREE FOR ORDER BY',)),
+    ('/calendar/api/events?start=2025-01-01T00:00:00&end=2025-02-01T00:00:00', ()),
+    ('/events/api/events/upcoming', ()),
+    ('/events/api/events/past', ()),
+    ('/todos/api/todos', ()),
+    ('/todos/api/todos?status=pending', ()),
+    ('/todos/api/todos?priority=high', ()),
+    ('/todos/api/todos/weekly', ()),
+    ('/recipes/api/recipes', ()),
+    ('/recipes/api/recipes?category=dinner', ()),
+    ('/recipes/api/recipes?cuisine=italian', ()),
+    ('/recipes/api/recipes/1', ()),
+    # Ingredient and tag filters sort only the recipes they matched
+    ('/recipes/api/recipes?ingredients=flour', ('USE TEMP B-TREE FOR ORDER BY',)),
+    ('/recipes/api/recipes?tags=quick', ('USE TEMP B-TREE FOR ORDER BY',)),
+    # Facets group the already-filtered recipes, materialized once
+    ('/recipes/api/recipes/facets?ingredients=flour&tags=quick',
+     ('SCAN matched', 'USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR count(DISTINCT)')),
+    ('/recipes/api/shopping-list', ()),
+    ('/travel/api/trips', ()),
+    ('/travel/api/trips?status=planning', ()),
+    ('/travel/api/trips/1', ()),
+    ('/travel/api/trips/1?include=itineraries', ()),
+    ('/travel/api/trips/1/itinerary', ()),
+    ('/travel/api/trips/1/expenses', ()),
+    ('/travel/api/trips/1/packing-lists', ()),
+    ('/travel/api/packing-lists/1/items', ()),
+    # Rollups group the trip's expenses, read once from the covering index
+    ('/travel/api/trips/1/analytics', ('SCAN expenses', 'USE TEMP B-TREE FOR GROUP BY')),
+    # Listing every packing list walks the table in primary key order
+    ('/travel/api/packing-lists', ('SCAN packing_lists',)),
+    ('/travel/api/packing-lists?templates_only=true', ()),
+]
+
+
+def _seed():
+    """A few rows per table so endpoints with ids resolve"""
+    from app import db
+    from app.models import (
+        Note, NoteTag, Event, Todo, TodoReminder, Recipe, RecipeIngredient, RecipeTag,
+        ShoppingListItem, Trip, Itinerary, PackingList, PackingItem, TravelExpense
+    )
+
+    now = datetime.utcnow()
+    db.session.add_all([
+        Note(title='Trip plan', content='plan the trip', category='work', tags='work',
+             tag_index=[NoteTag(tag_name='work')]),
+        Event(title='Standup', start_time=now + timedelta(days=1)),
+        Event(title='Weekly', start_time=now - timedelta(days=30), recurring=True,
+              recurrence_rule='FREQ=WEEKLY'),
+        Todo(title='Pack', status='pending', priority='high', is_weekly=True, week_day=1,
+             reminders=[TodoReminder(reminder_time=now)]),
+        Recipe(name='Pasta', category='dinner', cuisine='italian',
+               ingredients=[RecipeIngredient(name='flour')], tags=[RecipeTag(tag_name='quick')]),
+        ShoppingListItem(name='flour'),
+        Trip(name='Rome', destination='Rome', start_date=date.today(), end_date=date.today(),
+             itineraries=[Itinerary(day_number=1, date=date.today(), title='Arrive')],
+             packing_lists=[PackingList(name='Bag', items=[PackingItem(item_name='Socks')])],
+             expenses=[TravelExpense(description='Hotel', amount=100, date=date.today())]),
+        PackingList(name='Template', is_template=True),
+    ])
+    db.session.commit()
+
+
+def _plan_problems(conn, statement, parameters, allowed):
+    """Full scans and temp B-tree sorts in one statement's query plan"""
+    problems = []
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+
+    for row in rows:
+        detail = row[-1]
+        if detail in allowed:
+            continue
+        if 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+        elif (detail.startswith('SCAN ') and 'USING' not in detail
+              and 'VIRTUAL TABLE' not in detail and detail != 'SCAN CONSTANT ROW'):
+            problems.append(detail)
+
+    return problems
+
+
+def check_query_plans():
+    """
+    Request every hot endpoint and EXPLAIN the queries it issues.
+
+    Returns a list of (url, statement, problems) for each regression.
+    """
+    from app import create_app, db
+    from app.query_budget import QueryCounter
+    from app.schema import init_db
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    try:
+        app = create_app(test_config={'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        with app.app_context():
+            init_db()
+            _seed()
+
+            client = app.test_client()
+            regressions = []
+
+            for url, allowed in HOT_ENDPOINTS:
+                with QueryCounter() as counter:
+                    response = client.get(url)
+                if response.status_code != 200:
+                    regressions.append((url, None, [f'HTTP {response.status_code}']))
+                    continue
+
+                with db.engine.connect() as conn:
+                    for statement, parameters in zip(counter.statements, counter.parameters):
+                        if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                            continue
+                        problems = _plan_problems(conn, statement, parameters, allowed)
+                        if problems:
+                            regressions.append((url, statement, problems))
+
+            db.engine.dispose()
+    finally:
+        os.remove(path)
+
+    return regressions
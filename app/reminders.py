@@ -0,0 +1,287 @@
+"""
+Reminder Dispatch - deliver todo and event reminders when they fall due
+
+A background scheduler keeps the reminders due within the lookahead
+window in a min-heap, loaded from indexed queries (unsent TodoReminders
+by reminder_time, Events by their precomputed reminder_at), and sleeps
+until the earliest one is due. Due reminders are claimed in one
+transaction (is_sent set, or reminder_at advanced to the next occurrence)
+before delivery, so a restart never sends them twice; if the sink fails
+the claim is undone and dispatch backs off.
+
+Writes in this process wake the scheduler immediately; writes from other
+gunicorn workers are noticed through table_versions every
+REMINDER_REFRESH_INTERVAL seconds.
+"""
+import heapq
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from app.changes import on_change
+from app.conditional import table_versions
+from app.models.event import Event
+from app.models.todo import TodoReminder
+from app.modules.calendar.recurrence import next_reminder_at
+from app import db
+
+logger = logging.getLogger(__name__)
+
+LOAD_LIMIT = 1000
+RETRY_DELAY = 60  # Seconds to pause dispatch after a sink failure
+
+_TABLES = ('todo_reminders', 'events')
+
+# name -> callable(list of reminder dicts); raising means "not delivered"
+_sinks = {}
+
+# Reminders delivered through the 'queue' sink, for in-process consumers
+reminder_queue = queue.Queue(maxsize=10000)
+
+_scheduler = None
+
+
+def reminder_sink(name):
+    """Register a delivery sink selectable with REMINDER_SINK=<name>"""
+    def decorator(sink):
+        _sinks[name] = sink
+        return sink
+    return decorator
+
+
+@reminder_sink('log')
+def log_sink(reminders):
+    for reminder in reminders:
+        logger.info(f"Reminder: {reminder['title']} ({reminder['kind']} {reminder['id']})")
+
+
+@reminder_sink('webhook')
+def webhook_sink(reminders):
+    url = current_app.config['REMINDER_WEBHOOK_URL']
+    if not url:
+        raise RuntimeError('REMINDER_WEBHOOK_URL is not set')
+
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({'reminders': reminders}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+@reminder_sink('queue')
+def queue_sink(reminders):
+    for reminder in reminders:
+        try:
+            reminder_queue.put_nowait(reminder)
+        except queue.Full:
+            logger.warning(f"Reminder queue full, dropping {reminder['kind']} reminder {reminder['id']}")
+
+
+def _todo_payload(reminder):
+    todo = reminder.todo
+    return {
+        'kind': 'todo',
+        'id': reminder.id,
+        'todo_id': todo.id,
+        'title': todo.title,
+        'message': reminder.message,
+        'remind_at': reminder.reminder_time.isoformat(),
+        'due_date': todo.due_date.isoformat() if todo.due_date else None
+    }
+
+
+def _event_payload(event, remind_at):
+    return {
+        'kind': 'event',
+        'id': event.id,
+        'title': event.title,
+        'message': f'Starts in {event.reminder_minutes} minutes',
+        'remind_at': remind_at.isoformat(),
+        'start_time': (remind_at + timedelta(minutes=event.reminder_minutes)).isoformat(),
+        'location': event.location
+    }
+
+
+class ReminderScheduler:
+    """Min-heap of upcoming reminders served by one background thread"""
+
+    def __init__(self, app, sink, lookahead, refresh_interval):
+        self.app = app
+        self.sink = sink
+        self.lookahead = timedelta(seconds=lookahead)
+        self.refresh_interval = refresh_interval
+
+        self._heap = []  # (due, kind, id)
+        self._loaded_until = None
+        self._versions = None
+        self._paused_until = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self.tick(datetime.utcnow())
+            except Exception:
+                logger.exception("Reminder dispatch failed")
+            self._wake.wait(self._sleep_seconds(datetime.utcnow()))
+
+    def tick(self, now):
+        """Reload if reminders changed or the window ran out, then send what is due"""
+        versions = table_versions(_TABLES)
+        if versions != self._versions or self._loaded_until is None or now >= self._loaded_until:
+            self._versions = versions
+            self._load(now)
+
+        if self._paused_until and now < self._paused_until:
+            return
+        self._paused_until = None
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        if due:
+            self._dispatch(due, now)
+
+    def _sleep_seconds(self, now):
+        wake_at = [now + timedelta(seconds=self.refresh_interval)]
+        if self._loaded_until:
+            wake_at.append(self._loaded_until)
+        if self._heap:
+            wake_at.append(max(self._heap[0][0], self._paused_until or now))
+        return max((min(wake_at) - now).total_seconds(), 0)
+
+    def _load(self, now):
+        """Rebuild the heap from the pending reminders due inside the lookahead window"""
+        horizon = now + self.lookahead
+
+        todo_rows = db.session.query(TodoReminder.reminder_time, TodoReminder.id).filter(
+            TodoReminder.is_sent.is_(False),
+            TodoReminder.reminder_time <= horizon
+        ).order_by(TodoReminder.reminder_time).limit(LOAD_LIMIT).all()
+
+        event_rows = db.session.query(Event.reminder_at, Event.id).filter(
+            Event.reminder_at <= horizon
+        ).order_by(Event.reminder_at).limit(LOAD_LIMIT).all()
+
+        # A full page means later rows were cut off; only trust up to the last one loaded
+        self._loaded_until = horizon
+        for rows in (todo_rows, event_rows):
+            if len(rows) == LOAD_LIMIT:
+                self._loaded_until = min(self._loaded_until, rows[-1][0])
+
+        self._heap = [(due, 'todo', row_id) for due, row_id in todo_rows if due <= self._loaded_until]
+        self._heap += [(due, 'event', row_id) for due, row_id in event_rows if due <= self._loaded_until]
+        heapq.heapify(self._heap)
+
+    def _dispatch(self, due, now):
+        """Claim the due reminders in one transaction, then deliver them"""
+        todo_ids = [row_id for _, kind, row_id in due if kind == 'todo']
+        event_ids = [row_id for _, kind, row_id in due if kind == 'event']
+        payloads = []
+
+        claimed_todos = []
+        if todo_ids:
+            claimed_todos = db.session.execute(
+                update(TodoReminder)
+                .where(TodoReminder.id.in_(todo_ids), TodoReminder.is_sent.is_(False), TodoReminder.reminder_time <= now)
+                .values(is_sent=True)
+                .returning(TodoReminder.id)
+            ).scalars().all()
+            reminders = TodoReminder.query.options(joinedload(TodoReminder.todo)).filter(
+                TodoReminder.id.in_(claimed_todos)
+            ).order_by(TodoReminder.reminder_time).all()
+            payloads += [_todo_payload(reminder) for reminder in reminders]
+
+        previous_event_times = {}
+        if event_ids:
+            events = Event.query.filter(Event.id.in_(event_ids), Event.reminder_at <= now).all()
+            for event in events:
+                remind_at = event.reminder_at
+                previous_event_times[event.id] = remind_at
+
+                # Only send if the reminder still matches the event (e.g. occurrence not overridden since)
+                if next_reminder_at(event, remind_at - timedelta(microseconds=1)) == remind_at:
+                    payloads.append(_event_payload(event, remind_at))
+                event.reminder_at = next_reminder_at(event, max(now, remind_at))
+
+        db.session.commit()
+
+        if not payloads:
+            return
+
+        try:
+            self.sink(payloads)
+        except Exception:
+            logger.exception(f"Reminder delivery failed, retrying in {RETRY_DELAY}s")
+            self._release(claimed_todos, previous_event_times)
+            self._paused_until = now + timedelta(seconds=RETRY_DELAY)
+            return
+
+        logger.info(f"Sent {len(payloads)} reminders")
+
+    def _release(self, todo_ids, previous_event_times):
+        """Undo a claim so the reminders are sent on the next attempt"""
+        if todo_ids:
+            db.session.execute(
+                update(TodoReminder).where(TodoReminder.id.in_(todo_ids)).values(is_sent=False)
+            )
+        for event_id, remind_at in previous_event_times.items():
+            db.session.execute(update(Event).where(Event.id == event_id).values(reminder_at=remind_at))
+        db.session.commit()
+
+
+def schedule_pending_event_reminders():
+    """Compute reminder_at for events with a reminder but no pending time (e.g. created before reminders ran)"""
+    now = datetime.utcnow()
+    events = Event.query.filter(Event.reminder_minutes.isnot(None), Event.reminder_at.is_(None)).all()
+    for event in events:
+        event.reminder_at = next_reminder_at(event, now)
+    db.session.commit()
+
+
+@on_change(*_TABLES)
+def _wake_scheduler(changed_tables):
+    if _scheduler is not None:
+        _scheduler.wake()
+
+
+def start_reminders(app):
+    """Run the reminder scheduler on a daemon thread; returns it, or None if disabled"""
+    global _scheduler
+
+    sink_name = app.config['REMINDER_SINK']
+    if not sink_name:
+        return None
+    if sink_name not in _sinks:
+        raise ValueError(f"Unknown REMINDER_SINK '{sink_name}' (expected one of {', '.join(_sinks)})")
+
+    with app.app_context():
+        schedule_pending_event_reminders()
+
+    _scheduler = ReminderScheduler(
+        app,
+        _sinks[sink_name],
+        lookahead=app.config['REMINDER_LOOKAHEAD'],
+        refresh_interval=app.config['REMINDER_REFRESH_INTERVAL']
+    )
+    thread = threading.Thread(target=_scheduler.run, name='reminder-scheduler', daemon=True)
+    thread.start()
+    return _scheduler
@@ -0,0 +1,113 @@
+"""
+Database schema initialization
+
+db.create_all() only creates missing tables; columns added to existing
+models and anything SQLite-specific (virtual tables, triggers) are
+applied here as idempotent DDL so it can run against both fresh and
+existing databases.
+"""
+import logging
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import inspect, text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def init_db():
+    """Create all tables and SQLite-specific schema objects"""
+    # Import models so every table is registered on the metadata
+    import app.models  # noqa: F401
+    from app.conditional import ensure_version_tracking
+    from app.modules.notes.patches import ensure_patch_log
+    from app.modules.notes.rendering import render_missing_notes
+    from app.modules.notes.revisions import ensure_revision_log
+    from app.modules.notes.search import ensure_search_index
+    from app.modules.notes.tags import ensure_tag_counts, index_missing_tags
+    from app.modules.recipes.search import ensure_search_index as ensure_recipe_search_index
+    from app.modules.sync.changelog import ensure_change_log
+    from app.sqlite import enable_auto_vacuum
+
+    with _schema_lock():
+        enable_auto_vacuum(current_app, db)
+        db.create_all()
+        _add_missing_columns()
+        _create_missing_indexes()
+        ensure_revision_log()
+
+        current_app.config['NOTES_FTS_ENABLED'] = ensure_search_index()
+        current_app.config['RECIPES_FTS_ENABLED'] = ensure_recipe_search_index()
+        ensure_version_tracking()
+        ensure_change_log()
+
+        ensure_tag_counts()
+        ensure_patch_log()
+
+        rendered = render_missing_notes()
+        if rendered:
+            logger.info(f"Rendered markdown for {rendered} notes")
+
+        tagged = index_missing_tags()
+        if tagged:
+            logger.info(f"Indexed tags for {tagged} notes")
+
+    logger.info("Database schema initialized")
+
+
+@contextmanager
+def _schema_lock():
+    """
+    Serialize schema initialization across processes.
+
+    Workers started without preloading (or several containers sharing a
+    volume) would otherwise race on ALTER TABLE / CREATE INDEX.
+    """
+    database = db.engine.url.database
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    if fcntl is None or not database or database == ':memory:':
+        yield
+        return
+
+    with open(f'{database}.init.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _add_missing_columns():
+    """ALTER existing tables to add columns that were added to the models"""
+    inspector = inspect(db.engine)
+
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}'
+
+                # Backfill existing rows with the model's scalar default
+                if column.default is not None and column.default.is_scalar:
+                    literal = column.type.literal_processor(dialect=db.engine.dialect)
+                    value = column.default.arg
+                    ddl += f' DEFAULT {literal(value) if literal else repr(value)}'
+
+                conn.execute(text(ddl))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+
+def _create_missing_indexes():
+    """Create model indexes added after their table was first created"""
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
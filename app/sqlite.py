@@ -0,0 +1,131 @@
+"""
+SQLite Tuning - per-connection PRAGMAs and periodic maintenance
+
+Every new DBAPI connection gets the profile in app.config['SQLITE_PRAGMAS']
+(WAL journaling, busy timeout, cache and mmap sizing, ...). WAL lets
+readers proceed while a writer commits; the maintenance task checkpoints
+the WAL so it does not grow unbounded and lets SQLite refresh planner
+statistics with PRAGMA optimize. Databases use incremental auto-vacuum,
+and each maintenance pass returns a bounded number of free pages (left by
+rows moved to the archive tier or deleted) to the filesystem.
+"""
+import logging
+import os
+import threading
+from flask import current_app
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# Extra callables run by the periodic maintenance loop, in registration order
+_maintenance_tasks = []
+
+# PRAGMAs that must run before any other statement on the connection
+# (auto_vacuum before WAL mode, which initializes a new database file)
+_ORDERED_FIRST = ('busy_timeout', 'auto_vacuum', 'journal_mode')
+
+_AUTO_VACUUM_MODES = {'NONE': 0, 'FULL': 1, 'INCREMENTAL': 2}
+
+def default_pragmas():
+    """Tuning profile, overridable through SQLITE_* environment variables"""
+    return {
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # Milliseconds
+        'auto_vacuum': os.getenv('SQLITE_AUTO_VACUUM', 'INCREMENTAL'),
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),  # Negative means KiB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    }
+
+
+def init_sqlite(app, db):
+    """Apply the PRAGMA profile to every connection the engine opens"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    pragmas = app.config['SQLITE_PRAGMAS']
+    ordered = [key for key in _ORDERED_FIRST if key in pragmas]
+    ordered += [key for key in pragmas if key not in _ORDERED_FIRST]
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key in ordered:
+                cursor.execute(f'PRAGMA {key} = {pragmas[key]}')
+        finally:
+            cursor.close()
+
+
+def enable_auto_vacuum(app, db):
+    """
+    Rebuild a database created before auto-vacuum was configured, since
+    SQLite only changes the mode of an existing file with VACUUM. Runs once.
+    """
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    wanted = _AUTO_VACUUM_MODES.get(str(app.config['SQLITE_PRAGMAS'].get('auto_vacuum')).upper())
+    if wanted is None:
+        return
+
+    with db.engine.connect() as conn:
+        if conn.execute(text('PRAGMA auto_vacuum')).scalar() == wanted:
+            return
+        logger.info("Rebuilding the database with VACUUM to change its auto_vacuum mode")
+        conn.execute(text('VACUUM'))
+        conn.commit()
+
+
+def run_maintenance(db):
+    """Return free pages, checkpoint and truncate the WAL, then refresh query planner statistics"""
+    with db.engine.connect() as conn:
+        free_pages = conn.execute(text('PRAGMA freelist_count')).scalar()
+        if free_pages and conn.execute(text('PRAGMA auto_vacuum')).scalar() == _AUTO_VACUUM_MODES['INCREMENTAL']:
+            # Each step of the statement frees one page, so it is read to the end
+            pages = int(current_app.config['SQLITE_VACUUM_PAGES'])
+            conn.execute(text(f'PRAGMA incremental_vacuum({pages})')).fetchall()
+            conn.commit()
+
+        busy, wal_pages, checkpointed = conn.execute(text('PRAGMA wal_checkpoint(TRUNCATE)')).one()
+        conn.execute(text('PRAGMA optimize'))
+        conn.commit()
+
+    logger.info(
+        f"SQLite maintenance: {free_pages} free pages, "
+        f"checkpointed {checkpointed}/{wal_pages} WAL pages (busy={busy})"
+    )
+
+
+def maintenance_task(task):
+    """Register a callable to run (in an app context) on every maintenance pass"""
+    _maintenance_tasks.append(task)
+    return task
+
+
+def start_maintenance(app, db, interval=None):
+    """Run the registered maintenance tasks and run_maintenance every `interval` seconds on a daemon thread"""
+    interval = interval or app.config['SQLITE_MAINTENANCE_INTERVAL']
+    if not interval or not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return None
+
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    for task in _maintenance_tasks:
+                        task()
+                    run_maintenance(db)
+            except Exception:
+                logger.exception("SQLite maintenance failed")
+
+    thread = threading.Thread(target=loop, name='sqlite-maintenance', daemon=True)
+    thread.start()
+    return stop
@@ -96,7 +96,9 @@ async function apiCall(url, method = 'GET', data = null) {
     try {
         const response = await fetch(url, options);
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            const error = new Error(`HTTP error! status: ${response.status}`);
+            error.status = response.status;
+            throw error;
         }
 
         if (response.status === 204) {
@@ -131,9 +133,42 @@ function confirmAction(message) {
     return confirm(message);
 }
 
+// Live updates: one shared EventSource per page, callbacks debounced per subscription
+const changeSubscriptions = [];
+let changeSource = null;
+
+function subscribeChanges(models, callback, delay = 300) {
+    const subscription = { models: new Set(models), callback, delay, timer: null };
+    changeSubscriptions.push(subscription);
+
+    if (!changeSource && window.EventSource) {
+        changeSource = new EventSource('/api/stream');
+
+        changeSource.addEventListener('change', event => {
+            const change = JSON.parse(event.data);
+            changeSubscriptions
+                .filter(sub => sub.models.has(change.model))
+                .forEach(sub => notifySubscription(sub));
+        });
+
+        // Changes were missed while disconnected, refresh everything
+        changeSource.addEventListener('resync', () => {
+            changeSubscriptions.forEach(sub => notifySubscription(sub));
+        });
+    }
+
+    return subscription;
+}
+
+function notifySubscription(subscription) {
+    clearTimeout(subscription.timer);
+    subscription.timer = setTimeout(subscription.callback, subscription.delay);
+}
+
 // Export utilities
 window.loom = {
     apiCall,
+    subscribeChanges,
     formatDate,
     formatDateTime,
     showNotification,
@@ -4,10 +4,19 @@
 
 let masonryGrid = null;
 
+// The open note as last saved: edits are sent as a diff against this version
+let editingNote = null;
+let autosaveTimer = null;
+let saveQueue = Promise.resolve();
+const AUTOSAVE_DELAY = 1500;  // ms after the last keystroke
+
 // Initialize on DOM load
 document.addEventListener('DOMContentLoaded', () => {
     loadNotes();
     initEventListeners();
+
+    // Pick up notes edited on other devices
+    window.loom.subscribeChanges(['notes'], loadNotes);
 });
 
 // Initialize event listeners
@@ -16,6 +25,7 @@ function initEventListeners() {
     document.getElementById('closeModal')?.addEventListener('click', closeModal);
     document.getElementById('cancelBtn')?.addEventListener('click', closeModal);
     document.getElementById('saveNoteBtn')?.addEventListener('click', saveNote);
+    document.getElementById('noteContent')?.addEventListener('input', scheduleAutosave);
 
     // Close modal on outside click
     document.getElementById('noteModal')?.addEventListener('click', (e) => {
@@ -60,10 +70,8 @@ function createNoteCard(note) {
     card.className = 'note-card';
     card.dataset.noteId = note.id;
 
-    // Convert markdown to HTML for display (limit preview length)
-    const contentLength = (note.content || '').length;
-    const previewLength = Math.min(contentLength, 400);
-    const contentHtml = note.content ? renderMarkdown(note.content.substring(0, previewLength)) : '';
+    // Preview is rendered server-side; the full content is only fetched when the note is opened
+    const contentHtml = note.preview_html || escapeHtml(note.preview || '');
 
     // Build card content
     card.innerHTML = `
@@ -129,16 +137,9 @@ function initMasonry() {
     }
 }
 
-// Render markdown to HTML
-function renderMarkdown(markdown) {
-    if (typeof marked === 'undefined') {
-        return escapeHtml(markdown);
-    }
-    return marked.parse(markdown, { breaks: true });
-}
-
 // Open new note modal
 function openNewNoteModal() {
+    editingNote = null;
     document.getElementById('modalTitle').textContent = 'New Note';
     document.getElementById('noteId').value = '';
     document.getElementById('noteTitle').value = '';
@@ -153,13 +154,22 @@ function openNewNoteModal() {
 async function openNote(noteId) {
     try {
         const note = await window.loom.apiCall(`/notes/api/notes/${noteId}`, 'GET');
+        editingNote = {
+            id: note.id,
+            version: note.version,
+            content: note.content || '',
+            title: note.title || '',
+            category: note.category || null,
+            tags: Array.isArray(note.tags) ? note.tags.join(', ') : (note.tags || ''),
+            is_pinned: note.is_pinned || false
+        };
 
         document.getElementById('modalTitle').textContent = 'Edit Note';
         document.getElementById('noteId').value = note.id;
         document.getElementById('noteTitle').value = note.title || '';
         document.getElementById('noteContent').value = note.content || '';
         document.getElementById('noteCategory').value = note.category || '';
-        document.getElementById('noteTags').value = Array.isArray(note.tags) ? note.tags.join(', ') : (note.tags || '');
+        document.getElementById('noteTags').value = editingNote.tags;
         document.getElementById('notePinned').checked = note.is_pinned || false;
         document.getElementById('noteModal').classList.add('active');
     } catch (error) {
@@ -168,11 +178,72 @@ async function openNote(noteId) {
     }
 }
 
-// Close modal
+// Close modal, sending any edits still waiting for autosave
 function closeModal() {
+    if (autosaveTimer) {
+        clearTimeout(autosaveTimer);
+        autosaveTimer = null;
+        queuePatch({}).catch(() => {});
+    }
     document.getElementById('noteModal').classList.remove('active');
 }
 
+// Autosave the open note's content shortly after typing stops
+function scheduleAutosave() {
+    if (!editingNote) return;
+    clearTimeout(autosaveTimer);
+    autosaveTimer = setTimeout(() => {
+        autosaveTimer = null;
+        queuePatch({}).catch(() => {});
+    }, AUTOSAVE_DELAY);
+}
+
+// Single splice turning `before` into `after` (offsets in UTF-16 units, as the API expects)
+function contentPatch(before, after) {
+    let start = 0;
+    while (start < before.length && start < after.length && before[start] === after[start]) {
+        start++;
+    }
+    let end = 0;
+    while (end < before.length - start && end < after.length - start
+           && before[before.length - 1 - end] === after[after.length - 1 - end]) {
+        end++;
+    }
+    return [{ start, end: before.length - end, text: after.substring(start, after.length - end) }];
+}
+
+// Saves run one at a time so each is based on the version the previous one returned
+function queuePatch(changes) {
+    saveQueue = saveQueue.catch(() => {}).then(() => patchNote(changes));
+    return saveQueue;
+}
+
+// Send only what changed since the last save
+async function patchNote(changes) {
+    const note = editingNote;
+    if (!note) return;
+
+    const content = document.getElementById('noteContent').value;
+    const body = { version: note.version, ...changes };
+    if (content !== note.content) {
+        body.content_patch = contentPatch(note.content, content);
+    }
+    if (Object.keys(body).length === 1) return;
+
+    try {
+        const result = await window.loom.apiCall(`/notes/api/notes/${note.id}`, 'PATCH', body);
+        note.version = result.version;
+        note.content = content;
+        Object.assign(note, changes);
+    } catch (error) {
+        if (error.status === 409) {
+            window.loom.showNotification('This note was changed elsewhere and has been reloaded');
+            await openNote(note.id);
+        }
+        throw error;
+    }
+}
+
 // Save note (create or update)
 async function saveNote() {
     const noteId = document.getElementById('noteId').value;
@@ -196,9 +267,19 @@ async function saveNote() {
     };
 
     try {
-        if (noteId) {
-            // Update existing note
-            await window.loom.apiCall(`/notes/api/notes/${noteId}`, 'PUT', noteData);
+        if (noteId && editingNote) {
+            // Update existing note: changed fields plus a content diff
+            clearTimeout(autosaveTimer);
+            autosaveTimer = null;
+
+            const changes = {};
+            ['title', 'category', 'is_pinned'].forEach(key => {
+                if (noteData[key] !== editingNote[key]) changes[key] = noteData[key];
+            });
+            if (tagsInput !== editingNote.tags) changes.tags = tagsInput || null;
+
+            await queuePatch(changes);
+            editingNote.tags = tagsInput;
             window.loom.showNotification('Note updated');
         } else {
             // Create new note
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for production serving
+
+Start with: gunicorn -c gunicorn.conf.py run:app
+
+The app is preloaded in the master so the schema is initialized once
+before workers fork; each worker then opens its own database connections.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Threaded workers: dashboard and calendar polling is I/O bound, and SQLite in
+# WAL mode serves concurrent readers across processes
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# /api/stream long-polls take at most SSE_MAX_WAITING of these per worker
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers periodically to bound memory growth, staggered by jitter
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def post_fork(server, worker):
+    """Drop connections inherited from the master so workers never share them"""
+    from app import db
+    from run import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,10 +1,18 @@
 """
 LOOM - Life Organization & Operations Manager
 Main application entry point
+
+Production: gunicorn -c gunicorn.conf.py run:app
+Development: python run.py
 """
 import os
 import logging
-from app import create_app, db
+from app import create_app
+from app import db
+from app.schema import init_db
+from app.modules.notes.patches import start_patch_flusher
+from app.reminders import start_reminders
+from app.sqlite import start_maintenance
 
 # Configure logging
 log_dir = os.getenv('LOG_DIR', '/app/logs')
@@ -24,12 +32,18 @@ logger = logging.getLogger(__name__)
 # Create Flask application
 app = create_app()
 
-# Initialize database
+# Initialize database (once, in the gunicorn master when the app is preloaded)
 with app.app_context():
-    db.create_all()
+    init_db()
     logger.info("Database initialized successfully")
 
+# Background maintenance, reminder dispatch and note patch flushing live in the
+# master process so they run once per deployment
+start_maintenance(app, db)
+start_reminders(app)
+start_patch_flusher(app)
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
-    logger.info(f"Starting LOOM on port {port}")
+    logger.info(f"Starting LOOM development server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=False)